@@ -5,5 +5,80 @@ class Settings(BaseModel):
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "qwen2.5:7b-instruct")
     OLLAMA_TIMEOUT_SECONDS: int = int(os.getenv("OLLAMA_TIMEOUT_SECONDS", "60"))
+    # Shared HTTP client pool (services/ollama_client.py)
+    OLLAMA_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("OLLAMA_CONNECT_TIMEOUT_SECONDS", "5"))
+    OLLAMA_MAX_CONNECTIONS: int = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10"))
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "5"))
+    OLLAMA_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY_SECONDS", "60"))
+    OLLAMA_MAX_CONCURRENT_REQUESTS: int = int(os.getenv("OLLAMA_MAX_CONCURRENT_REQUESTS", "4"))
+    # How long Ollama keeps the model resident after the last request ("30m", "-1" = forever)
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+    # Deterministic LLM response cache (services/llm_cache.py)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "memory")  # "memory" | "redis"
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+    # Semantic answer cache (services/semantic_cache.py)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    SEMANTIC_CACHE_PATH: str = os.getenv("SEMANTIC_CACHE_PATH", "")  # default: data/cache/semantic_cache.npz
+
+    # Startup warm-up (services/warmup.py)
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "1") == "1"
+
+    # Per-stage latency instrumentation (services/timing.py)
+    TIMING_ENABLED: bool = os.getenv("TIMING_ENABLED", "1") == "1"
+    TIMING_WINDOW: int = int(os.getenv("TIMING_WINDOW", "2048"))  # samples kept per stage for percentiles
+
+    # Start RAG retrieval before the session is read, overlapping session store I/O and safety (main.py stage graph)
+    CHAT_SPECULATIVE_RETRIEVAL: bool = os.getenv("CHAT_SPECULATIVE_RETRIEVAL", "1") == "1"
+
+    # Chat session store (store.py)
+    SESSION_STORE_BACKEND: str = os.getenv("SESSION_STORE_BACKEND", "memory")  # "memory" | "redis"
+    SESSION_TTL_SECONDS: int = int(os.getenv("SESSION_TTL_SECONDS", "3600"))  # idle expiry
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "5000"))  # LRU eviction above this
+    SESSION_MAX_TURNS: int = int(os.getenv("SESSION_MAX_TURNS", "100"))  # history entries kept per session
+    SESSION_MAX_HISTORY_BYTES: int = int(os.getenv("SESSION_MAX_HISTORY_BYTES", "131072"))  # JSON size per session
+
+    # Append-only session history log (services/session_log.py)
+    SESSION_LOG_ENABLED: bool = os.getenv("SESSION_LOG_ENABLED", "1") == "1"
+    SESSION_LOG_DIR: str = os.getenv("SESSION_LOG_DIR", "")  # default: data/sessions
+    SESSION_LOG_RETENTION_DAYS: int = int(os.getenv("SESSION_LOG_RETENTION_DAYS", "30"))
+    SESSION_LOG_FSYNC: bool = os.getenv("SESSION_LOG_FSYNC", "0") == "1"
+    SESSION_MEMORY_TURNS: int = int(os.getenv("SESSION_MEMORY_TURNS", "20"))  # in-memory window while the log is on
+
+    # Per-message intent / keyword / triage analysis cache (services/analysis_cache.py)
+    ANALYSIS_CACHE_ENABLED: bool = os.getenv("ANALYSIS_CACHE_ENABLED", "1") == "1"
+    ANALYSIS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "4096"))
+    ANALYSIS_CACHE_MAX_MESSAGE_CHARS: int = int(os.getenv("ANALYSIS_CACHE_MAX_MESSAGE_CHARS", "256"))  # longer: not cached
+
+    # Query embedding LRU for RAG retrieval (services/query_embedding_cache.py)
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = os.getenv("QUERY_EMBEDDING_CACHE_ENABLED", "1") == "1"
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+    QUERY_EMBEDDING_CACHE_PERSIST: bool = os.getenv("QUERY_EMBEDDING_CACHE_PERSIST", "1") == "1"
+    QUERY_EMBEDDING_CACHE_PATH: str = os.getenv("QUERY_EMBEDDING_CACHE_PATH", "")  # default: data/cache/query_embeddings.npz
+
+    # RAG retrieval result cache, keyed on the index version (services/retrieval_cache.py)
+    RETRIEVAL_CACHE_ENABLED: bool = os.getenv("RETRIEVAL_CACHE_ENABLED", "1") == "1"
+    RETRIEVAL_CACHE_MAX_BYTES: int = int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RETRIEVAL_CACHE_VERSION_CHECK_SECONDS: float = float(os.getenv("RETRIEVAL_CACHE_VERSION_CHECK_SECONDS", "5"))
+
+    # RAG search backend (services/rag_service.py): "auto" | "chroma" (HNSW) | "numpy" (exact, in memory)
+    RAG_VECTOR_STORE: str = os.getenv("RAG_VECTOR_STORE", "auto")
+    RAG_NUMPY_MAX_CHUNKS: int = int(os.getenv("RAG_NUMPY_MAX_CHUNKS", "20000"))  # "auto" threshold
+    # Serve the NumPy store from <index>/mapped_index.bin when present (services/mapped_index.py)
+    RAG_MAPPED_INDEX: bool = os.getenv("RAG_MAPPED_INDEX", "1") == "1"
+
+    # Embedding backend for RAG queries (services/rag_service.py, services/onnx_embedder.py)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" | "onnx" (int8, no torch import)
+    EMBEDDING_ONNX_DIR: str = os.getenv("EMBEDDING_ONNX_DIR", "")  # default: rag/models/<model>-onnx-int8
+    EMBEDDING_ONNX_THREADS: int = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # 0 = onnxruntime default
+
+    # RAG index hot swap (services/rag_service.py, services/index_pointer.py): seconds between
+    # checks of rag/index/CURRENT on the retrieval path; 0 = only POST /admin/rag/reload
+    RAG_INDEX_POLL_SECONDS: float = float(os.getenv("RAG_INDEX_POLL_SECONDS", "5"))
 
 settings = Settings()
@@ -20,24 +20,65 @@ else:
 print(f"[env] TESSERACT_CMD set: {bool(os.getenv('TESSERACT_CMD'))}")
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import models
+from config import settings
 import json
 from services.ollama_client import ollama_client
+from services.llm_cache import llm_cache
+from services.semantic_cache import semantic_cache
+from services.query_embedding_cache import query_embedding_cache
+from services.retrieval_cache import retrieval_cache
+from services.singleflight import SingleFlight
+from services.warmup import warmup
+from services.timing import timing
+from services import metrics
+from services.redis_client import get_queue_depth
 from services.safety_service import safety_service
 from services.rag_service import rag_service, RAGIndexMissingError, RAGRetrievalError
-from services.intent_service import intent_service # Phase 1
 from services.logistics_service import logistics_service # Phase 2
-from services.triage_service import triage_service # Phase 3
+from services.analysis_cache import analysis_cache # Phase 1 intent + Phase 3 triage
 from routes import intake
 from routes import cv_samples
 from routes import intake_jobs
 from routes import intake_history
-from store import sessions # Phase 5: Shared store
+from store import SessionConflictError, sessions # Phase 5: Shared store
+from services.session_history import AssistantTurn, UserTurn, citation_ids
+from services.session_log import session_log
+import asyncio
 import datetime
+import itertools
+import textwrap
+import time
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared Ollama HTTP client: one connection pool for the whole process
+    await ollama_client.start()
+    semantic_cache.load()
+    query_embedding_cache.load(rag_service.embedding_model_id)
+    session_log.start()
+    if session_log.running:
+        sessions.on_evict = session_log.forget  # a reused session ID never sees evicted turns
+    # Warm-up runs in the background: the server accepts traffic (and /ready
+    # reports "warming") while the embedder, index and LLM are loaded.
+    warmup_task = asyncio.create_task(warmup.run())
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    semantic_cache.save()
+    query_embedding_cache.save()
+    session_log.stop()
+    await ollama_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Identical concurrent retrievals (same message + tags) share one embed + Chroma query
+retrieval_singleflight = SingleFlight("retrieval")
 app.include_router(intake.router)
 app.include_router(cv_samples.router)
 app.include_router(intake_jobs.router) # Register intake_jobs router
@@ -56,6 +97,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """Per-stage pipeline timing -> Server-Timing header (no-op when TIMING_ENABLED=0)."""
+    token = timing.start_trace()
+    if token is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        header = timing.end_trace(token)
+    if header:
+        response.headers["Server-Timing"] = header
+    return response
+
+# Chat stage durations also feed the Prometheus histogram
+timing.add_listener(metrics.observe_chat_stage)
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Request count + latency per route template (GET /metrics)."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template (e.g. /intake/jobs/{job_id}) keeps label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_REQUESTS.labels(method=request.method, route=route, status=str(status)).inc()
+        metrics.HTTP_LATENCY.labels(method=request.method, route=route).observe(time.perf_counter() - started)
+
 # Standardized Error Handling
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -75,6 +148,44 @@ async def read_health():
         "rag_index_loaded": rag_status
     }
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition (API process). The worker exposes its own on WORKER_METRICS_PORT."""
+    metrics.SESSION_STORE_SIZE.set(len(sessions))
+    depth = get_queue_depth()
+    if depth is not None:
+        metrics.INTAKE_QUEUE_DEPTH.set(depth)
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/debug/stats")
+async def debug_stats():
+    """Runtime statistics (connection pools, caches) for load diagnostics."""
+    return {
+        "ollama_pool": ollama_client.pool_stats(),
+        "llm_cache": llm_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "rag_index": rag_service.index_stats(),
+        "session_store": await sessions.astats(),
+        "session_log": session_log.stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "stage_timings": timing.snapshot(),
+        "coalescing": {
+            "retrieval": retrieval_singleflight.stats(),
+            "llm": ollama_client.singleflight.stats(),
+        },
+    }
+
+@app.post("/admin/rag/reload")
+async def admin_rag_reload():
+    """
+    Swaps in the index rag/index/CURRENT points to without a restart (also picked
+    up by polling, RAG_INDEX_POLL_SECONDS). In-flight retrievals finish on the old one.
+    """
+    return await rag_service.areload()
+
 @app.get("/ready")
 async def read_ready():
     """
@@ -131,12 +242,19 @@ async def read_ready():
     # Overall status
     all_ok = all(c["ok"] for c in checks.values())
     status_code = 200 if all_ok else 503
+    status = "ready" if all_ok else "not_ready"
+
+    # Startup warm-up still loading models/index -> not ready yet
+    if warmup.warming:
+        status_code = 503
+        status = "warming"
 
     return JSONResponse(
         status_code=status_code,
         content={
-            "status": "ready" if all_ok else "not_ready",
+            "status": status,
             "checks": checks,
+            "warmup": warmup.to_dict(),
         },
     )
 
@@ -146,10 +264,18 @@ async def export_chat(request: Request):
     try:
         data = await request.json()
         session_id = data.get("session_id")
-        if not session_id or session_id not in sessions:
+        session = await sessions.aget(session_id) if session_id else None
+        if session is None:
              raise HTTPException(status_code=404, detail="Session not found")
         
-        session_data = sessions[session_id]
+        state = {k: v for k, v in session.items() if k != "history"}
+        # Full history comes from the session log (make sure queued turns are written first)
+        await asyncio.to_thread(session_log.flush)
+        incarnation = sessions.incarnation(session_id) if session_log.running else None
+        if incarnation is not None and session_log.has(session_id, incarnation):
+            turns = session_log.iter_history(session_id, incarnation)
+        else:
+            turns = iter(session.get("history", []))
         
         # Save to disk as evidence
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -161,14 +287,10 @@ async def export_chat(request: Request):
         export_dir.mkdir(parents=True, exist_ok=True)
         
         filepath = export_dir / filename
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(session_data, f, indent=2, default=str)
-            
-        return {
-            "status": "exported",
-            "file": str(filepath),
-            "data": session_data
-        }
+        return StreamingResponse(
+            _stream_export(filepath, state, _iter_expanded_history(turns)),
+            media_type="application/json",
+        )
     except Exception as e:
         print(f"Export Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -199,282 +321,538 @@ async def debug_directory_preview(limit: int = 5):
     except Exception as e:
          raise HTTPException(status_code=500, detail=f"Failed to read data: {str(e)}")
 
-@app.post("/chat", response_model=models.ChatResponse)
-async def chat_endpoint(request: models.ChatRequest):
+def _session_id(request: models.ChatRequest) -> str:
+    return request.session_id or "default"
+
+
+async def _record_turn(session_id: str, turn):
+    """Appends a turn to the session store's window and the on-disk session log."""
+    await sessions.aappend_history(session_id, turn)
+    if session_log.running:
+        session_log.append(session_id, sessions.incarnation(session_id), turn)
+
+
+async def _append_history(session_id: str, response_model: models.ChatResponse, index_version: str = None):
+    """Records an assistant turn in the session history (Phase 5 export)."""
+    turn = AssistantTurn.from_response(
+        response_model, datetime.datetime.now(), logistics_service.resource_id, index_version=index_version,
+    )
+    await _record_turn(session_id, turn)
+
+
+EXPORT_BATCH_TURNS = 64
+
+
+def _resolve_resource(resource_id: str) -> dict:
+    return logistics_service.get_resource(resource_id) or {"id": resource_id}
+
+
+async def _iter_expanded_history(turns):
+    """Expands history records to full entries in batches; log reads and citation lookups run off the event loop."""
+    while True:
+        batch = await asyncio.to_thread(list, itertools.islice(turns, EXPORT_BATCH_TURNS))
+        if not batch:
+            return
+        citations = await rag_service.aget_citations(citation_ids(batch))
+        for turn in batch:
+            yield turn.expand(citations, _resolve_resource)
+
+
+async def _stream_export(filepath: Path, state: dict, entries):
+    """
+    Streams the export response ({"status", "file", "data": session}) while writing the
+    same session document to the evidence file, one history entry at a time. The file
+    is byte-identical to json.dump(session, indent=2, default=str).
+    """
+    f = await asyncio.to_thread(open, filepath, "w", encoding="utf-8")
     try:
-        # 1. Session Management
-        session_id = request.session_id or "default"
-        if session_id not in sessions:
-            sessions[session_id] = {
-                "lock_state": "none", 
-                "last_triage": "self_care",
-                "urgent_pending": False,
-                "history": [] # Phase 5: Track history for export
-            }
-        
-        session = sessions[session_id]
-        
-        # Append User Msg to History
-        session["history"].append({"role": "user", "content": request.message, "timestamp": datetime.datetime.now().isoformat()})
+        file_head = "{\n" + "".join(f"  {json.dumps(k)}: {json.dumps(v, default=str)},\n" for k, v in state.items())
+        await asyncio.to_thread(f.write, file_head + '  "history": [')
+        head = json.dumps({"status": "exported", "file": str(filepath)}, ensure_ascii=False, separators=(",", ":"))
+        data_head = json.dumps(state, ensure_ascii=False, separators=(",", ":"), default=str)
+        yield head[:-1] + ',"data":' + data_head[:-1] + ("," if state else "") + '"history":['
 
-        # 2. Intent Classification (Phase 1)
-        # Always run intent classification first
-        intent = intent_service.classify_intent(request.message)
-        
-        is_locked = session.get("lock_state") == "awaiting_confirmation"
-        
-        response_model = None
+        count = 0
+        async for entry in entries:
+            sep = "," if count else ""
+            text = textwrap.indent(json.dumps(entry, indent=2, default=str), "    ")
+            await asyncio.to_thread(f.write, sep + "\n" + text)
+            yield sep + json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+            count += 1
 
-        if not is_locked and intent == "chitchat":
-            response_model = models.ChatResponse(
-                assistant_message="Hello! I am your AI healthcare assistant. How can I help you today?",
-                urgency="self_care",
-                safety_flags=[],
-                citations=[],
-                recommendations=[],
-                intent="chitchat",
-                response_kind="chitchat"
-            )
-            
-        elif not is_locked and intent == "meta":
-             response_model = models.ChatResponse(
-                assistant_message=(
-                    "I am an experimental AI healthcare assistant designed to provide safe triage advice based on medical guidelines. "
-                    "I am NOT a doctor. My advice is for informational purposes only. "
-                    "I prioritize safety and will refer you to emergency care if red-flag symptoms are detected."
-                ),
-                urgency="self_care",
-                safety_flags=[],
-                citations=[],
-                recommendations=[],
-                intent="meta",
-                response_kind="meta"
-            )
-            
-        elif not is_locked and intent == "logistics":
-             resources, context = logistics_service.find_resources(request.message)
-             
-             if resources:
-                 msg = "For medical emergencies, please call **112** immediately (Romania/Lithuania/EU). Here are some verified local resources:"
-                 if context.get("sector"):
-                     msg = f"Here are some medical resources in **Sector {context['sector']}** (Bucharest). For emergencies, call **112**."
-             else:
-                 msg = "I currently don't have verified information for that specific location in my local database. Please check official maps or call **112** if this is an emergency."
-             
-             response_model = models.ChatResponse(
-                assistant_message=msg,
-                urgency="self_care",
-                safety_flags=[],
-                citations=[],
-                recommendations=[],
-                intent="logistics",
-                local_resources=resources,
-                local_context=context,
-                response_kind="logistics"
-            )
+        await asyncio.to_thread(f.write, ("\n  ]" if count else "]") + "\n}")
+        yield "]}}"
+    except Exception as e:
+        print(f"Export Error: {e}")
+        raise
+    finally:
+        await asyncio.to_thread(f.close)
 
-        if response_model:
-            session["history"].append({"role": "assistant", "content": response_model.assistant_message, "meta": response_model.dict(), "timestamp": datetime.datetime.now().isoformat()})
-            return response_model
 
-        # 3. Safety Evaluation (Phase 3.2 Triage + Phase 1 Lock)
-        # BYPASS for "raw" modes (ablation testing) - but Phase 1 logic usually applies to standard usage
-        if "_raw" not in request.mode:
-            safety_eval = safety_service.evaluate_user_message(request.message, session)
-            
-            # If Action is NOT allow (Escalate, Refuse, Clarify) OR if we just unlocked
-            if safety_eval.action != "allow" or "emergency_lock_cleared" in safety_eval.flags:
-                # Phase 2: Attach Emergency Resources if Red Flag or Locked
-                local_resources = None
-                local_context = None
-                
-                if "red_flag_detected" in safety_eval.flags or session.get("lock_state") == "awaiting_confirmation":
-                    # Get emergency hospitals
-                    local_resources = logistics_service.get_emergency_hospitals(limit=3)
-                    local_context = {"city": "Bucharest", "mode": "emergency"}
-
-                response_model = models.ChatResponse(
-                    assistant_message=safety_eval.message_override or "Safety violation.",
-                    urgency=safety_eval.urgency,
-                    safety_flags=safety_eval.flags,
-                    citations=[],
-                    recommendations=safety_eval.questions or [],
-                    intent=intent,
-                    lock_state=session.get("lock_state"),
-                    red_flag_detected="red_flag_detected" in safety_eval.flags,
-                    local_resources=local_resources,
-                    local_context=local_context,
-                    response_kind="emergency_lock" if safety_eval.urgency == "emergency" else "safety_interception"
-                )
-                session["history"].append({"role": "assistant", "content": response_model.assistant_message, "meta": response_model.dict(), "timestamp": datetime.datetime.now().isoformat()})
-                return response_model
-
-        # 3. Allow - Handle RAG vs Baseline with Triage (Phase 3)
-        
-        # Initialize RAG (Lazy load)
-        if "rag" in request.mode: # Handle rag, rag_safety, rag_raw
-             rag_service.initialize() # Safe to call multiple times
+def _chat_error_response(e: Exception) -> JSONResponse:
+    """Maps pipeline exceptions to the standardized error envelope."""
+    if isinstance(e, SessionConflictError):
+        return JSONResponse(
+            status_code=409,
+            content={"error": {"code": "SESSION_CONFLICT", "message": str(e)}}
+        )
+    if isinstance(e, (RAGIndexMissingError, RAGRetrievalError)):
+        # RAG specific errors -> 503
+        error_code = "INDEX_MISSING" if isinstance(e, RAGIndexMissingError) else "RAG_ERROR"
+        return JSONResponse(
+            status_code=503,
+            content={"error": {"code": error_code, "message": str(e)}}
+        )
+    if isinstance(e, RuntimeError):
+        # Ollama connection error - Standardized Error
+        return JSONResponse(
+            status_code=503, 
+            content={"error": {"code": "MODEL_UNAVAILABLE", "message": str(e)}}
+        )
+    return JSONResponse(
+         status_code=500,
+         content={"error": {"code": "INTERNAL_ERROR", "message": str(e)}}
+    )
 
-        # PHASE 3: Run Triage Service
-        triage_result = triage_service.triage(request.message)
-        final_urgency = triage_result["urgency"]
-        
-        # If Safety Service detected RED FLAGS, override urgency to EMERGENCY
-        if safety_eval.urgency == "emergency":
-            final_urgency = "emergency"
-            triage_result["urgency"] = "emergency"
-            triage_result["reason"] = "Red flags detected by Safety Service."
-
-        retrieved_context = ""
-        citations = []
-        citations_used = False # Grounding Flag
-        
-        # Decision: Should we run RAG?
-        # If urgency is UNKNOWN, skip RAG -> ask clarifying questions
-        # Phase 4: Pass symptom tags to retrieval for expansion
+
+async def _retrieve_for_chat(message: str, symptom_tags: list):
+    """RAG retrieval (lazy init + retrieve), shared by identical concurrent requests."""
+    with timing.stage("rag_init"):
+        await rag_service.ainitialize() # Safe to call multiple times (runs off the event loop)
+    with timing.stage("retrieval"):
+        # Keyed on the served index version: a request arriving after a hot swap never
+        # joins a retrieval still running on the previous snapshot
+        return await retrieval_singleflight.do(
+            (rag_service.index_version, message, tuple(symptom_tags), 8),
+            lambda: rag_service.aretrieve_with_embedding(
+                query=message,
+                symptom_tags=symptom_tags,
+                k=8 # Fetch more candidates for re-ranking
+            ),
+        )
+
+
+def _start_retrieval(message: str, symptom_tags: list) -> asyncio.Task:
+    """Starts retrieval as a task so it can overlap with (or be cancelled by) the safety stage."""
+    task = asyncio.create_task(_retrieve_for_chat(message, symptom_tags))
+    # Speculative tasks may be abandoned; consume their exception so it isn't logged as unhandled
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+SAFETY_CAS_ATTEMPTS = 3
+
+
+async def _evaluate_safety(session_id: str, session: dict, message: str, hits):
+    """
+    Safety evaluation + compare-and-set of the lock state it produced. If another
+    worker changed the lock meanwhile, the evaluation is stale: re-read the session
+    and evaluate again on the stored state. Returns (session, safety_eval).
+    """
+    for _ in range(SAFETY_CAS_ATTEMPTS):
+        lock_state_before = session.get("lock_state")
+        safety_eval = safety_service.evaluate_user_message(message, session, hits)
+        if await sessions.asave_state(session_id, session, expected_lock_state=lock_state_before):
+            return session, safety_eval
+        session = await sessions.aopen_session(session_id)
+    raise SessionConflictError(f"Session {session_id} changed concurrently; please retry.")
+
+
+async def _prepare_chat(request: models.ChatRequest):
+    """
+    Runs everything in the chat pipeline up to (but not including) the LLM call.
+
+    Returns (session, response_model, generation):
+    - response_model is set when the pipeline short-circuits (chitchat, meta, logistics,
+      safety interception, clarification). It is already recorded in the session history.
+    - generation is set when the LLM must be called. It carries the Ollama `messages`
+      plus the metadata needed by _finalize_chat to build the ChatResponse.
+    """
+    session_id = _session_id(request)
+
+    # Stage graph (speculative retrieval):
+    #
+    #   intent ─ triage ─┬─ retrieval (RAG pool: embed + vector search) ───────────┬─ prompt
+    #                    └─ session: open, user turn, safety + lock CAS (store I/O) ┘
+    #
+    # Intent and triage are a cached keyword scan of the message (~0.1 ms) and need
+    # no session state, so a medical question in a RAG mode starts retrieval before
+    # the session is even read. Retrieval then runs on the RAG pool while this
+    # coroutine awaits the session store (Redis round trips, in a worker thread).
+    # It is cancelled if the session short-circuits (emergency lock, refusal,
+    # clarification). With the in-process store there is no I/O to overlap and the
+    # order makes no difference.
+
+    # 1. Intent Classification (Phase 1)
+    # Always run intent classification first
+    with timing.stage("intent"):
+        # Stateless analysis (keyword scan, intent, triage) shared by every stage, cached per message
+        analysis = analysis_cache.analyze(request.message)
+        hits = analysis.hits
+        intent = analysis.intent
+
+    triage_result = None
+    retrieval_task = None
+    if settings.CHAT_SPECULATIVE_RETRIEVAL and "rag" in request.mode and intent == "medical_symptoms":
+        with timing.stage("triage"):
+            triage_result = analysis_cache.triage(request.message, analysis)
+        if triage_result["urgency"] != "unknown":
+            retrieval_task = _start_retrieval(request.message, triage_result["symptom_tags"])
+
+    # 2. Session Management
+    session = await sessions.aopen_session(session_id)
+    
+    # Append User Msg to History
+    await _record_turn(session_id, UserTurn(request.message, datetime.datetime.now()))
+    
+    is_locked = session.get("lock_state") == "awaiting_confirmation"
+    
+    response_model = None
+
+    if not is_locked and intent == "chitchat":
+        response_model = models.ChatResponse(
+            assistant_message="Hello! I am your AI healthcare assistant. How can I help you today?",
+            urgency="self_care",
+            safety_flags=[],
+            citations=[],
+            recommendations=[],
+            intent="chitchat",
+            response_kind="chitchat"
+        )
         
-        if final_urgency != "unknown" and "rag" in request.mode:
-            try:
-                # Phase 4: Retrieve with tags + re-ranking
-                retrieved_items = rag_service.retrieve(
-                    query=request.message, 
-                    symptom_tags=triage_result["symptom_tags"],
-                    k=8 # Fetch more candidates for re-ranking
-                )
-                
-                # Filter low relevance logic (if needed)
-                if retrieved_items:
-                    citations = retrieved_items
-                    citations_used = True
-                    # Formatting context for LLM
-                    # Phase 4: Include ID and Org in context
-                    context_list = []
-                    for i, item in enumerate(retrieved_items):
-                        # Use simple numeric ID for citation mapping
-                        cid_num = i + 1
-                        org = item.get("org", "Unknown")
-                        text = item.get("full_text", "")
-                        # Store numeric index in item for frontend if possible, but mainly needed for context
-                        context_list.append(f"Source [{cid_num}] ({org}): {text}")
-                        
-                    context_str = "\n".join(context_list)
-                    retrieved_context = f"\n\nCONTEXT FROM TRUSTED MEDICAL GUIDELINES:\n{context_str}\n\n"
-                else:
-                    retrieved_context = "\n\nCONTEXT: No relevant medical guidelines found locally.\n\n"
-                    citations_used = False
-            except Exception as e:
-                print(f"RAG Error: {e}")
-                retrieved_context = "\n\nCONTEXT: Error retrieving local guidelines.\n\n"
-
-        # Construct messages for Ollama
-        system_content = (
-            "You are a helpful medical triage assistant. Provide clear, safe advice based on the provided TRUSTED SOURCES. "
-            "Do not replace professional care. If urgent, advise calling emergency services. "
-            "NEVER provide a diagnosis. NEVER provide medication dosages (mg/frequency). "
+    elif not is_locked and intent == "meta":
+         response_model = models.ChatResponse(
+            assistant_message=(
+                "I am an experimental AI healthcare assistant designed to provide safe triage advice based on medical guidelines. "
+                "I am NOT a doctor. My advice is for informational purposes only. "
+                "I prioritize safety and will refer you to emergency care if red-flag symptoms are detected."
+            ),
+            urgency="self_care",
+            safety_flags=[],
+            citations=[],
+            recommendations=[],
+            intent="meta",
+            response_kind="meta"
         )
         
-        # Message Construction based on Triage
-        final_message = ""
+    elif not is_locked and intent == "logistics":
+         resources, context = logistics_service.find_resources(request.message)
+         
+         if resources:
+             msg = "For medical emergencies, please call **112** immediately (Romania/Lithuania/EU). Here are some verified local resources:"
+             if context.get("sector"):
+                 msg = f"Here are some medical resources in **Sector {context['sector']}** (Bucharest). For emergencies, call **112**."
+         else:
+             msg = "I currently don't have verified information for that specific location in my local database. Please check official maps or call **112** if this is an emergency."
+         
+         response_model = models.ChatResponse(
+            assistant_message=msg,
+            urgency="self_care",
+            safety_flags=[],
+            citations=[],
+            recommendations=[],
+            intent="logistics",
+            local_resources=resources,
+            local_context=context,
+            response_kind="logistics"
+        )
+
+    if response_model:
+        await _append_history(session_id, response_model)
+        return session, response_model, None
+
+    # 3. Safety Evaluation (Phase 3.2 Triage + Phase 1 Lock)
+    # BYPASS for "raw" modes (ablation testing) - but Phase 1 logic usually applies to standard usage
+    if "_raw" not in request.mode:
+        with timing.stage("safety"):
+            session, safety_eval = await _evaluate_safety(session_id, session, request.message, hits)
         
-        # CASE A: Unknown Urgency -> Ask Questions
-        if final_urgency == "unknown":
-            final_message = (
-                "I'm not sure I understand your symptoms clearly enough to provide specific advice. "
-                "Could you please clarify?\n\n"
-            )
-            if triage_result["follow_up_questions"]:
-                final_message += "Quick questions:\n" + "\n".join([f"- {q}" for q in triage_result["follow_up_questions"]])
+        # If Action is NOT allow (Escalate, Refuse, Clarify) OR if we just unlocked
+        if safety_eval.action != "allow" or "emergency_lock_cleared" in safety_eval.flags:
+            # Phase 2: Attach Emergency Resources if Red Flag or Locked
+            local_resources = None
+            local_context = None
             
+            if "red_flag_detected" in safety_eval.flags or session.get("lock_state") == "awaiting_confirmation":
+                # Get emergency hospitals
+                local_resources = logistics_service.get_emergency_hospitals(limit=3)
+                local_context = {"city": "Bucharest", "mode": "emergency"}
+
             response_model = models.ChatResponse(
-                assistant_message=final_message,
-                urgency="unknown",
+                assistant_message=safety_eval.message_override or "Safety violation.",
+                urgency=safety_eval.urgency,
                 safety_flags=safety_eval.flags,
                 citations=[],
-                recommendations=triage_result["follow_up_questions"],
+                recommendations=safety_eval.questions or [],
                 intent=intent,
                 lock_state=session.get("lock_state"),
                 red_flag_detected="red_flag_detected" in safety_eval.flags,
-                triage_result=triage_result,
-                response_kind="medical_clarification"
+                local_resources=local_resources,
+                local_context=local_context,
+                response_kind="emergency_lock" if safety_eval.urgency == "emergency" else "safety_interception"
             )
-            session["history"].append({"role": "assistant", "content": response_model.assistant_message, "meta": response_model.dict(), "timestamp": datetime.datetime.now().isoformat()})
-            return response_model
+            if retrieval_task is not None:
+                retrieval_task.cancel() # Speculative work no longer needed
+            await _append_history(session_id, response_model)
+            return session, response_model, None
 
-        # CASE B: Known Urgency -> Generate Advice with Grounding Check
-        
-        if retrieved_context:
-            system_content += f"{retrieved_context}"
+    # 3. Allow - Handle RAG vs Baseline with Triage (Phase 3)
+    
+    # Initialize RAG (Lazy load)
+    if "rag" in request.mode and retrieval_task is None: # Handle rag, rag_safety, rag_raw
+         with timing.stage("rag_init"):
+             await rag_service.ainitialize() # Safe to call multiple times (runs off the event loop)
+
+    # PHASE 3: Run Triage Service (unless already run for speculative retrieval)
+    if triage_result is None:
+        with timing.stage("triage"):
+            triage_result = analysis_cache.triage(request.message, analysis)
+    final_urgency = triage_result["urgency"]
+    
+    # If Safety Service detected RED FLAGS, override urgency to EMERGENCY
+    if safety_eval.urgency == "emergency":
+        final_urgency = "emergency"
+        triage_result["urgency"] = "emergency"
+        triage_result["reason"] = "Red flags detected by Safety Service."
+
+    retrieved_context = ""
+    citations = []
+    citations_used = False # Grounding Flag
+    query_embedding = None # Reused by the semantic answer cache
+    index_version = None # Index snapshot the citations came from
+    
+    # Decision: Should we run RAG?
+    # If urgency is UNKNOWN, skip RAG -> ask clarifying questions
+    # Phase 4: Pass symptom tags to retrieval for expansion
+    
+    if final_urgency != "unknown" and "rag" in request.mode:
+        try:
+            # Phase 4: Retrieve with tags + re-ranking
+            if retrieval_task is None:
+                retrieval_task = _start_retrieval(request.message, triage_result["symptom_tags"])
+            retrieved_items, query_embedding, index_version = await retrieval_task
             
-            if citations_used:
-                system_content += (
-                    "INSTRUCTIONS: Use ONLY the provided trusted sources to answer the user's question. "
-                    "Cite the sources using their numeric IDs (e.g. [1], [2]) in your response where appropriate. "
-                    "DO NOT use filenames or chunk IDs. ONLY use [1], [2], etc. "
-                    "If the sources do not cover the user's specific symptoms, state that you cannot find specific guidelines. "
-                    "Structure your answer:\n"
-                    "1. Brief Summary\n"
-                    "2. General Triage Advice (strictly based on sources)\n"
-                    "3. When to see a doctor\n"
-                    f"URGENCY ASSESSMENT: {final_urgency.upper()}.\n" 
-                )
+            # Filter low relevance logic (if needed)
+            if retrieved_items:
+                citations = retrieved_items
+                citations_used = True
+                # Formatting context for LLM
+                # Phase 4: Include ID and Org in context
+                context_list = []
+                for i, item in enumerate(retrieved_items):
+                    # Use simple numeric ID for citation mapping
+                    cid_num = i + 1
+                    org = item.get("org", "Unknown")
+                    text = item.get("full_text", "")
+                    # Store numeric index in item for frontend if possible, but mainly needed for context
+                    context_list.append(f"Source [{cid_num}] ({org}): {text}")
+                    
+                context_str = "\n".join(context_list)
+                retrieved_context = f"\n\nCONTEXT FROM TRUSTED MEDICAL GUIDELINES:\n{context_str}\n\n"
             else:
-                 # Grounding Failure: No sources found
-                 system_content += (
-                     "INSTRUCTIONS: No relevant local medical guidelines were found. "
-                     "State clearly that you cannot provide specific medical advice without sources. "
-                     "Provide mostly general safety tips and ask the user to consult a doctor. "
-                     "Do NOT hallucinate medical facts."
-                 )
-        
-        messages = [
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": request.message}
-        ]
-        
-        # Call Ollama
-        response_content = await ollama_client.generate_response(messages)
-        
-        # Append Disclaimer
-        if "_raw" not in request.mode:
-            disclaimer = "\n\nI’m not a doctor. If symptoms worsen or you have serious concerns, seek medical care."
-            final_message = response_content + disclaimer
-        else:
-            final_message = response_content
+                retrieved_context = "\n\nCONTEXT: No relevant medical guidelines found locally.\n\n"
+                citations_used = False
+        except Exception as e:
+            print(f"RAG Error: {e}")
+            retrieved_context = "\n\nCONTEXT: Error retrieving local guidelines.\n\n"
+
+    # Construct messages for Ollama
+    system_content = (
+        "You are a helpful medical triage assistant. Provide clear, safe advice based on the provided TRUSTED SOURCES. "
+        "Do not replace professional care. If urgent, advise calling emergency services. "
+        "NEVER provide a diagnosis. NEVER provide medication dosages (mg/frequency). "
+    )
+    
+    # Message Construction based on Triage
+    final_message = ""
+    
+    # CASE A: Unknown Urgency -> Ask Questions
+    if final_urgency == "unknown":
+        final_message = (
+            "I'm not sure I understand your symptoms clearly enough to provide specific advice. "
+            "Could you please clarify?\n\n"
+        )
+        if triage_result["follow_up_questions"]:
+            final_message += "Quick questions:\n" + "\n".join([f"- {q}" for q in triage_result["follow_up_questions"]])
         
-        # Return structured response
         response_model = models.ChatResponse(
             assistant_message=final_message,
-            urgency=final_urgency, 
-            safety_flags=safety_eval.flags, 
-            # Phase 4: Pass structured citations
-            citations=citations if citations_used else [],
+            urgency="unknown",
+            safety_flags=safety_eval.flags,
+            citations=[],
             recommendations=triage_result["follow_up_questions"],
             intent=intent,
             lock_state=session.get("lock_state"),
-            red_flag_detected="red_flag_detected" in safety_eval.flags if "_raw" not in request.mode else False,
+            red_flag_detected="red_flag_detected" in safety_eval.flags,
             triage_result=triage_result,
-            response_kind="medical_advice"
+            response_kind="medical_clarification"
         )
-        session["history"].append({"role": "assistant", "content": response_model.assistant_message, "meta": response_model.dict(), "timestamp": datetime.datetime.now().isoformat()})
-        return response_model
-    except (RAGIndexMissingError, RAGRetrievalError) as e:
-        # RAG specific errors -> 503
-        error_code = "INDEX_MISSING" if isinstance(e, RAGIndexMissingError) else "RAG_ERROR"
-        return JSONResponse(
-            status_code=503,
-            content={"error": {"code": error_code, "message": str(e)}}
+        await _append_history(session_id, response_model)
+        return session, response_model, None
+
+    # CASE B: Known Urgency -> Generate Advice with Grounding Check
+    
+    if retrieved_context:
+        system_content += f"{retrieved_context}"
+        
+        if citations_used:
+            system_content += (
+                "INSTRUCTIONS: Use ONLY the provided trusted sources to answer the user's question. "
+                "Cite the sources using their numeric IDs (e.g. [1], [2]) in your response where appropriate. "
+                "DO NOT use filenames or chunk IDs. ONLY use [1], [2], etc. "
+                "If the sources do not cover the user's specific symptoms, state that you cannot find specific guidelines. "
+                "Structure your answer:\n"
+                "1. Brief Summary\n"
+                "2. General Triage Advice (strictly based on sources)\n"
+                "3. When to see a doctor\n"
+                f"URGENCY ASSESSMENT: {final_urgency.upper()}.\n" 
+            )
+        else:
+             # Grounding Failure: No sources found
+             system_content += (
+                 "INSTRUCTIONS: No relevant local medical guidelines were found. "
+                 "State clearly that you cannot provide specific medical advice without sources. "
+                 "Provide mostly general safety tips and ask the user to consult a doctor. "
+                 "Do NOT hallucinate medical facts."
+             )
+    
+    messages = [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": request.message}
+    ]
+
+    # Semantic answer cache: near-duplicate question, same urgency/mode, same cited chunks
+    chunk_ids = [c["id"] for c in citations]
+    cached_answer = None
+    if citations_used:
+        cached_answer = semantic_cache.lookup(
+            query_embedding, ollama_client.model, request.mode, final_urgency, chunk_ids,
+            index_version=index_version, lock_state=session.get("lock_state"),
         )
-    except RuntimeError as e:
-        # Ollama connection error - Standardized Error
-        return JSONResponse(
-            status_code=503, 
-            content={"error": {"code": "MODEL_UNAVAILABLE", "message": str(e)}}
+
+    generation = {
+        "messages": messages,
+        "intent": intent,
+        "final_urgency": final_urgency,
+        "safety_eval": safety_eval,
+        "triage_result": triage_result,
+        "citations": citations,
+        "citations_used": citations_used,
+        "query_embedding": query_embedding,
+        "chunk_ids": chunk_ids,
+        "index_version": index_version,
+        "cached_answer": cached_answer,
+    }
+    return session, None, generation
+
+
+async def _finalize_chat(request: models.ChatRequest, session: dict, generation: dict, response_content: str) -> models.ChatResponse:
+    """Builds the medical_advice ChatResponse from the LLM output and records it in the session."""
+    safety_eval = generation["safety_eval"]
+    triage_result = generation["triage_result"]
+
+    if generation["cached_answer"] is None and generation["citations_used"]:
+        semantic_cache.store(
+            generation["query_embedding"], ollama_client.model, request.mode, generation["final_urgency"],
+            generation["chunk_ids"], response_content, index_version=generation["index_version"],
+            lock_state=session.get("lock_state"),
         )
+
+    # Append Disclaimer
+    if "_raw" not in request.mode:
+        disclaimer = "\n\nI’m not a doctor. If symptoms worsen or you have serious concerns, seek medical care."
+        final_message = response_content + disclaimer
+    else:
+        final_message = response_content
+    
+    # Return structured response
+    response_model = models.ChatResponse(
+        assistant_message=final_message,
+        urgency=generation["final_urgency"], 
+        safety_flags=safety_eval.flags, 
+        # Phase 4: Pass structured citations
+        citations=generation["citations"] if generation["citations_used"] else [],
+        recommendations=triage_result["follow_up_questions"],
+        intent=generation["intent"],
+        lock_state=session.get("lock_state"),
+        red_flag_detected="red_flag_detected" in safety_eval.flags if "_raw" not in request.mode else False,
+        triage_result=triage_result,
+        response_kind="medical_advice"
+    )
+    await _append_history(_session_id(request), response_model, generation["index_version"])
+    return response_model
+
+
+@app.post("/chat", response_model=models.ChatResponse)
+async def chat_endpoint(request: models.ChatRequest):
+    try:
+        session, response_model, generation = await _prepare_chat(request)
+        if response_model:
+            return response_model
+
+        # Call Ollama (unless the semantic cache already has an answer)
+        response_content = generation["cached_answer"]
+        if response_content is None:
+            with timing.stage("llm"):
+                response_content = await ollama_client.generate_response(generation["messages"])
+        return await _finalize_chat(request, session, generation, response_content)
     except Exception as e:
-        return JSONResponse(
-             status_code=500,
-             content={"error": {"code": "INTERNAL_ERROR", "message": str(e)}}
-        )
+        return _chat_error_response(e)
+
+
+def _sse(event: str, data: dict) -> str:
+    """Formats a single Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: models.ChatRequest):
+    """
+    Streaming variant of /chat (Server-Sent Events).
+
+    Frames:
+    - `event: token`  data: {"delta": "..."}   (one per Ollama chunk)
+    - `event: done`   data: <ChatResponse>     (final frame: urgency, citations, triage_result, ...)
+    - `event: error`  data: {"code": ..., "message": ...}
+
+    Short-circuited responses (chitchat, safety interception, ...) emit only the `done` frame.
+    The assistant turn is written to the session history once the stream completes.
+    """
+    try:
+        session, response_model, generation = await _prepare_chat(request)
+    except Exception as e:
+        return _chat_error_response(e)
+
+    async def event_stream():
+        if response_model:
+            yield _sse("done", response_model.dict())
+            return
+
+        if generation["cached_answer"] is not None:
+            yield _sse("token", {"delta": generation["cached_answer"]})
+            final_model = await _finalize_chat(request, session, generation, generation["cached_answer"])
+            yield _sse("done", final_model.dict())
+            return
+
+        parts = []
+        try:
+            # Recorded in the stage histograms; the Server-Timing header was already sent
+            with timing.stage("llm_stream"):
+                async for delta in ollama_client.stream_response(generation["messages"]):
+                    parts.append(delta)
+                    yield _sse("token", {"delta": delta})
+        except RuntimeError as e:
+            yield _sse("error", {"code": "MODEL_UNAVAILABLE", "message": str(e)})
+            return
+
+        final_model = await _finalize_chat(request, session, generation, "".join(parts))
+        yield _sse("done", final_model.dict())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == "__main__":
     import uvicorn
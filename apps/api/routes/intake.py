@@ -10,6 +10,7 @@ from cv.quality import analyze_quality
 from cv.scan import scan_document
 from cv.ocr import run_ocr, run_ocr_variants
 from cv.visualize import generate_debug_overlays
+from services.metrics import observe_ocr
 
 router = APIRouter()
 
@@ -96,6 +97,7 @@ async def intake_document(
 
     # 3. OCR (primary - on scanned image, with mode)
     ocr_res = run_ocr(scanned_img, engine=ocr_engine, mode=ocr_mode)
+    observe_ocr(ocr_res, source="api")
     
     # 4. OCR Ablation (if requested)
     ocr_variants_list = None
@@ -0,0 +1,134 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.intent_service import intent_service
+from services.keyword_matcher import keyword_matcher
+from services.triage_service import triage_service
+
+# Stateless message analysis, cached per normalized message.
+#
+# The same short messages ("hi", "I am safe", "I have a fever", the confirm_safe
+# button token) arrive over and over. Everything intent, safety and triage derive
+# from the text alone is a pure function of it:
+#   - the keyword scan (intent / safety.* / triage.* categories, temperature, duration)
+#   - the intent
+#   - the triage result (parsed symptoms, severity, temperature, duration -> urgency)
+# so it is kept in a bounded LRU keyed on the lowercased, stripped message.
+# SafetyService.evaluate_user_message() still runs per request: the session
+# transitions (lock, urgent_pending, last_triage) are applied on top of the
+# cached hits. Long messages rarely repeat and are analysed without caching.
+
+
+def _approx_size(value) -> int:
+    """Rough deep size of the cached containers and strings (interned strings counted too)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approx_size(v) for v in value)
+    return size
+
+
+def _copy_triage(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Callers mutate the triage dict (main.py overrides urgency/reason), so never hand out the cached one."""
+    return {k: list(v) if isinstance(v, list) else v for k, v in result.items()}
+
+
+class MessageAnalysis:
+    __slots__ = ("hits", "intent", "_triage", "size")
+
+    def __init__(self, text: str):
+        self.hits = keyword_matcher.scan(text)
+        self.intent = intent_service.classify_intent(text, self.hits)
+        self._triage = None  # only chat requests past the chitchat/meta/logistics routes need it
+        self.size = 0
+
+    def triage(self, text: str) -> Dict[str, Any]:
+        if self._triage is None:
+            self._triage = triage_service.triage(text, self.hits)
+        return _copy_triage(self._triage)
+
+
+class AnalysisCache:
+    def __init__(self):
+        self.enabled = settings.ANALYSIS_CACHE_ENABLED
+        self.max_entries = settings.ANALYSIS_CACHE_MAX_ENTRIES
+        self.max_message_chars = settings.ANALYSIS_CACHE_MAX_MESSAGE_CHARS
+        self._data: "OrderedDict[str, MessageAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # Same text the keyword rules see (lowercase); surrounding whitespace
+        # never changes a match, inner whitespace can ("chest  pain").
+        return keyword_matcher.normalize(text).strip()
+
+    def analyze(self, text: str) -> MessageAnalysis:
+        """Returns the (possibly shared) analysis of a message; treat it as read-only."""
+        key = self.normalize(text)
+        if not self.enabled or len(key) > self.max_message_chars:
+            with self._lock:
+                self.uncacheable += 1
+            return MessageAnalysis(text)
+
+        with self._lock:
+            analysis = self._data.get(key)
+            if analysis is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return analysis
+            self.misses += 1
+
+        analysis = MessageAnalysis(key)
+        analysis.size = _approx_size(key) + _approx_size(analysis.hits)
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._data[key] = analysis
+            self._bytes += analysis.size
+            while len(self._data) > self.max_entries:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+        return analysis
+
+    def triage(self, text: str, analysis: Optional[MessageAnalysis] = None) -> Dict[str, Any]:
+        """Triage result for the message (a fresh copy, safe to modify)."""
+        analysis = analysis or self.analyze(text)
+        return analysis.triage(self.normalize(text))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._data)
+            triaged = [a._triage for a in self._data.values() if a._triage is not None]
+            approx_bytes = self._bytes
+        approx_bytes += sum(_approx_size(t) for t in triaged)
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "uncacheable": self.uncacheable,
+            "evictions": self.evictions,
+            "approx_bytes": approx_bytes,
+        }
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,51 @@
+import os
+import pathlib
+from typing import Optional
+
+# Which RAG index is published.
+#
+# scripts/ingest_rag.py builds every index into its own directory,
+# rag/index/chroma-<version>/, and then publishes it by replacing the one-line
+# rag/index/CURRENT file (write to a temp file + os.replace, atomic on POSIX and
+# Windows). Readers therefore see the old index or the new one, never a half-built
+# one, and the API can keep serving while ingestion runs. RAGService polls the
+# pointer (RAG_INDEX_POLL_SECONDS) and swaps the new index in.
+#
+# Without CURRENT (indexes built before versioning) rag/index/chroma is served.
+# No config import: the ingestion script uses this module too.
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent.parent.parent
+INDEX_ROOT = str(REPO_ROOT / "rag" / "index")
+POINTER_FILE = "CURRENT"
+LEGACY_INDEX_DIR = "chroma"
+VERSIONED_PREFIX = "chroma-"
+
+
+def current_index_dir(root: str = INDEX_ROOT) -> str:
+    """Directory of the published index (CURRENT names a directory inside `root`)."""
+    try:
+        name = (pathlib.Path(root) / POINTER_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        name = ""
+    if not name or pathlib.Path(name).name != name:
+        name = LEGACY_INDEX_DIR
+    return str(pathlib.Path(root) / name)
+
+
+def pointer_mtime(root: str = INDEX_ROOT) -> Optional[int]:
+    try:
+        return os.stat(pathlib.Path(root) / POINTER_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def publish_index(root: str, dir_name: str):
+    """Points CURRENT at rag/index/<dir_name> atomically."""
+    path = pathlib.Path(root) / POINTER_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(dir_name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -1,5 +1,6 @@
-import re
-from typing import List, Literal
+from typing import Dict, Literal, Optional
+
+from services.keyword_matcher import keyword_matcher
 
 class IntentService:
     def __init__(self):
@@ -35,39 +36,35 @@ class IntentService:
             "sick", "ill", "temperature", "burn", "cut", "wound"
         ]
 
-    def _matches_any(self, text: str, patterns: List[str]) -> bool:
-        text_lower = text.lower().strip()
-        for pattern in patterns:
-            if re.search(pattern, text_lower):
-                return True
-        return False
-        
-    def _contains_symptoms(self, text: str) -> bool:
-        text_lower = text.lower()
-        for keyword in self.symptom_keywords:
-            if keyword in text_lower:
-                return True
-        return False
+        # Compiled into the shared matcher (services/keyword_matcher.py)
+        keyword_matcher.register("intent.symptom", self.symptom_keywords, literal=True)
+        keyword_matcher.register("intent.logistics", self.logistics_patterns)
+        keyword_matcher.register("intent.meta", self.meta_patterns)
+        keyword_matcher.register("intent.chitchat", self.chitchat_patterns)
 
-    def classify_intent(self, text: str) -> Literal["chitchat", "meta", "logistics", "medical_symptoms"]:
+    def classify_intent(self, text: str, hits: Optional[Dict[str, str]] = None) -> Literal["chitchat", "meta", "logistics", "medical_symptoms"]:
         """
         Classifies the user intent based on rule-based matching.
         Order matters: Medical symptoms override chitchat (e.g. "Hi I have fever").
+        `hits` is keyword_matcher.scan(text), shared with safety and triage (scanned here if omitted).
         """
+        if hits is None:
+            hits = keyword_matcher.scan(text)
+
         # 1. Check for medical symptoms first (Safety priority)
-        if self._contains_symptoms(text):
+        if "intent.symptom" in hits:
             return "medical_symptoms"
 
         # 2. Logistics
-        if self._matches_any(text, self.logistics_patterns):
+        if "intent.logistics" in hits:
             return "logistics"
 
         # 3. Meta
-        if self._matches_any(text, self.meta_patterns):
+        if "intent.meta" in hits:
             return "meta"
 
         # 4. Chitchat
-        if self._matches_any(text, self.chitchat_patterns):
+        if "intent.chitchat" in hits:
             return "chitchat"
 
         # Default fallback
@@ -0,0 +1,204 @@
+import itertools
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+
+# One matching engine for the rule vocabularies of intent, safety and triage.
+#
+# Each service registers its keyword lists as categories ("safety.emergency",
+# "triage.symptom.fever", ...). The rule patterns are simple: literals, optionally
+# with ^ / \b anchors, an (a|b) group, a [- ] class, or "A.*B". They are expanded
+# into plain keywords and every keyword of every service is compiled into ONE
+# trie-shaped regex, e.g.
+#
+#   (?=(c(?:hest(?: pain)?|ough(?:ing)?)|f(?:ever|ainted)|...))
+#
+# finditer() over the lowercased message then visits each position once and
+# yields the longest keyword starting there. Every shorter keyword matching at
+# that position is a prefix of it, so the hits at a position are precomputed
+# per keyword; \b / ^ / ".*" conditions are checked on those few hits only.
+# The result is the same category set the services' per-pattern re.search()
+# loops produced, from a single pass over the message.
+#
+# Value extractors (triage temperature / duration) are ordinary regexes, searched
+# on the same normalized text.
+
+
+class _Rule(NamedTuple):
+    category: str
+    keyword: str
+    boundary_start: bool = False
+    boundary_end: bool = False
+    anchored: bool = False          # "^" on the stripped message
+    gap: Optional[tuple] = None     # (gap_id, part) for "A.*B" rules: part 0 = A, 1 = B
+
+
+_META = set(".^$*+?{}[]\\|()")
+
+
+def _expand(body: str, pattern: str) -> List[str]:
+    """Expands an (a|b) group / [xy] class body into the plain strings it matches."""
+    options = [""]
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c in "([":
+            close = ")" if c == "(" else "]"
+            j = body.index(close, i)
+            inner = body[i + 1:j]
+            alternatives = inner.split("|") if c == "(" else list(inner)
+            if (c == "[" and "-" in inner[1:-1]) or any(set(a) & _META for a in alternatives):
+                raise ValueError(f"Unsupported keyword pattern: {pattern!r}")
+            options = [o + a for o in options for a in alternatives]
+            i = j + 1
+        elif c in _META:
+            raise ValueError(f"Unsupported keyword pattern: {pattern!r}")
+        else:
+            options = [o + c for o in options]
+            i += 1
+    return options
+
+
+def _trie_regex(words) -> str:
+    """Regex matching the longest of `words` at a position (greedy, one branch per first char)."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _at_boundary(text: str, pos: int) -> bool:
+    before = pos > 0 and _is_word(text[pos - 1])
+    after = pos < len(text) and _is_word(text[pos])
+    return before != after
+
+
+class KeywordMatcher:
+    def __init__(self):
+        self._rules = {}       # category -> [_Rule]
+        self._gaps = {}        # gap_id -> category
+        self._gap_ids = itertools.count()
+        self._extractors = {}  # category -> compiled regex
+        self._pattern = None
+        self._prefix_rules = {}
+        self._lock = threading.Lock()
+        self.scans = 0
+
+    def register(self, category: str, patterns: List[str], literal: bool = False):
+        """
+        Adds a keyword category. `patterns` are rule regexes written for the
+        lowercased text, or plain substrings when literal=True.
+        """
+        rules = []
+        gaps = {}
+        for pattern in patterns:
+            if literal:
+                rules.append(_Rule(category, pattern))
+                continue
+            anchored = pattern.startswith("^")
+            body = pattern[1:] if anchored else pattern
+            boundary_start = body.startswith(r"\b")
+            boundary_end = body.endswith(r"\b")
+            body = body[2 if boundary_start else 0:len(body) - 2 if boundary_end else len(body)]
+            if ".*" in body:
+                if anchored or boundary_start or boundary_end:
+                    raise ValueError(f"Unsupported keyword pattern: {pattern!r}")
+                gap_id = next(self._gap_ids)
+                gaps[gap_id] = category
+                head, tail = body.split(".*", 1)
+                rules += [_Rule(category, k, gap=(gap_id, 0)) for k in _expand(head, pattern)]
+                rules += [_Rule(category, k, gap=(gap_id, 1)) for k in _expand(tail, pattern)]
+            else:
+                rules += [_Rule(category, k, boundary_start, boundary_end, anchored) for k in _expand(body, pattern)]
+        with self._lock:
+            self._rules[category] = rules
+            self._gaps = {g: c for g, c in self._gaps.items() if c != category}
+            self._gaps.update(gaps)
+            self._pattern = None  # recompiled on next scan
+
+    def register_extractor(self, category: str, pattern: str):
+        """Adds a value extractor: hits[category] is the leftmost match of `pattern`."""
+        with self._lock:
+            self._extractors[category] = re.compile(pattern)
+
+    def _compile(self):
+        with self._lock:
+            if self._pattern is None:
+                by_keyword = defaultdict(list)
+                for rules in self._rules.values():
+                    for rule in rules:
+                        by_keyword[rule.keyword].append(rule)
+                # Hits for a longest match = rules of every keyword that is a prefix of it
+                self._prefix_rules = {
+                    keyword: [r for k, rs in by_keyword.items() if keyword.startswith(k) for r in rs]
+                    for keyword in by_keyword
+                }
+                self._pattern = re.compile(f"(?=({_trie_regex(by_keyword)}))")
+            return self._pattern
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return text.lower()
+
+    def scan(self, text: str) -> Dict[str, str]:
+        """Returns {category: keyword or extracted value} for every category found in the message."""
+        pattern = self._pattern or self._compile()
+        self.scans += 1
+        normalized = self.normalize(text)
+        start = len(normalized) - len(normalized.lstrip())
+
+        hits = {}
+        gap_parts = defaultdict(list)  # (gap_id, part) -> [(start, end)]
+        for match in pattern.finditer(normalized):
+            pos = match.start()
+            for rule in self._prefix_rules[match.group(1)]:
+                end = pos + len(rule.keyword)
+                if rule.anchored and pos != start:
+                    continue
+                if rule.boundary_start and not _at_boundary(normalized, pos):
+                    continue
+                if rule.boundary_end and not _at_boundary(normalized, end):
+                    continue
+                if rule.gap is not None:
+                    gap_parts[rule.gap].append((pos, end))
+                elif rule.category not in hits:
+                    hits[rule.category] = rule.keyword
+
+        # "A.*B": some B starts after an A ends, with no newline in between ("." excludes \n)
+        for gap_id, category in self._gaps.items():
+            if category in hits:
+                continue
+            for head_start, head_end in gap_parts.get((gap_id, 0), ()):
+                tail_end = next((tail_end for tail_start, tail_end in gap_parts.get((gap_id, 1), ())
+                                 if tail_start >= head_end and "\n" not in normalized[head_end:tail_start]), None)
+                if tail_end is not None:
+                    hits[category] = normalized[head_start:tail_end]
+                    break
+
+        for category, regex in self._extractors.items():
+            found = regex.search(normalized)
+            if found:
+                hits[category] = found.group()
+        return hits
+
+
+keyword_matcher = KeywordMatcher()
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Ollama runs with temperature 0.0, so an identical (model, options, messages)
+# triple always yields the same answer. Cache it instead of paying for another
+# 10-30 s CPU generation.
+
+
+def make_cache_key(model: str, options: dict, messages: list) -> str:
+    """Stable hash of everything that determines the model output."""
+    raw = json.dumps(
+        {"model": model, "options": options, "messages": messages},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry TTL."""
+
+    name = "memory"
+    # Entries of a previous model only hold memory in this process: drop them on a switch
+    clear_on_model_change = True
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str):
+        self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self):
+        self._data.clear()
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class RedisCacheBackend:
+    """Shared cache across workers/replicas. TTL via SETEX, LRU via Redis maxmemory policy."""
+
+    name = "redis"
+    KEY_PREFIX = "llm:cache:"
+    # Shared by every worker, which may run different models during a rolling deploy:
+    # never wiped on a model switch, old entries just expire (SETEX TTL)
+    clear_on_model_change = False
+
+    def __init__(self, ttl_seconds: int):
+        import redis.asyncio as aioredis
+        from services.redis_client import REDIS_URL
+
+        self.ttl_seconds = ttl_seconds
+        self._redis = aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self.KEY_PREFIX + key)
+
+    async def set(self, key: str, value: str):
+        await self._redis.setex(self.KEY_PREFIX + key, self.ttl_seconds, value)
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=self.KEY_PREFIX + "*"):
+            await self._redis.delete(key)
+
+    def size(self) -> int:
+        return -1  # Not tracked locally
+
+
+class LLMResponseCache:
+    def __init__(self):
+        self.enabled = settings.LLM_CACHE_ENABLED
+        if settings.LLM_CACHE_BACKEND == "redis":
+            self.backend = RedisCacheBackend(settings.LLM_CACHE_TTL_SECONDS)
+        else:
+            self.backend = MemoryCacheBackend(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL_SECONDS)
+        self._model = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def _check_model(self, model: str):
+        # The model name is part of the key, so stale answers can never be served;
+        # clearing just frees the memory held by the previous model's entries.
+        if self._model is not None and self._model != model and self.backend.clear_on_model_change:
+            logger.info(f"LLM cache: model changed {self._model} -> {model}, invalidating")
+            await self.backend.clear()
+        self._model = model
+
+    async def get(self, model: str, options: dict, messages: list) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            await self._check_model(model)
+            value = await self.backend.get(make_cache_key(model, options, messages))
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM cache get failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, model: str, options: dict, messages: list, content: str):
+        if not self.enabled or not content:
+            return
+        try:
+            await self.backend.set(make_cache_key(model, options, messages), content)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM cache set failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "model": self._model,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "errors": self.errors,
+        }
+
+
+llm_cache = LLMResponseCache()
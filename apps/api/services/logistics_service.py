@@ -25,6 +25,17 @@ class LogisticsService:
             print(f"[Logistics] Error loading data: {e}")
             self.resources = []
 
+    def resource_id(self, resource: Dict[str, Any]):
+        """ID used to reference a known resource (e.g. in session history); unknown resources are returned as-is."""
+        rid = resource.get("id")
+        return rid if rid is not None and self.get_resource(rid) == resource else resource
+
+    def get_resource(self, resource_id: str) -> Optional[Dict[str, Any]]:
+        for r in self.resources:
+            if r.get("id") == resource_id:
+                return r
+        return None
+
     def _extract_sector(self, text: str) -> Optional[int]:
         """
         Deterministically extracts sector number from text.
@@ -0,0 +1,215 @@
+import json
+import os
+import pathlib
+from collections.abc import Sequence
+
+import numpy as np
+
+# Single-file, memory-mapped export of a RAG index (<index dir>/mapped_index.bin).
+#
+# scripts/ingest_rag.py writes it next to the Chroma files of every build. Loading
+# it needs no sqlite and no writes, so read-only mounts work. Nothing is parsed up
+# front beyond a small JSON header, so cold start is near-instant. Every process
+# maps the same file, so uvicorn workers share one copy of the vectors through
+# the page cache.
+#
+# Layout (sections 64-byte aligned, native little-endian):
+#
+#   b"RAGMMAP1" | uint64 header length | JSON header | sections...
+#
+#   embeddings    float32 (count, dim)
+#   sq_norms      float32 (count,)       |x|^2 per row, for the NumpyVectorStore matvec
+#   id_offsets    uint64  (count + 1,)   ids       utf-8 blob, row i = blob[off[i]:off[i+1]]
+#   text_offsets  uint64  (count + 1,)   texts     utf-8 blob
+#   meta_codes    int32   (count, columns)   index into the column's distinct values
+#                                            (header), -1 = key absent in that row
+#
+# Rows are in Chroma's order, so search ties break exactly as NumpyVectorStore.from_chroma.
+# No config import: the ingestion script uses this module too.
+
+MAPPED_INDEX_FILE = "mapped_index.bin"
+MAGIC = b"RAGMMAP1"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+
+class BlobStrings(Sequence):
+    """Strings decoded on access from a utf-8 blob + offset table."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+
+class ColumnarMetadata(Sequence):
+    """Per-row metadata dicts rebuilt on access from dictionary-encoded columns."""
+
+    def __init__(self, columns: list, codes: np.ndarray):
+        self._names = [name for name, _ in columns]
+        self._values = [values for _, values in columns]
+        self._codes = codes
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, i):
+        return {
+            name: values[code]
+            for name, values, code in zip(self._names, self._values, self._codes[i].tolist())
+            if code >= 0
+        }
+
+    def column(self, name: str):
+        """(distinct values, per-row codes) for one metadata key; codes are -1 where absent."""
+        if name not in self._names:
+            return [], np.full(len(self._codes), -1, dtype=np.int32)
+        j = self._names.index(name)
+        return self._values[j], self._codes[:, j]
+
+
+class MappedIndex:
+    """Read-only view over a mapped_index.bin; arrays are slices of one np.memmap."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if self._map[:len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{self.path} is not a mapped RAG index")
+        header_len = int(self._map[len(MAGIC):len(MAGIC) + 8].view(np.uint64)[0])
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._map[start:start + header_len].tobytes().decode("utf-8"))
+        if self.header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: unsupported format {self.header.get('format')}")
+
+        self.count = self.header["count"]
+        self.dim = self.header["dim"]
+        self.version = self.header.get("index_version")
+        self.embedding_model = self.header.get("embedding_model")
+        self.embeddings = self._section("embeddings", np.float32).reshape(self.count, self.dim)
+        self.sq_norms = self._section("sq_norms", np.float32)
+        self.ids = BlobStrings(self._section("ids", np.uint8), self._section("id_offsets", np.uint64))
+        self.documents = BlobStrings(self._section("texts", np.uint8), self._section("text_offsets", np.uint64))
+        columns = self.header["meta_columns"]
+        codes = self._section("meta_codes", np.int32).reshape(self.count, len(columns))
+        self.metadatas = ColumnarMetadata(columns, codes)
+
+    def _section(self, name: str, dtype) -> np.ndarray:
+        offset, nbytes = self.header["sections"][name]
+        return self._map[offset:offset + nbytes].view(dtype)
+
+
+class MappedIndexWriter:
+    """
+    Streams rows into a new mapped_index.bin: sections are spooled to temporary
+    files as batches arrive and assembled (then atomically renamed) by close().
+    """
+
+    def __init__(self, path: str, index_version: str = None, embedding_model: str = None):
+        self.path = pathlib.Path(path)
+        self.index_version = index_version
+        self.embedding_model = embedding_model
+        self.count = 0
+        self.dim = None
+        self._id_offsets = [0]
+        self._text_offsets = [0]
+        self._columns = {}  # name -> {value key: code}, insertion ordered
+        self._column_values = {}  # name -> [value]
+        self._row_codes = []  # per row: {column: code}
+        self._spools = {name: open(self._spool_path(name), "wb") for name in ("embeddings", "sq_norms", "ids", "texts")}
+
+    def _spool_path(self, name: str) -> pathlib.Path:
+        return self.path.with_name(f"{self.path.name}.{name}.tmp")
+
+    def add(self, ids: list, documents: list, metadatas: list, embeddings):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(ids) == 0:
+            return
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        self._spools["embeddings"].write(embeddings.tobytes())
+        self._spools["sq_norms"].write(np.einsum("ij,ij->i", embeddings, embeddings).astype(np.float32).tobytes())
+        for chunk_id, text, meta in zip(ids, documents, metadatas):
+            for name, blob, offsets in (("ids", chunk_id, self._id_offsets), ("texts", text or "", self._text_offsets)):
+                data = blob.encode("utf-8")
+                self._spools[name].write(data)
+                offsets.append(offsets[-1] + len(data))
+            codes = {}
+            for key, value in (meta or {}).items():
+                column = self._columns.setdefault(key, {})
+                value_key = json.dumps(value)  # keeps 1, 1.0, "1" and True apart
+                if value_key not in column:
+                    column[value_key] = len(column)
+                    self._column_values.setdefault(key, []).append(value)
+                codes[key] = column[value_key]
+            self._row_codes.append(codes)
+        self.count += len(ids)
+
+    def close(self):
+        for spool in self._spools.values():
+            spool.close()
+        names = list(self._columns)
+        codes = np.full((self.count, len(names)), -1, dtype=np.int32)
+        for i, row in enumerate(self._row_codes):
+            for j, name in enumerate(names):
+                codes[i, j] = row.get(name, -1)
+        arrays = {
+            "id_offsets": np.asarray(self._id_offsets, dtype=np.uint64),
+            "text_offsets": np.asarray(self._text_offsets, dtype=np.uint64),
+            "meta_codes": codes,
+        }
+        order = ["embeddings", "sq_norms", "id_offsets", "ids", "text_offsets", "texts", "meta_codes"]
+        sizes = {name: self._spool_path(name).stat().st_size for name in self._spools}
+        sizes.update({name: array.nbytes for name, array in arrays.items()})
+
+        header = {
+            "format": FORMAT_VERSION,
+            "count": self.count,
+            "dim": self.dim or 0,
+            "index_version": self.index_version,
+            "embedding_model": self.embedding_model,
+            "meta_columns": [[name, self._column_values[name]] for name in names],
+            "sections": {},
+        }
+        # Section offsets depend on the header length, which depends on the offsets: pad the
+        # header to a fixed size computed with placeholder offsets of the final width.
+        header["sections"] = {name: [10 ** 15, sizes[name]] for name in order}
+        header_len = _align(len(MAGIC) + 8 + len(json.dumps(header).encode("utf-8"))) - len(MAGIC) - 8
+        offset = len(MAGIC) + 8 + header_len
+        for name in order:
+            header["sections"][name] = [offset, sizes[name]]
+            offset = _align(offset + sizes[name])
+        header_bytes = json.dumps(header).encode("utf-8").ljust(header_len, b" ")
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(header_len).tobytes())
+            f.write(header_bytes)
+            for name in order:
+                f.write(b"\0" * (header["sections"][name][0] - f.tell()))
+                if name in arrays:
+                    f.write(arrays[name].tobytes())
+                else:
+                    with open(self._spool_path(name), "rb") as spool:
+                        while True:
+                            block = spool.read(1 << 20)
+                            if not block:
+                                break
+                            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        for name in self._spools:
+            self._spool_path(name).unlink()
+        os.replace(tmp_path, self.path)
+        return self.path
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
@@ -0,0 +1,87 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Prometheus metrics shared by the API (GET /metrics) and the intake worker
+# (its own exposition port, see worker.py). Metric objects live in the default
+# registry of whichever process imports this module.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# ── API ──────────────────────────────────────────
+HTTP_REQUESTS = Counter(
+    "api_http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "api_http_request_duration_seconds", "HTTP request latency by route", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_STAGE_LATENCY = Histogram(
+    "chat_stage_duration_seconds", "Chat pipeline stage latency (services/timing.py)", ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# ── Ollama ───────────────────────────────────────
+OLLAMA_LATENCY = Histogram(
+    "ollama_request_duration_seconds", "Ollama call duration", ["operation"], buckets=LATENCY_BUCKETS
+)
+OLLAMA_ERRORS = Counter("ollama_errors_total", "Failed Ollama calls", ["operation"])
+
+# ── RAG ──────────────────────────────────────────
+RAG_LATENCY = Histogram(
+    "rag_retrieval_duration_seconds", "RAG retrieval duration (embed + query + rescoring)",
+    buckets=LATENCY_BUCKETS,
+)
+RAG_RESULTS = Histogram(
+    "rag_retrieval_results", "Citations returned per retrieval", buckets=(0, 1, 2, 3, 4, 5, 8)
+)
+RAG_ERRORS = Counter("rag_retrieval_errors_total", "Failed RAG retrievals")
+QUERY_EMBEDDING_CACHE = Counter(
+    "rag_query_embedding_cache_total", "Query embedding cache lookups", ["result"]
+)
+RAG_INDEX_SWAPS = Counter("rag_index_swaps_total", "RAG indexes swapped in without a restart")
+
+# ── OCR ──────────────────────────────────────────
+OCR_LATENCY = Histogram(
+    "ocr_duration_seconds", "OCR duration (OcrResult.timing_ms)", ["engine", "mode", "source"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# ── State gauges (evaluated at scrape time) ──────
+SESSION_STORE_SIZE = Gauge("session_store_sessions", "Sessions held by the chat session store")
+INTAKE_QUEUE_DEPTH = Gauge("intake_queue_depth", "Jobs waiting in the Redis intake queue")
+
+# ── Worker ───────────────────────────────────────
+WORKER_JOBS = Counter("intake_worker_jobs_total", "Intake jobs processed by the worker", ["status"])
+WORKER_STAGE_LATENCY = Histogram(
+    "intake_worker_stage_duration_seconds", "Intake job stage duration", ["stage"], buckets=LATENCY_BUCKETS
+)
+WORKER_FAILURES = Counter("intake_worker_failures_total", "Intake job failures by exception type", ["error"])
+
+
+@contextmanager
+def time_histogram(histogram, **labels):
+    """Observes the duration of the block (seconds) on a histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        target = histogram.labels(**labels) if labels else histogram
+        target.observe(time.perf_counter() - started)
+
+
+def observe_ocr(ocr_result, source: str):
+    """Records OcrResult.timing_ms (ms) as seconds."""
+    OCR_LATENCY.labels(engine=ocr_result.engine, mode=ocr_result.mode, source=source).observe(
+        ocr_result.timing_ms / 1000.0
+    )
+
+
+def observe_chat_stage(stage: str, duration_ms: float):
+    CHAT_STAGE_LATENCY.labels(stage=stage).observe(duration_ms / 1000.0)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Returns (body, content_type) for the Prometheus text exposition format."""
+    return generate_latest(), CONTENT_TYPE_LATEST
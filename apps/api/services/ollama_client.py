@@ -1,6 +1,13 @@
+import asyncio
 import httpx
+import json
 import logging
+import time
+from typing import AsyncIterator
 from config import settings
+from services.llm_cache import llm_cache, make_cache_key
+from services.singleflight import SingleFlight
+from services import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -9,45 +16,231 @@ class OllamaClient:
         self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.OLLAMA_MODEL
         self.timeout = settings.OLLAMA_TIMEOUT_SECONDS
+        self.options = {
+            "temperature": 0.0  # Deterministic for triage
+        }
+
+        # Shared, long-lived HTTP client (opened/closed by the FastAPI lifespan).
+        # Created lazily as well, so scripts and TestClient without lifespan still work.
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop = None
+        self._limits = httpx.Limits(
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        self._timeout = httpx.Timeout(
+            connect=settings.OLLAMA_CONNECT_TIMEOUT_SECONDS,
+            read=self.timeout,
+            write=self.timeout,
+            pool=self.timeout,
+        )
+
+        # Generation concurrency limit. Ollama serializes requests anyway, so
+        # queueing here keeps a connection free for health/readiness probes.
+        self._semaphore = asyncio.Semaphore(settings.OLLAMA_MAX_CONCURRENT_REQUESTS)
+        self._in_flight = 0
+        self._waiting = 0
+        self._peak_in_flight = 0
+        self._requests_total = 0
+
+        # Identical concurrent prompts share one generation
+        self.singleflight = SingleFlight("llm")
+
+    async def start(self):
+        """Opens the shared HTTP client (called on app startup)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self._limits,
+                timeout=self._timeout,
+            )
+            self._client_loop = asyncio.get_running_loop()
+
+    async def close(self):
+        """Closes the shared HTTP client and its pooled connections (called on app shutdown)."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Pooled connections are bound to the event loop that opened them
+        # (e.g. TestClient runs each request on its own loop), so reopen if it changed.
+        if self._client_loop is not asyncio.get_running_loop():
+            self._client = None
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        return self._client
+
+    async def _acquire(self):
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        self._requests_total += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def _release(self):
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    def pool_stats(self) -> dict:
+        """Connection pool and concurrency statistics (for /debug/stats)."""
+        open_connections = 0
+        idle_connections = 0
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        if pool is not None:
+            connections = list(getattr(pool, "connections", []))
+            open_connections = len(connections)
+            idle_connections = sum(1 for c in connections if c.is_idle())
+
+        return {
+            "client_open": self._client is not None and not self._client.is_closed,
+            "max_connections": self._limits.max_connections,
+            "max_keepalive_connections": self._limits.max_keepalive_connections,
+            "max_concurrent_requests": settings.OLLAMA_MAX_CONCURRENT_REQUESTS,
+            "open_connections": open_connections,
+            "idle_connections": idle_connections,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "peak_in_flight": self._peak_in_flight,
+            "requests_total": self._requests_total,
+        }
 
     async def check_health(self) -> bool:
         """Checks if Ollama is running."""
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                resp = await client.get(f"{self.base_url}/api/tags")
-                return resp.status_code == 200
+            client = await self._get_client()
+            resp = await client.get("/api/tags", timeout=5)
+            return resp.status_code == 200
         except Exception as e:
             logger.error(f"Ollama health check failed: {e}")
             return False
 
+    async def preload(self) -> bool:
+        """
+        Loads the model into Ollama's memory without generating anything
+        (empty prompt) and asks Ollama to keep it resident for OLLAMA_KEEP_ALIVE.
+        """
+        payload = {"model": self.model, "keep_alive": settings.OLLAMA_KEEP_ALIVE}
+        try:
+            client = await self._get_client()
+            resp = await client.post("/api/generate", json=payload)
+            resp.raise_for_status()
+            return True
+        except Exception as e:
+            logger.error(f"Ollama preload failed: {e}")
+            return False
+
     async def generate_response(self, messages: list) -> str:
         """
         Generates a response from Ollama.
         Returns the content string.
         Raises exceptions if Ollama is down or errors.
+        Answers are served from / stored in the deterministic response cache,
+        and identical concurrent calls are coalesced into one Ollama request.
         """
+        cached = await llm_cache.get(self.model, self.options, messages)
+        if cached is not None:
+            return cached
+
+        key = make_cache_key(self.model, self.options, messages)
+        return await self.singleflight.do(key, lambda: self._generate(messages))
+
+    async def _generate(self, messages: list) -> str:
         payload = {
             "model": self.model,
             "messages": messages,
             "stream": False,
-            "options": {
-                "temperature": 0.0  # Deterministic for triage
-            }
+            "options": self.options,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
         }
-        
-        url = f"{self.base_url}/api/chat"
-        
+
+        await self._acquire()
+        started = time.perf_counter()
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload)
+            client = await self._get_client()
+            response = await client.post("/api/chat", json=payload)
+            response.raise_for_status()
+            data = response.json()
+            content = data.get("message", {}).get("content", "")
+            metrics.OLLAMA_LATENCY.labels(operation="chat").observe(time.perf_counter() - started)
+            await llm_cache.set(self.model, self.options, messages, content)
+            return content
+        except httpx.ConnectError:
+            metrics.OLLAMA_ERRORS.labels(operation="chat").inc()
+            raise RuntimeError("Ollama is not running or not accessible.")
+        except httpx.TimeoutException:
+            metrics.OLLAMA_ERRORS.labels(operation="chat").inc()
+            raise RuntimeError("Ollama request timed out.")
+        except Exception as e:
+             metrics.OLLAMA_ERRORS.labels(operation="chat").inc()
+             raise RuntimeError(f"Ollama error: {str(e)}")
+        finally:
+            self._release()
+
+    async def stream_response(self, messages: list) -> AsyncIterator[str]:
+        """
+        Streams a response from Ollama, yielding content deltas as they arrive.
+        Same payload as generate_response, but with "stream": True (NDJSON frames).
+        Raises RuntimeError if Ollama is down or errors.
+        A cache hit is yielded as a single delta; a completed stream is cached.
+        """
+        cached = await llm_cache.get(self.model, self.options, messages)
+        if cached is not None:
+            yield cached
+            return
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "options": self.options,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+        }
+
+        parts = []
+        completed = False
+        await self._acquire()
+        started = time.perf_counter()
+        try:
+            client = await self._get_client()
+            async with client.stream("POST", "/api/chat", json=payload) as response:
                 response.raise_for_status()
-                data = response.json()
-                return data.get("message", {}).get("content", "")
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    frame = json.loads(line)
+                    if frame.get("error"):
+                        raise RuntimeError(f"Ollama error: {frame['error']}")
+                    delta = frame.get("message", {}).get("content", "")
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                    if frame.get("done"):
+                        completed = True
+                        break
+        except RuntimeError:
+            metrics.OLLAMA_ERRORS.labels(operation="chat_stream").inc()
+            raise
         except httpx.ConnectError:
+            metrics.OLLAMA_ERRORS.labels(operation="chat_stream").inc()
             raise RuntimeError("Ollama is not running or not accessible.")
         except httpx.TimeoutException:
+            metrics.OLLAMA_ERRORS.labels(operation="chat_stream").inc()
             raise RuntimeError("Ollama request timed out.")
         except Exception as e:
+             metrics.OLLAMA_ERRORS.labels(operation="chat_stream").inc()
              raise RuntimeError(f"Ollama error: {str(e)}")
+        finally:
+            self._release()
+
+        # Only cache complete answers (not streams cut short by the client or an error)
+        if completed:
+            metrics.OLLAMA_LATENCY.labels(operation="chat_stream").observe(time.perf_counter() - started)
+            await llm_cache.set(self.model, self.options, messages, "".join(parts))
 
 ollama_client = OllamaClient()
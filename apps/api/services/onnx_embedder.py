@@ -0,0 +1,80 @@
+import json
+import pathlib
+
+import numpy as np
+
+# Sentence embeddings through ONNX Runtime instead of PyTorch (EMBEDDING_BACKEND=onnx).
+#
+# scripts/export_onnx_embedder.py exports the SentenceTransformer model (transformer
+# + mean pooling + L2 normalize), quantizes its weights to int8 and writes:
+#
+#   rag/models/<model>-onnx-int8/model.onnx       token_ids, attention_mask -> token embeddings
+#   rag/models/<model>-onnx-int8/tokenizer.json   the model's fast tokenizer
+#   rag/models/<model>-onnx-int8/embedder.json    model name, pooling, normalize, max_seq_length
+#
+# Runtime needs only onnxruntime and tokenizers (both already installed as chromadb
+# dependencies), so the API process never imports torch on this backend.
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent.parent.parent
+MODELS_DIR = REPO_ROOT / "rag" / "models"
+CONFIG_FILE = "embedder.json"
+
+
+def default_model_dir(model_name: str) -> str:
+    return str(MODELS_DIR / f"{model_name}-onnx-int8")
+
+
+class OnnxEmbedder:
+    """Drop-in for the SentenceTransformer.encode() calls made by RAGService and ingestion."""
+
+    def __init__(self, model_dir: str, threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        path = pathlib.Path(model_dir)
+        with open(path / CONFIG_FILE, "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.model_name = self.config["model"]
+        self.normalize = self.config.get("normalize", True)
+        self.max_seq_length = self.config.get("max_seq_length", 256)
+
+        self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.config.get("pad_token_id", 0))
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(path / self.config.get("onnx_file", "model.onnx")), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens (sentence_transformers Pooling, mode "mean")
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        embeddings = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """One vector for a string, a (n, dim) array for a list (like SentenceTransformer.encode)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.config.get("dimension", 0)), dtype=np.float32)
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        embeddings = np.concatenate(batches)
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,138 @@
+import json
+import os
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from config import settings
+from services import metrics
+
+# Query embedding cache for RAGService.
+#
+# Tag expansion appends fixed strings ("temperature duration red flags", ...) to
+# short user messages, so the expanded queries repeat a lot, and each MiniLM
+# encode costs several ms of CPU (partly holding the GIL). Vectors are kept in a
+# bounded LRU keyed by (model ID, exact expanded query) as read-only float32
+# arrays (1.5 KiB each for 384 dims), and optionally saved to an .npz on shutdown
+# so a restart starts warm. Entries for another model ID are ignored on load.
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent.parent.parent
+DEFAULT_CACHE_PATH = str(REPO_ROOT / "data" / "cache" / "query_embeddings.npz")
+
+
+class QueryEmbeddingCache:
+    def __init__(self):
+        self.enabled = settings.QUERY_EMBEDDING_CACHE_ENABLED
+        self.max_entries = settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES
+        self.persist = settings.QUERY_EMBEDDING_CACHE_PERSIST
+        self.path = settings.QUERY_EMBEDDING_CACHE_PATH or DEFAULT_CACHE_PATH
+        # Pool threads embed concurrently
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _freeze(vector) -> np.ndarray:
+        v = np.array(vector, dtype=np.float32).ravel()
+        v.flags.writeable = False  # shared between requests
+        return v
+
+    def get(self, model_id: str, text: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        key = (model_id, text)
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        metrics.QUERY_EMBEDDING_CACHE.labels(result="miss" if vector is None else "hit").inc()
+        return vector
+
+    def put(self, model_id: str, text: str, vector) -> np.ndarray:
+        vector = self._freeze(vector)
+        if not self.enabled:
+            return vector
+        with self._lock:
+            self._data[(model_id, text)] = vector
+            self._data.move_to_end((model_id, text))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return vector
+
+    def get_or_embed(self, model_id: str, text: str, encode: Callable) -> np.ndarray:
+        """Cached vector for `text`, or encode(text) stored for next time."""
+        vector = self.get(model_id, text)
+        if vector is None:
+            vector = self.put(model_id, text, encode(text))
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def save(self):
+        """Persists entries (LRU order preserved) for a warm restart."""
+        if not self.enabled or not self.persist:
+            return
+        with self._lock:
+            items = list(self._data.items())
+        if not items:
+            return
+        try:
+            keys = [list(key) for key, _ in items]
+            embeddings = np.stack([v for _, v in items]).astype(np.float32)
+            path = pathlib.Path(self.path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp.npz")
+            np.savez(tmp_path, embeddings=embeddings, keys=np.array(json.dumps(keys)))
+            os.replace(tmp_path, path)
+            print(f"[QueryEmbeddingCache] Saved {len(items)} entries to {path}")
+        except Exception as e:
+            print(f"[QueryEmbeddingCache] Failed to save: {e}")
+
+    def load(self, model_id: str):
+        """Loads persisted vectors computed by `model_id` (others are stale and skipped)."""
+        if not self.enabled or not self.persist or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                embeddings = data["embeddings"]
+                keys = json.loads(str(data["keys"]))
+            loaded = 0
+            for (key_model, text), vector in zip(keys, embeddings):
+                if key_model == model_id:
+                    self.put(key_model, text, vector)
+                    loaded += 1
+            print(f"[QueryEmbeddingCache] Loaded {loaded} entries from {self.path}")
+        except Exception as e:
+            print(f"[QueryEmbeddingCache] Failed to load {self.path}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._data)
+            nbytes = sum(v.nbytes for v in self._data.values())
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "vector_bytes": nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "persist": self.persist,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache()
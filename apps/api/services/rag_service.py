@@ -1,16 +1,329 @@
 
+import asyncio
+import contextvars
 import chromadb
-from sentence_transformers import SentenceTransformer
 import os
 import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config import settings
+from services.timing import timing
+from services import metrics
+from services.index_pointer import INDEX_ROOT, current_index_dir, pointer_mtime
+from services.mapped_index import MAPPED_INDEX_FILE, MappedIndex
+from services.query_embedding_cache import query_embedding_cache
+from services.retrieval_cache import read_index_info, retrieval_cache
+from services.semantic_cache import semantic_cache
 
 # Configuration
 # Compute Repo Root robustly: this file is in apps/api/services/rag_service.py
 # Root is 3 levels up: apps/api/services -> apps/api -> apps -> root
 FILE_DIR = pathlib.Path(__file__).parent.resolve()
 REPO_ROOT = FILE_DIR.parent.parent.parent
-INDEX_PATH = str(REPO_ROOT / "rag" / "index" / "chroma")
+# Index served at startup; rag/index/CURRENT can later point elsewhere (services/index_pointer.py)
+INDEX_PATH = current_index_dir(INDEX_ROOT)
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Size of the dedicated pool that runs model loading, embedding and Chroma queries
+RAG_THREADS = int(os.getenv("RAG_THREADS", "2"))
+
+# Phase 4: Scoring & Filtering
+# RELEVANCE FILTER (Threshold 1.28, squared L2 as Chroma reports it)
+# "Fever" query -> distance ~0.74 (Relevant)
+# "Headache" -> distance ~1.16
+# "Rash" query -> distance ~1.29 (Irrelevant/Hallucination)
+MAX_DISTANCE = 1.28
+# Synthetic Score for Sorting: 2.0 - dist (higher is better) + boosts
+TRUSTED_ORGS = ("NHS", "WHO", "CDC", "NICE")
+TRUSTED_BOOST = 0.5
+TAG_BOOST = 0.3  # per symptom tag found in the chunk's tags
+TOP_RESULTS = 5
+FROM_CHROMA_PAGE = 5000
+
+
+class ChromaVectorStore:
+    """Chroma (sqlite + HNSW) search with the rescoring done per candidate in Python."""
+
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get(self, ids: list) -> list:
+        """[(chunk_id, text, metadata)] for the IDs still in the index."""
+        results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        return list(zip(results["ids"], results["documents"], results["metadatas"]))
+
+    def search(self, query_vector, k: int, symptom_tags: list = None) -> list:
+        """Top TOP_RESULTS of the k nearest chunks: [{"id", "text", "metadata", "score", "dist"}]."""
+        results = self.collection.query(
+            query_embeddings=[query_vector.tolist()],
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+        if not results["ids"] or not results["ids"][0]:
+            return []
+
+        scored_results = []
+        count = len(results["ids"][0])
+        for i in range(count):
+            meta = results["metadatas"][0][i]
+            doc_id = results["ids"][0][i]
+            text = results["documents"][0][i]
+            dist = results["distances"][0][i] # L2 distance
+
+            if dist > MAX_DISTANCE:
+                continue
+
+            score = 2.0 - dist
+
+            # Boost for Trusted Org
+            org = meta.get("org", "Unknown")
+            if org in TRUSTED_ORGS:
+                score += TRUSTED_BOOST
+
+            # Boost for tag overlap
+            doc_tags = meta.get("tags", "").split(",")
+            if symptom_tags:
+                for tag in symptom_tags:
+                    if tag in doc_tags:
+                        score += TAG_BOOST
+
+            scored_results.append({
+                "id": doc_id,
+                "text": text,
+                "metadata": meta,
+                "score": score,
+                "dist": dist
+            })
+
+        # Sort by new score descending
+        scored_results.sort(key=lambda x: x["score"], reverse=True)
+        return scored_results[:TOP_RESULTS]
+
+
+class NumpyVectorStore:
+    """
+    Exact search over every chunk held in one contiguous float32 matrix (may be a
+    read-only memmap). Distances for all chunks are one matrix-vector product;
+    the relevance filter and boosts are array operations on the top k, with org
+    trust precomputed per chunk and tags pre-parsed into per-chunk bitsets.
+    Same ranking as ChromaVectorStore, minus HNSW's approximation.
+    """
+
+    name = "numpy"
+
+    def __init__(self, ids: list, documents: list, metadatas: list, embeddings):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = [m or {} for m in metadatas]
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.embeddings.ndim != 2 or len(self.embeddings) != len(self.ids):
+            raise ValueError(f"Expected {len(self.ids)} embedding rows, got shape {self.embeddings.shape}")
+        self._positions = None  # chunk_id -> row, built on first get()
+        # |x|^2 per chunk, so ||x - q||^2 = |x|^2 - 2 x.q + |q|^2 needs a single matvec
+        self._sq_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+        rows = np.arange(len(self.ids))
+        self._index_boosts([m.get("org", "Unknown") for m in self.metadatas], rows,
+                           [m.get("tags", "") for m in self.metadatas], rows)
+
+    def _index_boosts(self, orgs: list, org_rows, tag_strings: list, tag_rows):
+        """
+        Per-chunk trust flags and tag bitsets from distinct org / tags values and
+        each chunk's index into them (every chunk its own value, or a column code).
+        """
+        self._trusted = np.array([org in TRUSTED_ORGS for org in orgs], dtype=bool)[org_rows]
+
+        # Tag bitsets: bit j of row i set <=> tag j in chunk i's comma-separated tags
+        self._tag_bits_index = {}
+        split_tags = [tags.split(",") for tags in tag_strings]
+        for tags in split_tags:
+            for tag in tags:
+                self._tag_bits_index.setdefault(tag, len(self._tag_bits_index))
+        flags = np.zeros((len(split_tags), max(len(self._tag_bits_index), 1)), dtype=bool)
+        for i, tags in enumerate(split_tags):
+            flags[i, [self._tag_bits_index[t] for t in tags]] = True
+        self._tag_bits = np.packbits(flags, axis=1)[tag_rows]
+
+    @classmethod
+    def from_mapped(cls, mapped) -> "NumpyVectorStore":
+        """
+        Store over a MappedIndex (services/mapped_index.py) without copying it: vectors
+        and norms stay in the shared memmap, texts / metadata are decoded per result.
+        """
+        store = cls.__new__(cls)
+        store.ids, store.documents, store.metadatas = mapped.ids, mapped.documents, mapped.metadatas
+        store.embeddings, store._sq_norms = mapped.embeddings, mapped.sq_norms
+        store._positions = None
+        # Code -1 (key absent) selects the appended default, as m.get(key, default) does
+        orgs, org_codes = mapped.metadatas.column("org")
+        tag_strings, tag_codes = mapped.metadatas.column("tags")
+        store._index_boosts(list(orgs) + ["Unknown"], org_codes, list(tag_strings) + [""], tag_codes)
+        return store
+
+    @classmethod
+    def from_chroma(cls, collection) -> "NumpyVectorStore":
+        ids, documents, metadatas, blocks = [], [], [], []
+        # Paged: one big get() exceeds sqlite's bound-variable limit on large indexes
+        for offset in range(0, collection.count(), FROM_CHROMA_PAGE):
+            page = collection.get(include=["documents", "metadatas", "embeddings"],
+                                  limit=FROM_CHROMA_PAGE, offset=offset)
+            ids += page["ids"]
+            documents += page["documents"]
+            metadatas += page["metadatas"]
+            blocks.append(np.asarray(page["embeddings"], dtype=np.float32))
+        embeddings = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+        return cls(ids, documents, metadatas, embeddings)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def get(self, ids: list) -> list:
+        if self._positions is None:
+            self._positions = {cid: i for i, cid in enumerate(self.ids)}
+        found = [self._positions[cid] for cid in ids if cid in self._positions]
+        return [(self.ids[i], self.documents[i], self.metadatas[i]) for i in found]
+
+    def _has_tag(self, rows: np.ndarray, tag: str) -> np.ndarray:
+        bit = self._tag_bits_index.get(tag)
+        if bit is None:
+            return np.zeros(len(rows), dtype=bool)
+        return (self._tag_bits[rows, bit >> 3] >> (7 - (bit & 7))) & 1 == 1
+
+    def search(self, query_vector, k: int, symptom_tags: list = None) -> list:
+        n = len(self.ids)
+        if n == 0:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32).ravel()
+        dist = self._sq_norms - 2.0 * (self.embeddings @ q) + float(q @ q)
+        np.maximum(dist, 0.0, out=dist)
+
+        k = min(k, n)
+        rows = np.argpartition(dist, k - 1)[:k] if k < n else np.arange(n)
+        rows = rows[np.argsort(dist[rows], kind="stable")]  # nearest first, as Chroma returns them
+        rows = rows[dist[rows] <= MAX_DISTANCE]
+
+        score = 2.0 - dist[rows] + TRUSTED_BOOST * self._trusted[rows]
+        for tag in symptom_tags or ():
+            score += TAG_BOOST * self._has_tag(rows, tag)
+        order = np.argsort(-score, kind="stable")[:TOP_RESULTS]
+
+        return [
+            {
+                "id": self.ids[i],
+                "text": self.documents[i],
+                "metadata": self.metadatas[i],
+                "score": float(score[j]),
+                "dist": float(dist[i]),
+            }
+            for j, i in ((j, int(rows[j])) for j in order)
+        ]
+
+
+def open_vector_store(collection):
+    """
+    Search backend over the Chroma collection, chosen by RAG_VECTOR_STORE.
+    "auto" uses exact NumPy search up to RAG_NUMPY_MAX_CHUNKS chunks: it is faster
+    than HNSW on small corpora, but scans every vector per query, so HNSW wins on
+    large ones (scripts/bench_vector_store.py).
+    """
+    backend = settings.RAG_VECTOR_STORE
+    if backend == "auto":
+        backend = "numpy" if collection.count() <= settings.RAG_NUMPY_MAX_CHUNKS else "chroma"
+    if backend == "numpy":
+        store = NumpyVectorStore.from_chroma(collection)
+        print(f"[RAG] NumPy vector store: {store.count()} chunks, {store.embeddings.nbytes / 1024:.0f} KiB of vectors")
+        return store
+    return ChromaVectorStore(collection)
+
+
+def open_mapped_store(index_path: str):
+    """
+    NumpyVectorStore over <index>/mapped_index.bin when RAG_VECTOR_STORE allows NumPy
+    search for its size, else None (-> Chroma). Never opens sqlite, so it works on
+    read-only mounts, and the vectors are shared between processes via the page cache.
+    """
+    path = os.path.join(index_path, MAPPED_INDEX_FILE)
+    if not settings.RAG_MAPPED_INDEX or settings.RAG_VECTOR_STORE == "chroma" or not os.path.exists(path):
+        return None
+    try:
+        mapped = MappedIndex(path)
+    except Exception as e:
+        print(f"[RAG] Ignoring {path}: {e}")
+        return None
+    if mapped.version != read_index_info(index_path).get("version"):
+        print(f"[RAG] Ignoring {path}: written for index version {mapped.version}")
+        return None
+    if settings.RAG_VECTOR_STORE == "auto" and mapped.count > settings.RAG_NUMPY_MAX_CHUNKS:
+        return None
+    store = NumpyVectorStore.from_mapped(mapped)
+    print(f"[RAG] Mapped NumPy vector store: {store.count()} chunks from {path}")
+    return store
+
+
+def embedding_model_id() -> str:
+    """Identifies the vectors the configured backend produces (keys the query embedding cache)."""
+    if settings.EMBEDDING_BACKEND == "onnx":
+        return f"{EMBEDDING_MODEL}:onnx-int8"
+    return EMBEDDING_MODEL
+
+
+def load_embedder():
+    """
+    Query encoder selected by EMBEDDING_BACKEND: "torch" (SentenceTransformer) or
+    "onnx" (int8 ONNX Runtime export, services/onnx_embedder.py). Imported lazily so
+    the ONNX backend never loads torch.
+    """
+    if settings.EMBEDDING_BACKEND == "onnx":
+        from services.onnx_embedder import OnnxEmbedder, default_model_dir
+        model_dir = settings.EMBEDDING_ONNX_DIR or default_model_dir(EMBEDDING_MODEL)
+        print(f"Loading ONNX embedding model from {model_dir}")
+        return OnnxEmbedder(model_dir, threads=settings.EMBEDDING_ONNX_THREADS)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+class IndexSnapshot:
+    """
+    One opened index (Chroma client + vector store, or only a store over the
+    memory-mapped export). Swapped read-copy-update: retrievals pin the snapshot
+    they started on, a swap only replaces the service's pointer, and a retired
+    snapshot is closed when its last reader leaves.
+    """
+
+    def __init__(self, path: str, client, collection, store):
+        self.path = path
+        self.client = client
+        self.collection = collection
+        self.store = store
+        info = read_index_info(path)
+        self.version = info.get("version")
+        self.embedding_model = info.get("embedding_model")
+        self.readers = 0  # guarded by RAGService._index_lock
+        self.retired = False
+
+    @classmethod
+    def open(cls, path: str) -> "IndexSnapshot":
+        store = open_mapped_store(path)
+        if store is not None:
+            return cls(path, None, None, store)
+        client = chromadb.PersistentClient(path=path)
+        collection = client.get_collection(name="medical_docs")
+        return cls(path, client, collection, open_vector_store(collection))
+
+    def close(self):
+        close = getattr(self.client, "close", None)  # chromadb >= 1.x
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"[RAG] Error closing index {self.path}: {e}")
+        print(f"[RAG] Closed index {self.path}")
+
 
 class RAGIndexMissingError(Exception):
     pass
@@ -20,13 +333,82 @@ class RAGRetrievalError(Exception):
 
 class RAGService:
     def __init__(self):
-        self.client = None
-        self.collection = None
         self.embedder = None
+        # Keys cached query vectors; vectors from another model are never reused
+        self.embedding_model_id = embedding_model_id()
         self.initialized = False
+        self.index_root = INDEX_ROOT
         self.index_path = INDEX_PATH
+        # Current IndexSnapshot; replaced (never mutated) by swap_index()
+        self._index = None
+        self._index_lock = threading.Lock()  # snapshot reader counts
+        self._reload_lock = threading.Lock()  # one reload at a time
+        self._draining = []  # retired snapshots still pinned by retrievals
+        self._pointer_mtime = None
+        self._pointer_checked_at = 0.0
+        self.poll_seconds = settings.RAG_INDEX_POLL_SECONDS
+        self.swaps = 0
+        # CPU-bound work (SentenceTransformer encode, Chroma sqlite/HNSW) runs here,
+        # never on the asyncio event loop. Bounded so it can't starve the process.
+        self._executor = ThreadPoolExecutor(max_workers=RAG_THREADS, thread_name_prefix="rag")
+        self._init_lock = threading.Lock()
+        # chunk_id -> formatted citation, filled by retrieval. Bounded by the index
+        # size; lets session history store citation IDs instead of copies.
+        self._citations = {}
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Carry the request context (stage timing trace) into the pool thread
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, lambda: ctx.run(fn, *args, **kwargs))
+
+    async def ainitialize(self):
+        """Async initialize(): loads the model and index on the RAG thread pool."""
+        if self.initialized:
+            return
+        await self._run(self.initialize)
+
+    async def aretrieve(self, query: str, symptom_tags: list = None, k: int = 8):
+        """Async retrieve(): embedding + Chroma query run on the RAG thread pool."""
+        return await self._run(self.retrieve, query, symptom_tags=symptom_tags, k=k)
+
+    async def aretrieve_with_embedding(self, query: str, symptom_tags: list = None, k: int = 8):
+        """Async retrieve_with_embedding(), run on the RAG thread pool."""
+        return await self._run(self.retrieve_with_embedding, query, symptom_tags=symptom_tags, k=k)
+
+    async def aembed_query(self, text: str, use_cache: bool = True):
+        """Async embed_query(), run on the RAG thread pool."""
+        return await self._run(self.embed_query, text, use_cache=use_cache)
+
+    async def areload(self) -> dict:
+        """Async reload(), run on the RAG thread pool."""
+        return await self._run(self.reload)
+
+    # Current snapshot's parts (None until initialized)
+    @property
+    def client(self):
+        return self._index.client if self._index else None
+
+    @property
+    def collection(self):
+        return self._index.collection if self._index else None
+
+    @property
+    def store(self):
+        return self._index.store if self._index else None
+
+    @property
+    def index_version(self):
+        return self._index.version if self._index else None
 
     def initialize(self):
+        if self.initialized:
+            return
+        # Pool threads may race to initialize; only one loads the model
+        with self._init_lock:
+            self._initialize()
+
+    def _initialize(self):
         if self.initialized:
             return
         
@@ -38,11 +420,12 @@ class RAGService:
                 # retrieve() will check this and raise specific error
                 return
 
-            self.client = chromadb.PersistentClient(path=self.index_path)
-            self.collection = self.client.get_collection(name="medical_docs")
-            
+            self._pointer_mtime = pointer_mtime(self.index_root)
+            snapshot = IndexSnapshot.open(self.index_path)
+
             print("Loading Embedding Model...")
-            self.embedder = SentenceTransformer(EMBEDDING_MODEL)
+            self.embedder = load_embedder()
+            self.swap_index(snapshot)
             self.initialized = True
             print("RAG Service Initialized Successfully.")
         except Exception as e:
@@ -53,7 +436,185 @@ class RAGService:
         """Returns True if initialized and functional."""
         return self.initialized
 
+    # ── Index hot swap ──────────────────────────
+    def _acquire(self) -> IndexSnapshot:
+        with self._index_lock:
+            snapshot = self._index
+            snapshot.readers += 1
+        return snapshot
+
+    def _release(self, snapshot: IndexSnapshot):
+        with self._index_lock:
+            snapshot.readers -= 1
+            drained = snapshot.retired and snapshot.readers == 0
+            if drained:
+                self._draining.remove(snapshot)
+        if drained:
+            snapshot.close()
+
+    def swap_index(self, snapshot: IndexSnapshot):
+        """
+        Makes `snapshot` the index new retrievals use. Retrievals already running
+        finish on the previous one, which is closed once they have all returned.
+        """
+        with self._index_lock:
+            previous, self._index = self._index, snapshot
+            self.index_path = snapshot.path
+            # Citations may have changed with the index
+            self._citations = {}
+            drained = False
+            if previous is not None:
+                previous.retired = True
+                drained = previous.readers == 0
+                if not drained:
+                    self._draining.append(previous)
+                self.swaps += 1
+        # Results cached for the previous version are dropped (and never match snapshot.version)
+        retrieval_cache.set_index(snapshot.path)
+        semantic_cache.set_index_version(snapshot.version)
+        if previous is not None:
+            print(f"[RAG] Serving index {snapshot.path} (version {snapshot.version})")
+        if drained:
+            previous.close()
+
+    def reload(self) -> dict:
+        """
+        Opens the index rag/index/CURRENT points to and swaps it in, if it is not
+        the one being served. The old index keeps serving while the new one loads.
+        """
+        if not self.initialized:
+            self.initialize()
+            return {**self.index_stats(), "status": "initialized" if self.initialized else "not_initialized"}
+        if not self._reload_lock.acquire(blocking=False):
+            return {**self.index_stats(), "status": "reload_in_progress"}
+        try:
+            path = current_index_dir(self.index_root)
+            if path == self._index.path:
+                return {**self.index_stats(), "status": "unchanged"}
+            info = read_index_info(path)
+            model = info.get("embedding_model")
+            if model and model != self.embedding_model_id:
+                print(f"[RAG] Not swapping to {path}: built with {model}, queries use {self.embedding_model_id}")
+                return {**self.index_stats(), "status": "embedding_model_mismatch"}
+            print(f"[RAG] Opening index {path}")
+            try:
+                snapshot = IndexSnapshot.open(path)
+            except Exception as e:
+                print(f"[RAG] Failed to open index {path}: {e}")
+                return {**self.index_stats(), "status": "failed", "error": str(e)}
+            self.swap_index(snapshot)
+            metrics.RAG_INDEX_SWAPS.inc()
+            return {**self.index_stats(), "status": "swapped"}
+        finally:
+            self._reload_lock.release()
+
+    def _poll_index_pointer(self):
+        """Starts a background reload when rag/index/CURRENT changed (stat at most every poll_seconds)."""
+        now = time.monotonic()
+        if not self.poll_seconds or now - self._pointer_checked_at < self.poll_seconds:
+            return
+        self._pointer_checked_at = now
+        mtime = pointer_mtime(self.index_root)
+        if mtime != self._pointer_mtime:
+            self._pointer_mtime = mtime
+            threading.Thread(target=self.reload, name="rag-reload", daemon=True).start()
+
+    def index_stats(self) -> dict:
+        with self._index_lock:
+            snapshot = self._index
+            draining = [s.path for s in self._draining]
+        return {
+            "index_path": self.index_path,
+            "index_version": snapshot.version if snapshot else None,
+            "chunks": snapshot.store.count() if snapshot else 0,
+            "store": snapshot.store.name if snapshot else None,
+            "readers": snapshot.readers if snapshot else 0,
+            "draining": draining,
+            "swaps": self.swaps,
+        }
+
+    def embed_query(self, text: str, use_cache: bool = True):
+        """Query embedding (read-only float32 array), from the query embedding cache when possible."""
+        if not use_cache:
+            return self.embedder.encode(text)
+        return query_embedding_cache.get_or_embed(self.embedding_model_id, text, self.embedder.encode)
+
     def retrieve(self, query: str, symptom_tags: list = None, k: int = 8):
+        results, _, _ = self.retrieve_with_embedding(query, symptom_tags=symptom_tags, k=k)
+        return results
+
+    def retrieve_with_embedding(self, query: str, symptom_tags: list = None, k: int = 8):
+        """
+        Same as retrieve(), but returns (results, query embedding, index version): the
+        embedding (numpy array) lets callers (e.g. the semantic answer cache) skip
+        re-encoding, the version identifies the index snapshot the results came from.
+        """
+        try:
+            with metrics.time_histogram(metrics.RAG_LATENCY):
+                results, query_vector, index_version = self._retrieve(query, symptom_tags=symptom_tags, k=k)
+        except Exception:
+            metrics.RAG_ERRORS.inc()
+            raise
+        metrics.RAG_RESULTS.observe(len(results))
+        return results, query_vector, index_version
+
+    @staticmethod
+    def expand_query(query: str, symptom_tags: list = None) -> str:
+        # Phase 4: Query Expansion
+        # Append symptom tags to query for better semantic matching
+        expanded_query = query
+        if symptom_tags:
+            tags_str = " ".join(symptom_tags)
+            expanded_query = f"{query} {tags_str}"
+            # Deterministic expansion for common symptoms
+            if "fever" in symptom_tags or "temperature" in query.lower():
+                expanded_query += " temperature duration red flags"
+            if "cough" in symptom_tags:
+                expanded_query += " shortness of breath chest pain duration"
+        return expanded_query
+
+    @staticmethod
+    def _format_citation(doc_id: str, text: str, meta: dict) -> dict:
+        return {
+            "id": doc_id,
+            "title": meta.get("title", "Unknown Source"),
+            "org": meta.get("org", "Unknown"),
+            "source_type": meta.get("doc_type", "reference"),
+            "date_accessed": meta.get("date_accessed", "N/A"),
+            "source_url": meta.get("url", ""),
+            "snippet": text[:240] + "...", # Limit snippet length
+            "full_text": text
+        }
+
+    def get_citations(self, chunk_ids: list) -> dict:
+        """
+        Resolves chunk IDs to citations (same format as retrieve()), from the
+        retrieval cache or the index. IDs no longer in the index are left out.
+        """
+        found = {cid: self._citations[cid] for cid in chunk_ids if cid in self._citations}
+        missing = [cid for cid in chunk_ids if cid not in found]
+        if not missing:
+            return found
+        self.initialize()
+        if not self.initialized:
+            print("[RAG] Cannot resolve citations: index not initialized")
+            return found
+        snapshot = self._acquire()
+        try:
+            for doc_id, text, meta in snapshot.store.get(missing):
+                citation = self._format_citation(doc_id, text, meta or {})
+                if not snapshot.retired:
+                    self._citations[doc_id] = citation
+                found[doc_id] = citation
+        finally:
+            self._release(snapshot)
+        return found
+
+    async def aget_citations(self, chunk_ids: list) -> dict:
+        """Async get_citations(), run on the RAG thread pool."""
+        return await self._run(self.get_citations, chunk_ids)
+
+    def _retrieve(self, query: str, symptom_tags: list = None, k: int = 8):
         # 1. Check Index Existence
         if not self.initialized:
             # Try to init one last time
@@ -65,100 +626,43 @@ class RAGService:
                 else:
                      raise RAGRetrievalError("RAG service failed to initialize (possibly locked or corrupted).")
         
+        self._poll_index_pointer()
+        snapshot = self._acquire()
         try:
-            # Phase 4: Query Expansion
-            # Append symptom tags to query for better semantic matching
-            expanded_query = query
-            if symptom_tags:
-                tags_str = " ".join(symptom_tags)
-                expanded_query = f"{query} {tags_str}"
-                # Deterministic expansion for common symptoms
-                if "fever" in symptom_tags or "temperature" in query.lower():
-                    expanded_query += " temperature duration red flags"
-                if "cough" in symptom_tags:
-                    expanded_query += " shortness of breath chest pain duration"
-            
+            expanded_query = self.expand_query(query, symptom_tags)
             print(f"[RAG] Expanded Query: {expanded_query}")
 
+            # Same inputs on the same index version -> same results (skips embed + query + rescoring)
+            cache_key = retrieval_cache.key(expanded_query, symptom_tags, k)
+            if cache_key is not None and cache_key[0] != snapshot.version:
+                cache_key = None  # mid-swap: the cache already tracks another index
+            cached = retrieval_cache.get(cache_key)
+            if cached is not None:
+                return (*cached, snapshot.version)
+
             # Embed query
-            query_embed = self.embedder.encode(expanded_query).tolist()
-            
-            # Query Chroma (Include distances for relevance check)
-            results = self.collection.query(
-                query_embeddings=[query_embed],
-                n_results=k,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            if not results["ids"] or not results["ids"][0]:
-                return []
-
-            # Phase 4: Scoring & Filtering
-            scored_results = []
-            
-            count = len(results["ids"][0])
-            for i in range(count):
-                meta = results["metadatas"][0][i]
-                doc_id = results["ids"][0][i]
-                text = results["documents"][0][i]
-                dist = results["distances"][0][i] # L2 distance
-                
-                # RELEVANCE FILTER (Threshold 1.28)
-                # "Fever" query -> distance ~0.74 (Relevant)
-                # "Headache" -> distance ~1.16
-                # "Rash" query -> distance ~1.29 (Irrelevant/Hallucination)
-                if dist > 1.28:
-                    continue
-                
-                # Synthetic Score for Sorting (Combine distance + boosts)
-                # Base score = 2.0 - dist (Higher is better)
-                score = 2.0 - dist
-                
-                # Boost for Trusted Org
-                org = meta.get("org", "Unknown")
-                if org in ["NHS", "WHO", "CDC", "NICE"]:
-                    score += 0.5
-                
-                # Boost for tag overlap
-                doc_tags = meta.get("tags", "").split(",")
-                if symptom_tags:
-                    for tag in symptom_tags:
-                        if tag in doc_tags:
-                            score += 0.3
-                            
-                scored_results.append({
-                    "id": doc_id,
-                    "text": text,
-                    "metadata": meta,
-                    "score": score,
-                    "dist": dist
-                })
-            
-            # Sort by new score descending
-            scored_results.sort(key=lambda x: x["score"], reverse=True)
-            
-            # Take top N (e.g. 5)
-            final_results = scored_results[:5]
+            with timing.stage("embed"):
+                query_vector = self.embed_query(expanded_query)
+
+            # Nearest chunks + relevance filter, trust / tag boosts, top N (vector store)
+            with timing.stage("vector_query"):
+                final_results = snapshot.store.search(query_vector, k, symptom_tags)
 
             # Format results
             formatted_results = []
             for item in final_results:
-                citation = {
-                    "id": item["id"],
-                    "title": item["metadata"].get("title", "Unknown Source"),
-                    "org": item["metadata"].get("org", "Unknown"),
-                    "source_type": item["metadata"].get("doc_type", "reference"),
-                    "date_accessed": item["metadata"].get("date_accessed", "N/A"),
-                    "source_url": item["metadata"].get("url", ""),
-                    "snippet": item["text"][:240] + "...", # Limit snippet length
-                    "full_text": item["text"]
-                }
+                citation = self._format_citation(item["id"], item["text"], item["metadata"])
+                if not snapshot.retired:  # swapped out mid-retrieval: don't mix into the new index's citations
+                    self._citations[item["id"]] = citation
                 formatted_results.append(citation)
-                
-            return formatted_results
+
+            retrieval_cache.put(cache_key, formatted_results, query_vector)
+            return formatted_results, query_vector, snapshot.version
 
         except Exception as e:
             print(f"Retrieval error: {e}")
             raise RAGRetrievalError(str(e))
+        finally:
+            self._release(snapshot)
 
 rag_service = RAGService()
@@ -11,6 +11,14 @@ QUEUE_KEY = "intake:queue"
 def get_redis_client():
     return redis.Redis.from_url(REDIS_URL, decode_responses=True)
 
+def get_queue_depth() -> int | None:
+    """Number of jobs waiting in the intake queue (None if Redis is unreachable)."""
+    try:
+        r = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+        return r.llen(QUEUE_KEY)
+    except redis.exceptions.RedisError:
+        return None
+
 def create_job(file_path: str, original_filename: str, options: dict) -> str:
     """Creates a job, saves initial state, and enqueues it."""
     r = get_redis_client()
@@ -0,0 +1,173 @@
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+# Retrieval result cache for RAGService.
+#
+# For a given index, (expanded query, symptom tags, k) always produces the same
+# formatted citations: same embedding, same Chroma neighbours, same rescoring.
+# A hit skips the embed, the Chroma query and the rescoring loop.
+#
+# Entries are only valid for the index they came from. scripts/ingest_rag.py
+# writes a content fingerprint to <index>/index_version.json; it is part of every
+# key, and the file is re-checked (stat, at most every few seconds) so a
+# re-ingest drops the cached results. Without the file (index built before
+# versioning) nothing is cached. Bounded by an approximate byte budget, LRU.
+
+INDEX_VERSION_FILE = "index_version.json"
+
+
+def read_index_info(index_path: str) -> dict:
+    """index_version.json written by scripts/ingest_rag.py ({} for an unversioned index)."""
+    try:
+        with open(pathlib.Path(index_path) / INDEX_VERSION_FILE, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return info if isinstance(info, dict) else {}
+
+
+def read_index_version(index_path: str) -> Optional[str]:
+    """Fingerprint written by scripts/ingest_rag.py, or None for an unversioned index."""
+    return read_index_info(index_path).get("version")
+
+
+def _entry_size(results: list, query_vector) -> int:
+    size = sys.getsizeof(results) + getattr(query_vector, "nbytes", 0)
+    for citation in results:
+        size += sys.getsizeof(citation) + sum(sys.getsizeof(v) for v in citation.values())
+    return size
+
+
+class RetrievalCache:
+    def __init__(self):
+        self.enabled = settings.RETRIEVAL_CACHE_ENABLED
+        self.max_bytes = settings.RETRIEVAL_CACHE_MAX_BYTES
+        self.check_interval = settings.RETRIEVAL_CACHE_VERSION_CHECK_SECONDS
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (results, query_vector, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.index_path = None
+        self.index_version = None
+        self._version_mtime = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ── index version ────────────────────────────
+    def _version_stat(self):
+        try:
+            return os.stat(pathlib.Path(self.index_path) / INDEX_VERSION_FILE).st_mtime_ns
+        except OSError:
+            return None
+
+    def set_index(self, index_path: str):
+        """Called when RAGService (re)opens an index."""
+        version = read_index_version(index_path)
+        with self._lock:
+            self.index_path = index_path
+            self._version_mtime = self._version_stat()
+            self._checked_at = time.monotonic()
+            if version != self.index_version:
+                self._invalidate(version)
+
+    def _invalidate(self, version: Optional[str]):
+        if self._data:
+            self.invalidations += 1
+        self._data.clear()
+        self._bytes = 0
+        self.index_version = version
+        if version is None:
+            print(f"[RetrievalCache] No {INDEX_VERSION_FILE} in {self.index_path}; caching disabled for this index")
+        else:
+            print(f"[RetrievalCache] Index version {version}")
+
+    def _check_version(self):
+        """Re-reads the fingerprint if index_version.json changed since the last check (throttled)."""
+        now = time.monotonic()
+        if self.index_path is None or now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        mtime = self._version_stat()
+        if mtime != self._version_mtime:
+            self._version_mtime = mtime
+            version = read_index_version(self.index_path)
+            if version != self.index_version:
+                self._invalidate(version)
+
+    # ── lookups ──────────────────────────────────
+    def key(self, expanded_query: str, symptom_tags, k: int) -> Optional[tuple]:
+        """Cache key for a retrieval, or None when results can't be cached."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._check_version()
+            if self.index_version is None:
+                return None
+            return (self.index_version, expanded_query, tuple(symptom_tags or ()), k)
+
+    def get(self, key: Optional[tuple]):
+        """(results, query_vector) for the key, or None. Results are fresh lists of fresh dicts."""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        results, query_vector, _ = entry
+        return [dict(c) for c in results], query_vector
+
+    def put(self, key: Optional[tuple], results: list, query_vector):
+        if key is None:
+            return
+        size = _entry_size(results, query_vector)
+        if size > self.max_bytes:
+            return
+        entry = ([dict(c) for c in results], query_vector, size)
+        with self._lock:
+            if key[0] != self.index_version:
+                return  # index changed while this retrieval ran
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._data[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted[2]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "index_version": self.index_version,
+            "entries": len(self._data),
+            "approx_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+retrieval_cache = RetrievalCache()
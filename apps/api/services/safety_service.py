@@ -1,7 +1,8 @@
-import re
 from pydantic import BaseModel
 from typing import List, Literal, Optional, Dict
 
+from services.keyword_matcher import keyword_matcher
+
 class SafetyResult(BaseModel):
     urgency: Literal["self_care", "gp", "urgent", "emergency"]
     flags: List[str]
@@ -57,14 +58,14 @@ class SafetyService:
             r"just tell medicine", r"no hospital"
         ]
 
-    def _matches_any(self, text: str, patterns: List[str]) -> bool:
-        text_lower = text.lower()
-        for pattern in patterns:
-            if re.search(pattern, text_lower):
-                return True
-        return False
+        # Compiled into the shared matcher (services/keyword_matcher.py)
+        keyword_matcher.register("safety.emergency", self.emergency_patterns)
+        keyword_matcher.register("safety.urgent", self.urgent_patterns)
+        keyword_matcher.register("safety.refusal", self.refusal_patterns)
+        keyword_matcher.register("safety.unlock", self.unlock_patterns)
+        keyword_matcher.register("safety.non_compliance", self.non_compliance_patterns)
 
-    def evaluate_user_message(self, text: str, session: Dict) -> SafetyResult:
+    def evaluate_user_message(self, text: str, session: Dict, hits: Optional[Dict[str, str]] = None) -> SafetyResult:
         """
         Stateful evaluation pipeline.
         session dict structure: 
@@ -73,13 +74,16 @@ class SafetyService:
             "last_triage": str, 
             "urgent_pending": bool 
         }
+        `hits` is keyword_matcher.scan(text), shared with intent and triage (scanned here if omitted).
         """
+        if hits is None:
+            hits = keyword_matcher.scan(text)
         
         # --- 0. Check Unlock (Always First) ---
         lock_state = session.get("lock_state", "none")
         
         if lock_state == "awaiting_confirmation":
-            if self._matches_any(text, self.unlock_patterns):
+            if "safety.unlock" in hits:
                 # Unlock
                 session["lock_state"] = "cleared"
                 session["last_triage"] = "self_care" # Reset triage state
@@ -95,7 +99,7 @@ class SafetyService:
                 msg = "EMERGENCY LOCK ACTIVE: I cannot continue this conversation until you confirm your safety. Please type 'I am safe' or 'False alarm' if this is not an emergency."
                 
                 # Check Non-compliance while locked
-                if self._matches_any(text, self.non_compliance_patterns):
+                if "safety.non_compliance" in hits:
                     flags.append("non_compliance_detected")
                     msg = "I can't help with medication. This could be life-threatening. Call 112 now. Please confirm 'I am safe' only if you are not in danger."
                 
@@ -107,7 +111,7 @@ class SafetyService:
                 )
 
         # --- 1. Emergency Red Flags ---
-        if self._matches_any(text, self.emergency_patterns):
+        if "safety.emergency" in hits:
             session["lock_state"] = "awaiting_confirmation"
             session["last_triage"] = "emergency"
             
@@ -125,7 +129,7 @@ class SafetyService:
         
         # --- 2. Urgent Clarifiers (Vague Symptoms) ---
         # Only if not already pending clarification
-        if self._matches_any(text, self.urgent_patterns) and not session.get("urgent_pending", False):
+        if "safety.urgent" in hits and not session.get("urgent_pending", False):
             session["urgent_pending"] = True
             session["last_triage"] = "urgent"
             
@@ -149,7 +153,7 @@ class SafetyService:
             session["urgent_pending"] = False
 
         # --- 3. Non-compliance (Urgent but refusing help) ---
-        if session.get("last_triage") in ["urgent", "emergency"] and self._matches_any(text, self.non_compliance_patterns):
+        if session.get("last_triage") in ["urgent", "emergency"] and "safety.non_compliance" in hits:
             return SafetyResult(
                 urgency="urgent",
                 flags=["non_compliance_detected"],
@@ -158,7 +162,7 @@ class SafetyService:
             )
 
         # --- 4. Refusal (Prescriptions/Diagnosis) ---
-        if self._matches_any(text, self.refusal_patterns):
+        if "safety.refusal" in hits:
             msg = (
                 "I cannot provide specific medical diagnoses, prescriptions, or dosage instructions. "
                 "Please consult a doctor or pharmacist for medication advice. "
@@ -0,0 +1,202 @@
+import json
+import os
+import pathlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from config import settings
+
+# Semantic answer cache: reuses the MiniLM query embedding computed by RAGService.
+# A previous answer is served only when ALL of these hold:
+#   - same model, same mode ("rag", "rag_safety", ...) and same triage urgency
+#   - the retrieval cited exactly the same chunk IDs from the same index version
+#     (chunk IDs are positional: a re-ingested document keeps them, with new text)
+#   - cosine(query, previous query) >= SEMANTIC_CACHE_THRESHOLD
+# and never while an emergency lock is active or for emergency urgency.
+# When RAGService swaps in another index, entries for other versions are dropped
+# (including ones loaded from disk).
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent.parent.parent
+DEFAULT_CACHE_PATH = str(REPO_ROOT / "data" / "cache" / "semantic_cache.npz")
+
+
+def _normalize(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm > 0 else v
+
+
+class SemanticAnswerCache:
+    def __init__(self):
+        self.enabled = settings.SEMANTIC_CACHE_ENABLED
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = settings.SEMANTIC_CACHE_MAX_ENTRIES
+        self.path = settings.SEMANTIC_CACHE_PATH or DEFAULT_CACHE_PATH
+
+        # Global LRU over entries: entry_id -> entry dict
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        # Bucket index: (model, mode, urgency, index_version, chunk_ids) -> [entry_id, ...]
+        self._buckets: dict = {}
+        self._next_id = 0
+        # Version of the index being served (set by RAGService.swap_index)
+        self.index_version = None
+        self._pruned_version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _bucket_key(model: str, mode: str, urgency: str, index_version: Optional[str], chunk_ids: list) -> tuple:
+        return (model, mode, urgency, index_version, tuple(chunk_ids))
+
+    @staticmethod
+    def is_servable(urgency: str, lock_state: Optional[str]) -> bool:
+        """Emergencies and locked sessions always go through the full pipeline."""
+        return urgency != "emergency" and lock_state != "awaiting_confirmation"
+
+    def set_index_version(self, version: Optional[str]):
+        """Called by RAGService.swap_index (from any thread); stale entries are dropped on next use."""
+        self.index_version = version
+
+    def _prune_versions(self):
+        """Drops entries cached for another index version than the one being served."""
+        version = self.index_version
+        if version is None or version == self._pruned_version:
+            return
+        self._pruned_version = version
+        for entry_id, entry in list(self._entries.items()):
+            if entry["bucket"][3] != version:
+                self._remove(entry_id)
+
+    def lookup(self, embedding, model: str, mode: str, urgency: str, chunk_ids: list,
+               index_version: Optional[str] = None, lock_state: Optional[str] = None) -> Optional[str]:
+        if not self.enabled or embedding is None:
+            return None
+        if not self.is_servable(urgency, lock_state):
+            self.skipped += 1
+            return None
+        self._prune_versions()
+
+        ids = self._buckets.get(self._bucket_key(model, mode, urgency, index_version, chunk_ids))
+        if not ids:
+            self.misses += 1
+            return None
+
+        query = _normalize(embedding)
+        matrix = np.stack([self._entries[i]["embedding"] for i in ids])
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if float(scores[best]) < self.threshold:
+            self.misses += 1
+            return None
+
+        entry_id = ids[best]
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return self._entries[entry_id]["answer"]
+
+    def store(self, embedding, model: str, mode: str, urgency: str, chunk_ids: list,
+              answer: str, index_version: Optional[str] = None, lock_state: Optional[str] = None):
+        if not self.enabled or embedding is None or not answer:
+            return
+        if not self.is_servable(urgency, lock_state):
+            return
+        self._prune_versions()
+        if self.index_version is not None and index_version != self.index_version:
+            return  # generated from an index swapped out meanwhile
+        self._insert({
+            "bucket": self._bucket_key(model, mode, urgency, index_version, chunk_ids),
+            "embedding": _normalize(embedding),
+            "answer": answer,
+            "created_at": time.time(),
+        })
+
+    def _insert(self, entry: dict):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._buckets.setdefault(entry["bucket"], []).append(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets[entry["bucket"]]
+        bucket.remove(entry_id)
+        if not bucket:
+            del self._buckets[entry["bucket"]]
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+
+    def save(self):
+        """Persists entries (LRU order preserved) so the cache survives restarts."""
+        if not self.enabled:
+            return
+        self._prune_versions()
+        if not self._entries:
+            return
+        try:
+            entries = list(self._entries.values())
+            embeddings = np.stack([e["embedding"] for e in entries]).astype(np.float32)
+            meta = [
+                {"bucket": list(e["bucket"][:4]) + [list(e["bucket"][4])], "answer": e["answer"], "created_at": e["created_at"]}
+                for e in entries
+            ]
+            path = pathlib.Path(self.path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp.npz")
+            np.savez(tmp_path, embeddings=embeddings, meta=np.array(json.dumps(meta)))
+            os.replace(tmp_path, path)
+            print(f"[SemanticCache] Saved {len(entries)} entries to {path}")
+        except Exception as e:
+            print(f"[SemanticCache] Failed to save: {e}")
+
+    def load(self):
+        if not self.enabled or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                embeddings = data["embeddings"]
+                meta = json.loads(str(data["meta"]))
+            for vector, m in zip(embeddings, meta):
+                if len(m["bucket"]) != 5:
+                    continue  # written before entries recorded their index version
+                model, mode, urgency, index_version, chunk_ids = m["bucket"]
+                self._insert({
+                    "bucket": self._bucket_key(model, mode, urgency, index_version, chunk_ids),
+                    "embedding": vector.astype(np.float32),
+                    "answer": m["answer"],
+                    "created_at": m["created_at"],
+                })
+            print(f"[SemanticCache] Loaded {len(self._entries)} entries from {self.path}")
+        except Exception as e:
+            print(f"[SemanticCache] Failed to load {self.path}: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "index_version": self.index_version,
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+        }
+
+
+semantic_cache = SemanticAnswerCache()
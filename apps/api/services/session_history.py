@@ -0,0 +1,185 @@
+import datetime
+import hashlib
+import sys
+from typing import Callable, Optional
+
+import models
+
+# Compact chat history records (store.py).
+#
+# An assistant turn used to be stored as response_model.dict(): up to five
+# citations with their full chunk text plus snippet, the complete triage_result
+# and a copy of every local resource, per turn. Records keep only what can't be
+# looked up again:
+#   - citations as chunk IDs plus a hash of the text that was served and the
+#     index version (resolved through rag_service on export; a chunk whose text
+#     changed since is exported as unresolved, never with the new text)
+#   - local resources as logistics resource IDs
+#   - repeated strings (urgency, flags, intent, questions, ...) interned, lists as tuples
+#   - __slots__ instead of nested dicts
+# expand() rebuilds exactly the entry the pipeline used to store while the index
+# is unchanged, so /export/chat output is unchanged. to_compact()/from_compact() give the JSON form used for
+# byte accounting and the Redis backend.
+
+
+def _freeze(value):
+    """Interns strings and turns lists into tuples (recursively) so equal values share memory."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return {_freeze(k): _freeze(v) for k, v in value.items()}
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _thaw(v) for k, v in value.items()}
+    return value
+
+
+def citation_hash(text: str) -> str:
+    """Short fingerprint of the citation text a turn was answered with."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _timestamp(value) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(value)
+
+
+class UserTurn:
+    __slots__ = ("content", "timestamp")
+
+    def __init__(self, content: str, timestamp: datetime.datetime):
+        self.content = content
+        self.timestamp = timestamp
+
+    def to_compact(self) -> list:
+        return ["u", self.content, self.timestamp.isoformat()]
+
+    @classmethod
+    def from_compact(cls, data: list) -> "UserTurn":
+        return cls(data[1], _timestamp(data[2]))
+
+    def expand(self, citations: Optional[dict] = None, resolve_resource: Optional[Callable] = None) -> dict:
+        return {"role": "user", "content": self.content, "timestamp": self.timestamp.isoformat()}
+
+
+class AssistantTurn:
+    __slots__ = (
+        "content", "urgency", "safety_flags", "citation_ids", "recommendations", "intent",
+        "lock_state", "red_flag_detected", "local_resources", "local_context", "triage_result",
+        "response_kind", "timestamp", "citation_hashes", "index_version",
+    )
+
+    def __init__(self, content, urgency, safety_flags, citation_ids, recommendations, intent,
+                 lock_state, red_flag_detected, local_resources, local_context, triage_result,
+                 response_kind, timestamp, citation_hashes=None, index_version=None):
+        self.content = content
+        self.urgency = _freeze(urgency)
+        self.safety_flags = _freeze(safety_flags)
+        self.citation_ids = _freeze(citation_ids)
+        self.recommendations = _freeze(recommendations)
+        self.intent = _freeze(intent)
+        self.lock_state = _freeze(lock_state)
+        self.red_flag_detected = red_flag_detected
+        self.local_resources = _freeze(local_resources)  # resource IDs (or the dict if it has none)
+        self.local_context = _freeze(local_context)
+        # (key, value) pairs keep the original key order without a dict per turn
+        self.triage_result = _freeze(tuple(triage_result.items())) if triage_result is not None else None
+        self.response_kind = _freeze(response_kind)
+        self.timestamp = _timestamp(timestamp)
+        # None for records written before hashes were kept: their citations can't be verified
+        self.citation_hashes = tuple(citation_hashes) if citation_hashes is not None else None
+        self.index_version = _freeze(index_version)
+
+    @classmethod
+    def from_response(cls, response_model: models.ChatResponse, timestamp: datetime.datetime,
+                      resource_id: Callable, index_version: Optional[str] = None) -> "AssistantTurn":
+        resources = None
+        if response_model.local_resources is not None:
+            resources = [resource_id(r) for r in response_model.local_resources]
+        return cls(
+            response_model.assistant_message, response_model.urgency, response_model.safety_flags,
+            [c.id for c in response_model.citations], response_model.recommendations,
+            response_model.intent, response_model.lock_state, response_model.red_flag_detected,
+            resources, response_model.local_context, response_model.triage_result,
+            response_model.response_kind, timestamp,
+            [citation_hash(c.full_text) for c in response_model.citations], index_version,
+        )
+
+    def to_compact(self) -> list:
+        return [
+            "a", self.content, self.urgency, self.safety_flags, self.citation_ids, self.recommendations,
+            self.intent, self.lock_state, self.red_flag_detected, self.local_resources, self.local_context,
+            self.triage_result, self.response_kind, self.timestamp.isoformat(), self.citation_hashes,
+            self.index_version,
+        ]
+
+    @classmethod
+    def from_compact(cls, data: list) -> "AssistantTurn":
+        triage = data[11]
+        return cls(*data[1:11], dict(triage) if triage is not None else None, *data[12:16])
+
+    def expand(self, citations: dict, resolve_resource: Callable) -> dict:
+        """Rebuilds the original history entry (response_model.dict() as meta)."""
+        resources = None
+        if self.local_resources is not None:
+            resources = [resolve_resource(r) if isinstance(r, str) else _thaw(r) for r in self.local_resources]
+        meta = models.ChatResponse(
+            assistant_message=self.content,
+            urgency=self.urgency,
+            safety_flags=_thaw(self.safety_flags),
+            citations=self._served_citations(citations),
+            recommendations=_thaw(self.recommendations),
+            intent=self.intent,
+            lock_state=self.lock_state,
+            red_flag_detected=self.red_flag_detected,
+            local_resources=resources,
+            local_context=_thaw(self.local_context),
+            triage_result={k: _thaw(v) for k, v in self.triage_result} if self.triage_result is not None else None,
+            response_kind=self.response_kind,
+        ).dict()
+        return {"role": "assistant", "content": self.content, "meta": meta, "timestamp": self.timestamp.isoformat()}
+
+    def _served_citations(self, citations: dict) -> list:
+        """Current citations whose text is still what this turn was answered with; the rest are unresolved."""
+        hashes = self.citation_hashes or (None,) * len(self.citation_ids)
+        served = []
+        for cid, text_hash in zip(self.citation_ids, hashes):
+            citation = citations.get(cid)
+            if citation is None or text_hash is None or citation_hash(citation.get("full_text")) != text_hash:
+                citation = _unresolved_citation(cid, self.index_version)
+            served.append(citation)
+        return served
+
+
+def _unresolved_citation(chunk_id: str, index_version: Optional[str] = None) -> dict:
+    """
+    Placeholder for a chunk that is no longer in the index, or whose text changed
+    since the answer was given (after a re-ingest): an evidence export must not
+    show text the user never saw.
+    """
+    served_from = f" (answered from index version {index_version})" if index_version else ""
+    return {
+        "id": chunk_id, "title": "Unknown Source", "org": "Unknown", "source_type": "unresolved",
+        "snippet": f"Citation text changed or removed since this answer{served_from}.",
+    }
+
+
+def from_compact(data: list):
+    return UserTurn.from_compact(data) if data[0] == "u" else AssistantTurn.from_compact(data)
+
+
+def citation_ids(history) -> list:
+    """Unique chunk IDs cited anywhere in the history (in first-seen order)."""
+    seen = {}
+    for turn in history:
+        for cid in getattr(turn, "citation_ids", ()):
+            seen.setdefault(cid, None)
+    return list(seen)
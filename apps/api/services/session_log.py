@@ -0,0 +1,244 @@
+import datetime
+import json
+import os
+import pathlib
+import queue
+import sys
+import threading
+from collections import defaultdict
+
+from config import settings
+from services import session_history
+
+# Append-only on-disk log of chat history (write-through from main.py).
+#
+#   data/sessions/sessions-YYYY-MM-DD.jsonl    one segment per day
+#   each line: [session_id, incarnation, <compact record>]  (services/session_history.py)
+#
+# The incarnation token (store.MemorySessionStore) tells apart sessions that
+# reused an ID after the previous one expired: a session only ever reads back
+# its own turns.
+#
+# Requests only enqueue the record; a background thread appends it, so there is
+# no file I/O on the event loop. The session store then only has to keep a
+# recent window of turns in memory (SESSION_MEMORY_TURNS) and /export/chat reads
+# the full history back from the log.
+#
+# An in-memory index (session_id -> [(segment, offset, incarnation)]) makes that
+# read a few seeks instead of a scan. Entries are dropped when the session store
+# evicts the session (forget()). The index only covers this process: the memory
+# store (and its incarnations) starts empty, so earlier lines can never be read
+# back and are left on disk until segments older than SESSION_LOG_RETENTION_DAYS
+# are deleted. Single writer per directory, so it only runs with the memory session
+# backend; with SESSION_STORE_BACKEND=redis (several processes) Redis holds the history.
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent.parent.parent
+DEFAULT_LOG_DIR = str(REPO_ROOT / "data" / "sessions")
+SEGMENT_PREFIX = "sessions-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class SessionLog:
+    def __init__(self):
+        # Multi-process deployments (Redis sessions) keep their history in Redis
+        self.enabled = settings.SESSION_LOG_ENABLED and settings.SESSION_STORE_BACKEND == "memory"
+        self.log_dir = pathlib.Path(settings.SESSION_LOG_DIR or DEFAULT_LOG_DIR)
+        self.retention_days = settings.SESSION_LOG_RETENTION_DAYS
+        self.fsync = settings.SESSION_LOG_FSYNC
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._index = defaultdict(list)  # session_id -> [(segment_name, offset, incarnation)]
+        self._index_lock = threading.Lock()
+        self._segment_name = None
+        self._segment_file = None
+
+        self.written = 0
+        self.errors = 0
+        self.segments_pruned = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ── lifecycle (FastAPI lifespan) ─────────────
+    def start(self):
+        if not self.enabled or self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="session-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ── API ──────────────────────────────────────
+    def append(self, session_id: str, incarnation: str, turn):
+        """Enqueues a history record for the writer thread (no-op if the log isn't running)."""
+        if self.running:
+            self._queue.put((session_id, incarnation, turn.to_compact()))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Blocks until everything enqueued so far is written."""
+        if not self.running:
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def has(self, session_id: str, incarnation: str) -> bool:
+        with self._index_lock:
+            return any(loc[2] == incarnation for loc in self._index.get(session_id, ()))
+
+    def iter_history(self, session_id: str, incarnation: str):
+        """Yields the history records of this incarnation of the session, oldest first, reading one line per turn."""
+        with self._index_lock:
+            locations = [loc for loc in self._index.get(session_id, ()) if loc[2] == incarnation]
+        handles = {}
+        try:
+            for segment, offset, _ in locations:
+                f = handles.get(segment)
+                if f is None:
+                    try:
+                        f = handles[segment] = open(self.log_dir / segment, "rb")
+                    except FileNotFoundError:
+                        continue  # pruned since we took the snapshot
+                f.seek(offset)
+                yield session_history.from_compact(json.loads(f.readline())[-1])
+        finally:
+            for f in handles.values():
+                f.close()
+
+    def forget(self, session_id: str, incarnation: str):
+        """Drops the index entries of a session the store evicted (its lines stay until pruned)."""
+        with self._index_lock:
+            kept = [loc for loc in self._index.get(session_id, ()) if loc[2] != incarnation]
+            if kept:
+                self._index[session_id] = kept
+            else:
+                self._index.pop(session_id, None)
+
+    # ── writer thread ────────────────────────────
+    def _run(self):
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self._prune()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Drain what's already queued so one flush covers a burst of turns
+            while item is not None:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            stop = self._write_batch(batch)
+            if stop:
+                break
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+
+    def _write_batch(self, batch: list) -> bool:
+        stop = False
+        waiters = []
+        for item in batch:
+            if item is None:
+                stop = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                self._write(*item)
+        if self._segment_file is not None:
+            try:
+                self._segment_file.flush()
+                if self.fsync:
+                    os.fsync(self._segment_file.fileno())
+            except OSError as e:
+                self.errors += 1
+                print(f"[SessionLog] Flush failed: {e}")
+        for event in waiters:
+            event.set()
+        return stop
+
+    def _segment_for_today(self):
+        name = f"{SEGMENT_PREFIX}{datetime.date.today().isoformat()}{SEGMENT_SUFFIX}"
+        if name != self._segment_name:
+            if self._segment_file is not None:
+                self._segment_file.close()
+            self._segment_file = open(self.log_dir / name, "ab")
+            self._terminate_torn_line(self._segment_file)
+            self._segment_name = sys.intern(name)
+            self._prune()
+        return self._segment_name, self._segment_file
+
+    def _terminate_torn_line(self, f):
+        """After a crash mid-write the segment may end without a newline; don't glue the next record to it."""
+        if f.tell() == 0:
+            return
+        with open(f.name, "rb") as r:
+            r.seek(-1, os.SEEK_END)
+            if r.read(1) != b"\n":
+                f.write(b"\n")
+
+    def _write(self, session_id: str, incarnation: str, data: list):
+        try:
+            segment, f = self._segment_for_today()
+            offset = f.tell()
+            line = json.dumps([session_id, incarnation, data], separators=(",", ":"), ensure_ascii=False)
+            f.write(line.encode("utf-8") + b"\n")
+            with self._index_lock:
+                self._index[session_id].append((segment, offset, incarnation))
+            self.written += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"[SessionLog] Failed to write turn for session {session_id}: {e}")
+
+    def _segments(self) -> list:
+        return sorted(p.name for p in self.log_dir.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    def _prune(self):
+        if self.retention_days <= 0:
+            return
+        cutoff = (datetime.date.today() - datetime.timedelta(days=self.retention_days)).isoformat()
+        expired = [s for s in self._segments() if s[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)] < cutoff]
+        if not expired:
+            return
+        for segment in expired:
+            try:
+                (self.log_dir / segment).unlink()
+                self.segments_pruned += 1
+            except OSError as e:
+                print(f"[SessionLog] Failed to delete {segment}: {e}")
+        expired = set(expired)
+        with self._index_lock:
+            for session_id in list(self._index):
+                kept = [loc for loc in self._index[session_id] if loc[0] not in expired]
+                if kept:
+                    self._index[session_id] = kept
+                else:
+                    del self._index[session_id]
+
+    def stats(self) -> dict:
+        with self._index_lock:
+            sessions = len(self._index)
+            turns = sum(len(v) for v in self._index.values())
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "dir": str(self.log_dir),
+            "segment": self._segment_name,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "errors": self.errors,
+            "indexed_sessions": sessions,
+            "indexed_turns": turns,
+            "segments_pruned": self.segments_pruned,
+        }
+
+
+session_log = SessionLog()
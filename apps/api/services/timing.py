@@ -0,0 +1,128 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from config import settings
+
+# Lightweight per-request stage timing for the chat pipeline.
+#
+#   with timing.stage("retrieval"):
+#       ...
+#
+# Durations go into the current request's trace (emitted as a Server-Timing
+# header) and into per-stage histograms (p50/p95/p99 on /debug/stats).
+# When TIMING_ENABLED=0 no trace is created and stage() returns a shared no-op
+# context manager, so the instrumentation costs one ContextVar lookup.
+
+_NOOP = nullcontext()
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("request_trace", default=None)
+
+
+class StageHistogram:
+    """Count/sum plus a bounded window of recent samples for percentiles."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.samples.append(duration_ms)
+
+    @staticmethod
+    def _percentile(ordered: list, q: float) -> float:
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2),
+            "p50_ms": round(self._percentile(ordered, 0.50), 2),
+            "p95_ms": round(self._percentile(ordered, 0.95), 2),
+            "p99_ms": round(self._percentile(ordered, 0.99), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class RequestTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []  # [(name, duration_ms)]
+
+    def server_timing_header(self) -> str:
+        parts = [f"{name};dur={duration_ms:.2f}" for name, duration_ms in self.stages]
+        total_ms = (time.perf_counter() - self.started) * 1000
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+
+class StageTimer:
+    def __init__(self):
+        self.enabled = settings.TIMING_ENABLED
+        self.window = settings.TIMING_WINDOW
+        self._histograms = {}
+        self._lock = threading.Lock()  # stages are also timed on the RAG thread pool
+        self._listeners = []
+
+    def start_trace(self):
+        """Starts a trace for the current request. Returns a token for end_trace()."""
+        if not self.enabled:
+            return None
+        trace = RequestTrace()
+        return trace, _current_trace.set(trace)
+
+    def end_trace(self, token) -> str | None:
+        """Ends the trace and returns the Server-Timing header value (None if nothing was timed)."""
+        if token is None:
+            return None
+        trace, var_token = token
+        _current_trace.reset(var_token)
+        if not trace.stages:
+            return None
+        return trace.server_timing_header()
+
+    def add_listener(self, fn):
+        """fn(stage, duration_ms) is called for every recorded stage (e.g. Prometheus export)."""
+        self._listeners.append(fn)
+
+    def record(self, name: str, duration_ms: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = StageHistogram(self.window)
+            histogram.observe(duration_ms)
+        for fn in self._listeners:
+            fn(name, duration_ms)
+
+    @contextmanager
+    def _timed(self, name: str, trace: RequestTrace):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            trace.stages.append((name, duration_ms))
+            self.record(name, duration_ms)
+
+    def stage(self, name: str):
+        trace = _current_trace.get()
+        if trace is None:
+            return _NOOP
+        return self._timed(name, trace)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: h.snapshot() for name, h in sorted(self._histograms.items())}
+
+
+timing = StageTimer()
@@ -1,5 +1,10 @@
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from services.keyword_matcher import keyword_matcher
+
+# Words the triage rules look for in the message on top of the symptom/severity maps
+RULE_CUES = ["child", "baby", "kid", "stiffness", "neck", "hard", "fight", "chest", "sudden"]
 
 class TriageService:
     def __init__(self):
@@ -25,34 +30,47 @@ class TriageService:
             "low": ["mild", "bit", "low", "slight", "little"]
         }
 
-    def parse_symptoms(self, text: str) -> Dict[str, Any]:
-        text_lower = text.lower()
+        # Compiled into the shared matcher (services/keyword_matcher.py)
+        for key, patterns in self.symptoms_map.items():
+            keyword_matcher.register(f"triage.symptom.{key}", patterns, literal=True)
+        for level, words in self.severity_map.items():
+            keyword_matcher.register(f"triage.severity.{level}", words, literal=True)
+        for cue in RULE_CUES:
+            keyword_matcher.register(f"triage.cue.{cue}", [cue], literal=True)
+        keyword_matcher.register_extractor("triage.temperature", r"\d{2}[.,]?\d?") # 38, 38.5, 39
+        keyword_matcher.register_extractor("triage.duration", r"\d+\s*(?:day|week|month)")
+
+    def parse_symptoms(self, text: str, hits: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """`hits` is keyword_matcher.scan(text), shared with intent and safety (scanned here if omitted)."""
+        if hits is None:
+            hits = keyword_matcher.scan(text)
         found_symptoms = []
         severity = "unknown"
         
         # Detect symptoms
-        for key, patterns in self.symptoms_map.items():
-            if any(p in text_lower for p in patterns):
+        for key in self.symptoms_map:
+            if f"triage.symptom.{key}" in hits:
                 found_symptoms.append(key)
                 
         # Detect severity
-        for level, words in self.severity_map.items():
-            if any(w in text_lower for w in words):
+        for level in self.severity_map:
+            if f"triage.severity.{level}" in hits:
                 severity = level
                 break # Take highest found priority? Actually map order matters if we iterate high to low
         
         # Specific numeric checks (e.g. fever > 39)
-        # Simple extraction
-        temp_match = re.search(r"(\d{2}[.,]?\d?)", text) # 38, 38.5, 39
+        # Simple extraction (leftmost match, from the shared scan)
+        temp_text = hits.get("triage.temperature")
         temp = None
-        if temp_match:
+        if temp_text:
             try:
-                temp = float(temp_match.group(1).replace(",", "."))
+                temp = float(temp_text.replace(",", "."))
             except:
                 pass
                 
         duration_days = 0
-        dur_match = re.search(r"(\d+)\s*(day|week|month)", text_lower)
+        dur_text = hits.get("triage.duration")
+        dur_match = re.match(r"(\d+)\s*(day|week|month)", dur_text) if dur_text else None
         if dur_match:
             val = int(dur_match.group(1))
             unit = dur_match.group(2)
@@ -67,7 +85,7 @@ class TriageService:
             "duration_days": duration_days
         }
 
-    def triage(self, text: str) -> Dict[str, Any]:
+    def triage(self, text: str, hits: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Returns {
             'urgency': 'emergency' | 'urgent' | 'routine' | 'self_care' | 'unknown',
@@ -77,7 +95,9 @@ class TriageService:
             'reason': str
         }
         """
-        data = self.parse_symptoms(text)
+        if hits is None:
+            hits = keyword_matcher.scan(text)
+        data = self.parse_symptoms(text, hits)
         symptoms = data["symptoms"]
         severity = data["severity"]
         temp = data["temperature"]
@@ -105,7 +125,7 @@ class TriageService:
         # 2. EMERGENCY Signals (Secondary check, Safety Service is primary)
         # Note: We rely on SafetyService for true emergencies (stroke, etc).
         # But here we catch high fever + stiffness, etc.
-        is_child = "child" in text.lower() or "baby" in text.lower() or "kid" in text.lower()
+        is_child = "triage.cue.child" in hits or "triage.cue.baby" in hits or "triage.cue.kid" in hits
         
         # 3. Rules Engine
         
@@ -118,7 +138,7 @@ class TriageService:
             elif temp and temp > 38.0 and is_child:
                 urgency = "urgent"
                 reason = f"Fever in child ({temp}C)."
-            elif "stiffness" in text.lower() or "neck" in text.lower():
+            elif "triage.cue.stiffness" in hits or "triage.cue.neck" in hits:
                 urgency = "emergency" # Potential meningitis
                 reason = "Fever with stiff neck."
                 action = "Go to ER immediately."
@@ -133,7 +153,7 @@ class TriageService:
 
         # Rule: Breathing
         if "breathing" in symptoms:
-            if severity == "high" or "hard" in text.lower() or "fight" in text.lower():
+            if severity == "high" or "triage.cue.hard" in hits or "triage.cue.fight" in hits:
                  urgency = "emergency"
                  reason = "Severe difficulty breathing."
             else:
@@ -145,8 +165,8 @@ class TriageService:
         if "pain" in symptoms or "headache" in symptoms or "abdominal" in symptoms:
             if severity == "high":
                 urgency = "urgent" # Or emergency depending on location
-                if "chest" in text.lower(): urgency = "emergency"
-                if "headache" in symptoms and "sudden" in text.lower(): urgency = "emergency"
+                if "triage.cue.chest" in hits: urgency = "emergency"
+                if "headache" in symptoms and "triage.cue.sudden" in hits: urgency = "emergency"
                 reason = "Severe pain reported."
             elif days > 7:
                 urgency = "routine"
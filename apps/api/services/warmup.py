@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from config import settings
+from services.ollama_client import ollama_client
+from services.rag_service import rag_service
+
+# Background warm-up run from the FastAPI lifespan, so the first users after a
+# deploy don't pay for loading MiniLM, opening Chroma and loading the LLM.
+
+WARMUP_QUERY = "fever temperature duration red flags"
+
+
+class WarmupState:
+    def __init__(self):
+        # "idle" (never started, e.g. no lifespan), "warming", "done"
+        self.status = "idle"
+        self.steps = {}
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def warming(self) -> bool:
+        return self.status == "warming"
+
+    def _record(self, step: str, ok: bool, started: float, detail: str = ""):
+        self.steps[step] = {
+            "ok": ok,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "detail": detail,
+        }
+
+    async def _warm_rag(self):
+        started = time.perf_counter()
+        try:
+            await rag_service.ainitialize()
+            if not rag_service.check_health():
+                self._record("rag", False, started, "Index missing or failed to initialise")
+                return
+            # Dummy encode + query: pages in model weights and the HNSW index
+            await rag_service.aretrieve(WARMUP_QUERY, symptom_tags=["fever"], k=1)
+            # The retrieval above may be served by the query embedding cache; encode for real
+            await rag_service.aembed_query(WARMUP_QUERY, use_cache=False)
+            self._record("rag", True, started)
+        except Exception as e:
+            self._record("rag", False, started, str(e))
+
+    async def _warm_ollama(self):
+        started = time.perf_counter()
+        ok = await ollama_client.preload()
+        self._record("ollama", ok, started, "" if ok else "Model preload failed (is Ollama running?)")
+
+    async def run(self):
+        if not settings.WARMUP_ENABLED:
+            return
+        self.status = "warming"
+        self.started_at = time.time()
+        print("[Warmup] Starting background warm-up...")
+        try:
+            await asyncio.gather(self._warm_rag(), self._warm_ollama())
+        finally:
+            self.status = "done"
+            self.finished_at = time.time()
+            print(f"[Warmup] Done: {self.steps}")
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "steps": self.steps,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+warmup = WarmupState()
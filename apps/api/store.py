@@ -1,2 +1,454 @@
-# Simple in-memory store
-sessions = {}
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from config import settings
+from services import session_history
+
+# Shared chat session store (main.py chat pipeline + /export/chat).
+#
+# Dict-like (`sid in sessions`, `sessions[sid]`, len()) but bounded:
+#   - sessions idle for SESSION_TTL_SECONDS expire
+#   - history appended through append_history() keeps at most SESSION_MAX_TURNS
+#     entries and SESSION_MAX_HISTORY_BYTES (compact JSON size) per session, oldest first out
+#
+# History entries are compact records (services/session_history.py); /export/chat
+# expands them back to the full documents.
+#
+# The chat pipeline uses the async aopen_session() / asave_state() / aappend_history()
+# (and /export/chat aget()) so the same code runs against either backend
+# (SESSION_STORE_BACKEND) without blocking the event loop:
+#   - "memory": in-process, LRU-evicted above SESSION_MAX_SESSIONS. Worst-case
+#     history memory is ~ MAX_SESSIONS * MAX_HISTORY_BYTES. Single worker only.
+#     Each session gets a random incarnation token when it is created, so a
+#     session ID reused after expiry/eviction (e.g. "default") is a different
+#     session for the on-disk log (services/session_log.py); on_evict(sid, token)
+#     is called whenever a session is dropped.
+#   - "redis": shared across uvicorn workers and replicas (REDIS_URL). Session
+#     count is bounded by TTL expiry (and the Redis maxmemory policy). The async
+#     methods run the (blocking) Redis round trips in a worker thread.
+
+
+class SessionConflictError(Exception):
+    """The session's lock state kept changing under a request (concurrent workers)."""
+
+
+def new_session() -> dict:
+    return {
+        "lock_state": "none",
+        "last_triage": "self_care",
+        "urgent_pending": False,
+        "history": [],  # Phase 5: Track history for export
+    }
+
+
+class _Entry:
+    __slots__ = ("session", "last_access", "sizes", "history_bytes", "incarnation")
+
+    def __init__(self, session: dict, now: float, incarnation: str):
+        self.session = session
+        self.last_access = now
+        self.incarnation = incarnation
+        self.sizes = deque()  # JSON size of each history entry, same order as session["history"]
+        self.history_bytes = 0
+
+
+class MemorySessionStore:
+    name = "memory"
+
+    def __init__(self, ttl_seconds: int, max_sessions: int, max_turns: int, max_history_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_history_bytes = max_history_bytes
+
+        # Access-ordered: least recently used (and therefore oldest idle) first
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.trimmed_turns = 0
+        self.on_evict = None  # callable(session_id, incarnation), wired by main.py
+
+    def _drop(self, session_id: str):
+        entry = self._entries.pop(session_id)
+        if self.on_evict is not None:
+            self.on_evict(session_id, entry.incarnation)
+
+    def _is_expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.last_access > self.ttl_seconds
+
+    def _expire(self, now: float):
+        # LRU order == idle order, so expired sessions are always at the front
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _live_entry(self, session_id: str):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        now = time.time()
+        if self._is_expired(entry, now):
+            self._drop(session_id)
+            self.expired += 1
+            return None
+        return entry
+
+    # ── dict interface ───────────────────────────
+    def __contains__(self, session_id) -> bool:
+        return self._live_entry(session_id) is not None
+
+    def __getitem__(self, session_id) -> dict:
+        entry = self._live_entry(session_id)
+        if entry is None:
+            raise KeyError(session_id)
+        entry.last_access = time.time()
+        self._entries.move_to_end(session_id)
+        return entry.session
+
+    def get(self, session_id, default=None):
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, session_id, session: dict):
+        now = time.time()
+        self._expire(now)
+        previous = self._entries.pop(session_id, None)
+        if previous is not None:
+            incarnation = previous.incarnation  # same session, new state
+        else:
+            incarnation = uuid.uuid4().hex
+            self.created += 1
+        entry = _Entry(session, now, incarnation)
+        for item in session.get("history", []):
+            size = self._entry_size(item)
+            entry.sizes.append(size)
+            entry.history_bytes += size
+        self._entries[session_id] = entry
+        self._trim(entry)
+
+        while len(self._entries) > self.max_sessions:
+            self._drop(next(iter(self._entries)))
+            self.evicted += 1
+
+    def __delitem__(self, session_id):
+        self._drop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        for session_id in list(self._entries):
+            self._drop(session_id)
+
+    def incarnation(self, session_id: str):
+        """Token identifying this lifetime of the session ID (None if there is no live session)."""
+        entry = self._live_entry(session_id)
+        return entry.incarnation if entry is not None else None
+
+    # ── chat pipeline ────────────────────────────
+    def open_session(self, session_id: str) -> dict:
+        """Returns the live session dict, creating it if missing or expired."""
+        if session_id not in self:
+            self[session_id] = new_session()
+        return self[session_id]
+
+    def save_state(self, session_id: str, session: dict, expected_lock_state: str) -> bool:
+        """The returned session dict is the stored one, so there is nothing to write back."""
+        return True
+
+    # In-process and non-blocking: the async interface runs inline on the event loop
+    async def aopen_session(self, session_id: str) -> dict:
+        return self.open_session(session_id)
+
+    async def asave_state(self, session_id: str, session: dict, expected_lock_state: str) -> bool:
+        return self.save_state(session_id, session, expected_lock_state)
+
+    async def aappend_history(self, session_id: str, item):
+        self.append_history(session_id, item)
+
+    async def aget(self, session_id: str):
+        return self.get(session_id)
+
+    async def astats(self) -> dict:
+        return self.stats()
+
+    # ── history ──────────────────────────────────
+    @staticmethod
+    def _entry_size(item) -> int:
+        return len(json.dumps(item.to_compact(), separators=(",", ":")))
+
+    def append_history(self, session_id: str, item):
+        """Appends a history entry, dropping the oldest entries beyond the turn/byte caps."""
+        entry = self._live_entry(session_id)
+        if entry is None:
+            return
+        entry.session["history"].append(item)
+        size = self._entry_size(item)
+        entry.sizes.append(size)
+        entry.history_bytes += size
+        self._trim(entry)
+
+    def _trim(self, entry: _Entry):
+        history = entry.session.get("history")
+        if history is None:
+            return
+        drop = 0
+        while len(history) - drop > 1 and (
+            len(history) - drop > self.max_turns or entry.history_bytes > self.max_history_bytes
+        ):
+            entry.history_bytes -= entry.sizes.popleft()
+            drop += 1
+        if drop:
+            del history[:drop]
+            self.trimmed_turns += drop
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "sessions": len(self._entries),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "max_turns": self.max_turns,
+            "max_history_bytes": self.max_history_bytes,
+            "history_bytes": sum(e.history_bytes for e in self._entries.values()),
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "trimmed_turns": self.trimmed_turns,
+        }
+
+
+class RedisSessionStore:
+    """
+    Sessions shared across workers/replicas. Per session:
+
+      chat:session:<sid>   hash  lock_state, last_triage, urgent_pending, history_bytes
+      chat:history:<sid>   list  compact JSON history records (oldest first)
+
+    plus chat:sessions, a sorted set of sid -> last access used for len().
+    Every access refreshes the TTL of both keys. Lock-state writes and history
+    appends (with turn/byte trimming) run as Lua scripts, so they are atomic
+    across processes.
+    """
+
+    name = "redis"
+    STATE_PREFIX = "chat:session:"
+    HISTORY_PREFIX = "chat:history:"
+    INDEX_KEY = "chat:sessions"
+
+    # Compare-and-set on lock_state: the write only applies if nobody changed the
+    # lock since we read it, except that locking (emergency) always wins.
+    # KEYS: state | ARGV: expected_lock, lock_state, last_triage, urgent_pending, ttl
+    SAVE_STATE_LUA = """
+    local current = redis.call('HGET', KEYS[1], 'lock_state') or 'none'
+    if current ~= ARGV[1] and ARGV[2] ~= 'awaiting_confirmation' then
+        return current
+    end
+    redis.call('HSET', KEYS[1], 'lock_state', ARGV[2], 'last_triage', ARGV[3], 'urgent_pending', ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return ARGV[2]
+    """
+
+    # KEYS: state, history, index | ARGV: sid, now, ttl, item, max_turns, max_bytes
+    APPEND_HISTORY_LUA = """
+    redis.call('RPUSH', KEYS[2], ARGV[4])
+    local total = redis.call('HINCRBY', KEYS[1], 'history_bytes', string.len(ARGV[4]))
+    local n = redis.call('LLEN', KEYS[2])
+    local trimmed = 0
+    while n > 1 and (n > tonumber(ARGV[5]) or total > tonumber(ARGV[6])) do
+        local old = redis.call('LPOP', KEYS[2])
+        total = redis.call('HINCRBY', KEYS[1], 'history_bytes', -string.len(old))
+        n = n - 1
+        trimmed = trimmed + 1
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+    return trimmed
+    """
+
+    def __init__(self, ttl_seconds: int, max_turns: int, max_history_bytes: int):
+        import redis
+        from services.redis_client import REDIS_URL
+
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.max_history_bytes = max_history_bytes
+        self._redis = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        self._save_state = self._redis.register_script(self.SAVE_STATE_LUA)
+        self._append_history = self._redis.register_script(self.APPEND_HISTORY_LUA)
+
+        self.created = 0
+        self.trimmed_turns = 0
+        self.lock_conflicts = 0
+
+    def _keys(self, session_id: str) -> tuple:
+        return self.STATE_PREFIX + session_id, self.HISTORY_PREFIX + session_id
+
+    @staticmethod
+    def _encode(item) -> str:
+        return json.dumps(item.to_compact(), separators=(",", ":"))
+
+    @staticmethod
+    def _decode_state(raw: dict) -> dict:
+        return {
+            "lock_state": raw.get("lock_state", "none"),
+            "last_triage": raw.get("last_triage", "self_care"),
+            "urgent_pending": raw.get("urgent_pending") == "1",
+        }
+
+    # ── dict interface ───────────────────────────
+    def __contains__(self, session_id) -> bool:
+        return bool(self._redis.exists(self.STATE_PREFIX + session_id))
+
+    def __getitem__(self, session_id) -> dict:
+        """Full session including history (export)."""
+        state_key, history_key = self._keys(session_id)
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hgetall(state_key)
+        pipe.lrange(history_key, 0, -1)
+        raw, history = pipe.execute()
+        if not raw:
+            raise KeyError(session_id)
+        session = self._decode_state(raw)
+        session["history"] = [session_history.from_compact(json.loads(item)) for item in history]
+        return session
+
+    def get(self, session_id, default=None):
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def __len__(self) -> int:
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zremrangebyscore(self.INDEX_KEY, "-inf", time.time() - self.ttl_seconds)
+        pipe.zcard(self.INDEX_KEY)
+        return pipe.execute()[1]
+
+    # ── chat pipeline ────────────────────────────
+    def open_session(self, session_id: str) -> dict:
+        """
+        Returns the session state (without history), creating it if missing.
+        Mutations are written back with save_state().
+        """
+        state_key, history_key = self._keys(session_id)
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hgetall(state_key)
+        pipe.expire(state_key, self.ttl_seconds)
+        pipe.expire(history_key, self.ttl_seconds)
+        pipe.zadd(self.INDEX_KEY, {session_id: time.time()})
+        raw = pipe.execute()[0]
+        if raw:
+            return self._decode_state(raw)
+
+        session = new_session()
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hsetnx(state_key, "lock_state", session["lock_state"])
+        pipe.hsetnx(state_key, "last_triage", session["last_triage"])
+        pipe.hsetnx(state_key, "urgent_pending", "0")
+        pipe.expire(state_key, self.ttl_seconds)
+        pipe.execute()
+        self.created += 1
+        del session["history"]
+        return session
+
+    def save_state(self, session_id: str, session: dict, expected_lock_state: str) -> bool:
+        """
+        Writes lock_state/last_triage/urgent_pending back. Returns False if another
+        process changed the lock concurrently; session["lock_state"] is then
+        updated to the stored value.
+        """
+        stored = self._save_state(
+            keys=[self.STATE_PREFIX + session_id],
+            args=[
+                expected_lock_state or "none",
+                session.get("lock_state", "none"),
+                session.get("last_triage", "self_care"),
+                "1" if session.get("urgent_pending") else "0",
+                self.ttl_seconds,
+            ],
+        )
+        if stored != session.get("lock_state"):
+            self.lock_conflicts += 1
+            print(f"[SessionStore] Lock state conflict for session {session_id}: keeping '{stored}'")
+            session["lock_state"] = stored
+            return False
+        return True
+
+    def append_history(self, session_id: str, item):
+        state_key, history_key = self._keys(session_id)
+        self.trimmed_turns += self._append_history(
+            keys=[state_key, history_key, self.INDEX_KEY],
+            args=[session_id, time.time(), self.ttl_seconds, self._encode(item), self.max_turns, self.max_history_bytes],
+        )
+
+    # Network round trips: keep them off the event loop (redis-py clients are thread-safe)
+    async def aopen_session(self, session_id: str) -> dict:
+        return await asyncio.to_thread(self.open_session, session_id)
+
+    async def asave_state(self, session_id: str, session: dict, expected_lock_state: str) -> bool:
+        return await asyncio.to_thread(self.save_state, session_id, session, expected_lock_state)
+
+    async def aappend_history(self, session_id: str, item):
+        await asyncio.to_thread(self.append_history, session_id, item)
+
+    async def aget(self, session_id: str):
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def astats(self) -> dict:
+        return await asyncio.to_thread(self.stats)
+
+    def clear(self):
+        for pattern in (self.STATE_PREFIX + "*", self.HISTORY_PREFIX + "*"):
+            for key in self._redis.scan_iter(match=pattern):
+                self._redis.delete(key)
+        self._redis.delete(self.INDEX_KEY)
+
+    def stats(self) -> dict:
+        try:
+            size = len(self)
+        except Exception as e:
+            size = f"error: {e}"
+        return {
+            "backend": self.name,
+            "sessions": size,
+            "ttl_seconds": self.ttl_seconds,
+            "max_turns": self.max_turns,
+            "max_history_bytes": self.max_history_bytes,
+            "created": self.created,
+            "trimmed_turns": self.trimmed_turns,
+            "lock_conflicts": self.lock_conflicts,
+        }
+
+
+def create_session_store():
+    if settings.SESSION_STORE_BACKEND == "redis":
+        return RedisSessionStore(
+            ttl_seconds=settings.SESSION_TTL_SECONDS,
+            max_turns=settings.SESSION_MAX_TURNS,
+            max_history_bytes=settings.SESSION_MAX_HISTORY_BYTES,
+        )
+    max_turns = settings.SESSION_MAX_TURNS
+    if settings.SESSION_LOG_ENABLED:
+        # Full history is on disk (services/session_log.py); keep a recent window in RAM
+        max_turns = min(max_turns, settings.SESSION_MEMORY_TURNS)
+    return MemorySessionStore(
+        ttl_seconds=settings.SESSION_TTL_SECONDS,
+        max_sessions=settings.SESSION_MAX_SESSIONS,
+        max_turns=max_turns,
+        max_history_bytes=settings.SESSION_MAX_HISTORY_BYTES,
+    )
+
+
+sessions = create_session_store()
@@ -0,0 +1,30 @@
+"""
+Message analysis cache: same results as analysing uncached, shared across case/whitespace variants.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+from services.analysis_cache import AnalysisCache
+from services.intent_service import intent_service
+from services.triage_service import triage_service
+
+
+def test_cached_analysis_matches_services():
+    cache = AnalysisCache()
+    for message in ["Hi I have a fever of 39.5 for 2 weeks", "  hi I HAVE A FEVER OF 39.5 FOR 2 WEEKS\n"]:
+        analysis = cache.analyze(message)
+        assert analysis.intent == intent_service.classify_intent(message)
+        assert cache.triage(message, analysis) == triage_service.triage(message)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_triage_result_is_a_copy():
+    cache = AnalysisCache()
+    first = cache.triage("I have a fever")
+    first["urgency"] = "emergency"
+    first["follow_up_questions"].append("changed")
+    assert cache.triage("I have a fever") == triage_service.triage("I have a fever")
+
+
+def test_long_messages_are_not_cached():
+    cache = AnalysisCache()
+    cache.analyze("fever " * 100)
+    assert cache.stats()["entries"] == 0 and cache.uncacheable == 1
@@ -0,0 +1,212 @@
+"""
+Unit tests for the response/retrieval caches and request coalescing.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+import asyncio
+
+from services.llm_cache import LLMResponseCache, MemoryCacheBackend, make_cache_key
+
+
+MESSAGES = [{"role": "system", "content": "ctx"}, {"role": "user", "content": "I have a fever"}]
+
+
+def test_llm_cache_key_depends_on_model_options_and_messages():
+    base = make_cache_key("qwen", {"temperature": 0.0}, MESSAGES)
+    assert base == make_cache_key("qwen", {"temperature": 0.0}, [dict(m) for m in MESSAGES])
+    assert base != make_cache_key("llama", {"temperature": 0.0}, MESSAGES)
+    assert base != make_cache_key("qwen", {"temperature": 0.7}, MESSAGES)
+    assert base != make_cache_key("qwen", {"temperature": 0.0}, MESSAGES[:1])
+
+
+def test_llm_cache_hit_miss_and_model_invalidation():
+    async def run():
+        cache = LLMResponseCache()
+        cache.enabled = True
+        cache.backend = MemoryCacheBackend(max_entries=8, ttl_seconds=60)
+
+        assert await cache.get("qwen", {}, MESSAGES) is None
+        await cache.set("qwen", {}, MESSAGES, "Rest and fluids.")
+        assert await cache.get("qwen", {}, MESSAGES) == "Rest and fluids."
+
+        # Model change drops previous entries
+        assert await cache.get("llama", {}, MESSAGES) is None
+        assert cache.backend.size() == 0
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_llm_cache_shared_backend_survives_model_switches():
+    async def run():
+        cache = LLMResponseCache()
+        cache.enabled = True
+        cache.backend = MemoryCacheBackend(max_entries=8, ttl_seconds=60)
+        cache.backend.clear_on_model_change = False  # as RedisCacheBackend: other workers' entries
+
+        await cache.set("qwen", {}, MESSAGES, "Rest and fluids.")
+        assert await cache.get("llama", {}, MESSAGES) is None
+        assert await cache.get("qwen", {}, MESSAGES) == "Rest and fluids."
+
+    asyncio.run(run())
+
+
+def test_memory_backend_lru_and_ttl():
+    async def run():
+        backend = MemoryCacheBackend(max_entries=2, ttl_seconds=60)
+        await backend.set("a", "1")
+        await backend.set("b", "2")
+        await backend.get("a")          # "a" is now most recently used
+        await backend.set("c", "3")     # evicts "b"
+        assert await backend.get("b") is None
+        assert await backend.get("a") == "1"
+        assert backend.evictions == 1
+
+        expired = MemoryCacheBackend(max_entries=2, ttl_seconds=-1)
+        await expired.set("a", "1")
+        assert await expired.get("a") is None
+
+    asyncio.run(run())
+
+
+def _semantic_cache(tmp_path, threshold=0.9, max_entries=4):
+    from services.semantic_cache import SemanticAnswerCache
+
+    cache = SemanticAnswerCache()
+    cache.enabled = True
+    cache.threshold = threshold
+    cache.max_entries = max_entries
+    cache.path = str(tmp_path / "semantic_cache.npz")
+    return cache
+
+
+def test_semantic_cache_requires_same_bucket_and_chunks(tmp_path):
+    cache = _semantic_cache(tmp_path)
+    fever = [1.0, 0.0, 0.0]
+    near_fever = [0.98, 0.05, 0.0]
+    chunks = ["nhs_fever_adults.txt#chunk_0"]
+
+    cache.store(fever, "qwen", "rag", "self_care", chunks, "Rest and fluids.")
+    assert cache.lookup(near_fever, "qwen", "rag", "self_care", chunks) == "Rest and fluids."
+    # Different urgency, mode or cited chunks never share answers
+    assert cache.lookup(near_fever, "qwen", "rag", "urgent", chunks) is None
+    assert cache.lookup(near_fever, "qwen", "rag_safety", "self_care", chunks) is None
+    assert cache.lookup(near_fever, "qwen", "rag", "self_care", ["who_cough_adults.txt#chunk_0"]) is None
+    # Below the cosine threshold
+    assert cache.lookup([0.0, 1.0, 0.0], "qwen", "rag", "self_care", chunks) is None
+
+
+def test_semantic_cache_is_scoped_to_the_index_version(tmp_path):
+    cache = _semantic_cache(tmp_path)
+    chunks = ["nhs_fever_adults.txt#chunk_0"]  # same ID after the document is re-ingested
+    cache.set_index_version("v1")
+    cache.store([1.0, 0.0], "qwen", "rag", "self_care", chunks, "Old advice.", index_version="v1")
+    cache.save()
+    assert cache.lookup([1.0, 0.0], "qwen", "rag", "self_care", chunks, index_version="v2") is None
+
+    cache.set_index_version("v2")
+    assert cache.lookup([1.0, 0.0], "qwen", "rag", "self_care", chunks, index_version="v1") is None
+    assert cache.stats()["entries"] == 0
+    # Answers generated on the swapped-out index are not stored
+    cache.store([1.0, 0.0], "qwen", "rag", "self_care", chunks, "Old advice.", index_version="v1")
+    assert cache.stats()["entries"] == 0
+
+    restored = _semantic_cache(tmp_path)
+    restored.load()
+    restored.set_index_version("v2")
+    assert restored.lookup([1.0, 0.0], "qwen", "rag", "self_care", chunks, index_version="v2") is None
+    assert restored.stats()["entries"] == 0
+
+
+def test_semantic_cache_never_serves_emergencies_or_locked_sessions(tmp_path):
+    cache = _semantic_cache(tmp_path)
+    chunks = ["nhs_fever_adults.txt#chunk_0"]
+    cache.store([1.0, 0.0], "qwen", "rag", "self_care", chunks, "Rest and fluids.")
+    assert cache.lookup([1.0, 0.0], "qwen", "rag", "self_care", chunks, lock_state="awaiting_confirmation") is None
+    cache.store([1.0, 0.0], "qwen", "rag", "emergency", chunks, "Call 112.")
+    assert cache.lookup([1.0, 0.0], "qwen", "rag", "emergency", chunks) is None
+
+
+def test_semantic_cache_eviction_and_persistence(tmp_path):
+    cache = _semantic_cache(tmp_path, max_entries=2)
+    for i, answer in enumerate(["a", "b", "c"]):
+        vector = [0.0, 0.0, 0.0]
+        vector[i] = 1.0
+        cache.store(vector, "qwen", "rag", "self_care", [f"doc#chunk_{i}"], answer)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    cache.save()
+
+    restored = _semantic_cache(tmp_path, max_entries=2)
+    restored.load()
+    assert restored.lookup([0.0, 0.0, 1.0], "qwen", "rag", "self_care", ["doc#chunk_2"]) == "c"
+    assert restored.lookup([1.0, 0.0, 0.0], "qwen", "rag", "self_care", ["doc#chunk_0"]) is None
+
+
+def test_singleflight_coalesces_concurrent_identical_calls():
+    from services.singleflight import SingleFlight
+
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        sf = SingleFlight("test")
+        results = await asyncio.gather(*[sf.do("same-key", work) for _ in range(5)])
+        # A later call (after completion) executes again
+        await sf.do("same-key", work)
+        return results, sf.stats()
+
+    results, stats = asyncio.run(run())
+    assert results == ["answer"] * 5
+    assert len(calls) == 2
+    assert stats == {"calls": 6, "executions": 2, "coalesced": 4, "in_flight": 0}
+
+
+def test_retrieval_cache_hits_until_the_index_version_changes(tmp_path, monkeypatch):
+    import json
+
+    import numpy as np
+
+    from services.rag_service import ChromaVectorStore, IndexSnapshot, RAGService
+    from services.retrieval_cache import retrieval_cache
+
+    class FakeCollection:
+        queries = 0
+
+        def query(self, query_embeddings, n_results, include):
+            FakeCollection.queries += 1
+            return {"ids": [["doc.txt#chunk_0"]], "documents": [["Rest and fluids."]],
+                    "metadatas": [[{"org": "NHS", "tags": "fever"}]], "distances": [[0.7]]}
+
+    class FakeEmbedder:
+        def encode(self, text):
+            return np.ones(4, dtype=np.float32)
+
+    def write_version(version):
+        (tmp_path / "index_version.json").write_text(json.dumps({"version": version}))
+
+    monkeypatch.setattr(retrieval_cache, "enabled", True)
+    monkeypatch.setattr(retrieval_cache, "check_interval", 0)
+    monkeypatch.setattr(retrieval_cache, "index_path", None)
+    monkeypatch.setattr(retrieval_cache, "index_version", None)
+    rag = RAGService()
+    write_version("v1")
+    rag.swap_index(IndexSnapshot(str(tmp_path), None, None, ChromaVectorStore(FakeCollection())))
+    rag.embedder, rag.initialized = FakeEmbedder(), True
+
+    first = rag.retrieve("I have a fever", symptom_tags=["fever"])
+    first[0]["snippet"] = "mutated by caller"
+    second = rag.retrieve("I have a fever", symptom_tags=["fever"])
+    assert FakeCollection.queries == 1 and second[0]["snippet"] == "Rest and fluids...."
+    rag.retrieve("I have a fever", symptom_tags=["cough"])
+    assert FakeCollection.queries == 2
+
+    write_version("v2")  # re-ingest
+    rag.retrieve("I have a fever", symptom_tags=["fever"])
+    assert FakeCollection.queries == 3 and retrieval_cache.invalidations == 1
+    retrieval_cache.clear()
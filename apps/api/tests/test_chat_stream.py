@@ -0,0 +1,68 @@
+"""
+Tests for the streaming chat endpoint (POST /chat/stream).
+Ollama is mocked, so these run without a model.
+"""
+import json
+
+from fastapi.testclient import TestClient
+from main import app
+from services.ollama_client import ollama_client
+from store import sessions
+
+
+client = TestClient(app)
+
+
+def _parse_sse(body: str):
+    """Returns a list of (event, data) tuples from an SSE body."""
+    frames = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        frames.append((lines["event"], json.loads(lines["data"])))
+    return frames
+
+
+def test_stream_short_circuit_emits_single_done_frame():
+    """Chitchat never reaches the LLM, so only the final frame is sent."""
+    resp = client.post("/chat/stream", json={"message": "hi", "session_id": "stream_chitchat"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    frames = _parse_sse(resp.text)
+    assert [e for e, _ in frames] == ["done"]
+    assert frames[0][1]["response_kind"] == "chitchat"
+
+
+def test_stream_forwards_tokens_then_metadata(monkeypatch):
+    """Tokens are forwarded as they arrive; the done frame carries the ChatResponse."""
+    async def fake_stream(messages):
+        for delta in ["Rest ", "and ", "drink fluids."]:
+            yield delta
+
+    monkeypatch.setattr(ollama_client, "stream_response", fake_stream)
+    session_id = "stream_medical"
+    resp = client.post("/chat/stream", json={"message": "I have a mild fever", "session_id": session_id})
+    frames = _parse_sse(resp.text)
+
+    assert [e for e, _ in frames] == ["token", "token", "token", "done"]
+    assert "".join(d["delta"] for e, d in frames if e == "token") == "Rest and drink fluids."
+    done = frames[-1][1]
+    assert done["response_kind"] == "medical_advice"
+    assert done["assistant_message"].startswith("Rest and drink fluids.")
+    assert done["triage_result"]["urgency"] == done["urgency"]
+
+    # History written once the stream completed
+    history = sessions[session_id]["history"]
+    assert [type(h).__name__ for h in history] == ["UserTurn", "AssistantTurn"]
+    assert history[-1].content == done["assistant_message"]
+
+
+def test_stream_reports_model_errors_as_frame(monkeypatch):
+    async def failing_stream(messages):
+        raise RuntimeError("Ollama is not running or not accessible.")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(ollama_client, "stream_response", failing_stream)
+    resp = client.post("/chat/stream", json={"message": "I have a mild fever", "session_id": "stream_error"})
+    frames = _parse_sse(resp.text)
+    assert frames[-1][0] == "error"
+    assert frames[-1][1]["code"] == "MODEL_UNAVAILABLE"
@@ -84,3 +84,14 @@ def test_get_job_not_found(client):
         assert resp.status_code == 404
     finally:
         rc.get_job = original_get
+
+
+def test_metrics_exposition():
+    """GET /metrics should return Prometheus text with per-route request counts."""
+    client.get("/health")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'api_http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert "session_store_sessions" in body
@@ -0,0 +1,53 @@
+"""
+The shared keyword matcher must give the same answers as searching each rule pattern.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+import json
+import re
+from pathlib import Path
+
+from services.intent_service import intent_service
+from services.keyword_matcher import keyword_matcher
+from services.safety_service import safety_service
+from services.triage_service import triage_service
+
+PROMPTS = Path(__file__).parent.parent.parent.parent / "eval" / "prompts.jsonl"
+EDGE_CASES = [
+    "  hi there", "HI", "hi\n", "thanks!", "   how are you  ", "no\nstroke", "no stroke, i'm fine",
+    "one sided weakness", "one-sided weakness", "how many mg", "a dosage?", "dosages", "my data", "database",
+    "I won't go", "Hi I have a FEVER of 39.5 for 2 weeks", "stiff neck", "", "  \t",
+]
+
+
+def _search_each(text: str) -> set:
+    rules = {
+        "intent.logistics": intent_service.logistics_patterns, "intent.meta": intent_service.meta_patterns,
+        "intent.chitchat": intent_service.chitchat_patterns,
+        "safety.emergency": safety_service.emergency_patterns, "safety.urgent": safety_service.urgent_patterns,
+        "safety.refusal": safety_service.refusal_patterns, "safety.unlock": safety_service.unlock_patterns,
+        "safety.non_compliance": safety_service.non_compliance_patterns,
+    }
+    hits = {c for c, patterns in rules.items() if any(re.search(p, text.lower().strip()) for p in patterns)}
+    if any(k in text.lower() for k in intent_service.symptom_keywords):
+        hits.add("intent.symptom")
+    for key, words in triage_service.symptoms_map.items():
+        if any(w in text.lower() for w in words):
+            hits.add(f"triage.symptom.{key}")
+    for level, words in triage_service.severity_map.items():
+        if any(w in text.lower() for w in words):
+            hits.add(f"triage.severity.{level}")
+    return hits
+
+
+def test_scan_matches_per_pattern_search():
+    messages = [json.loads(line)["message"] for line in open(PROMPTS, encoding="utf-8") if line.strip()]
+    for message in messages + EDGE_CASES:
+        found = {c for c in keyword_matcher.scan(message) if not c.startswith(("triage.cue.", "triage.temperature", "triage.duration"))}
+        assert found == _search_each(message), message
+
+
+def test_scan_extracts_temperature_and_duration():
+    hits = keyword_matcher.scan("Fever 39,5 since 2 weeks")
+    assert hits["triage.temperature"] == "39,5"
+    assert hits["triage.duration"] == "2 week"
+    assert triage_service.parse_symptoms("Fever 39,5 since 2 weeks")["duration_days"] == 14
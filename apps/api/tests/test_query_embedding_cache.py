@@ -0,0 +1,40 @@
+"""
+Query embedding cache: LRU bound, read-only float32 vectors, persistence per model ID.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+import numpy as np
+
+from services.query_embedding_cache import QueryEmbeddingCache
+
+
+def _cache(tmp_path, max_entries=2):
+    cache = QueryEmbeddingCache()
+    cache.enabled, cache.persist, cache.max_entries = True, True, max_entries
+    cache.path = str(tmp_path / "query_embeddings.npz")
+    return cache
+
+
+def test_get_or_embed_encodes_once(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+    encode = lambda text: calls.append(text) or np.ones(4, dtype=np.float64)  # noqa: E731
+    first = cache.get_or_embed("m", "fever temperature duration red flags", encode)
+    second = cache.get_or_embed("m", "fever temperature duration red flags", encode)
+    assert len(calls) == 1 and second is first
+    assert first.dtype == np.float32 and not first.flags.writeable
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction_and_persistence(tmp_path):
+    cache = _cache(tmp_path)
+    for text in ["a", "b", "c"]:
+        cache.put("m", text, np.full(4, ord(text)))
+    assert cache.get("m", "a") is None and cache.evictions == 1
+    cache.put("other-model", "b", np.zeros(4))
+    cache.save()
+
+    restored = _cache(tmp_path, max_entries=10)
+    restored.load("m")
+    assert restored.stats()["entries"] == 1  # "b" of "m" was evicted by the other model's entry
+    assert np.array_equal(restored.get("m", "c"), np.full(4, ord("c")))
+    assert restored.get("other-model", "b") is None
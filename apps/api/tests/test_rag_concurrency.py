@@ -0,0 +1,51 @@
+"""
+Concurrency test: blocking RAG work (embedding + Chroma query) must not stall
+the event loop. /health latency should stay flat while retrieval is busy.
+"""
+import asyncio
+import time
+
+import httpx
+from main import app
+from services.ollama_client import ollama_client
+from services.rag_service import rag_service
+
+
+RETRIEVAL_SECONDS = 0.5
+
+
+def _slow_retrieve(query, symptom_tags=None, k=8):
+    # Simulates MiniLM encode + Chroma query: blocking, holds a pool thread
+    time.sleep(RETRIEVAL_SECONDS)
+    return [], None, None
+
+
+async def _health_latency(client: httpx.AsyncClient) -> float:
+    start = time.perf_counter()
+    resp = await client.get("/health")
+    assert resp.status_code == 200
+    return time.perf_counter() - start
+
+
+def test_health_latency_flat_while_retrieval_busy(monkeypatch):
+    async def healthy():
+        return True
+
+    monkeypatch.setattr(ollama_client, "check_health", healthy)
+    monkeypatch.setattr(rag_service, "retrieve_with_embedding", _slow_retrieve)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            idle = await _health_latency(client)
+
+            busy = [asyncio.create_task(rag_service.aretrieve_with_embedding(f"fever {i}")) for i in range(4)]
+            await asyncio.sleep(0.05)  # let the pool pick up the work
+            during = [await _health_latency(client) for _ in range(5)]
+            await asyncio.gather(*busy)
+            return idle, during
+
+    idle, during = asyncio.run(run())
+    # If retrieval ran on the event loop, each probe would wait ~RETRIEVAL_SECONDS
+    assert max(during) < RETRIEVAL_SECONDS / 2
+    assert max(during) < idle + 0.2
@@ -0,0 +1,85 @@
+"""
+RAG index hot swap: rag/index/CURRENT switches the served index; retrievals in
+flight keep the snapshot they started on, which is closed once they drain.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+import json
+
+import services.rag_service as rag_module
+from services.index_pointer import current_index_dir, publish_index
+from services.rag_service import IndexSnapshot, RAGService
+from services.retrieval_cache import RetrievalCache
+from services.semantic_cache import SemanticAnswerCache
+
+
+class FakeStore:
+    name = "fake"
+
+    def count(self):
+        return 0
+
+
+class FakeSnapshot(IndexSnapshot):
+    def __init__(self, path):
+        super().__init__(path, None, None, FakeStore())
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _make_index(root, name, version):
+    path = root / name
+    path.mkdir()
+    (path / "index_version.json").write_text(json.dumps({"version": version, "embedding_model": "test-model"}))
+    return str(path)
+
+
+def _service(monkeypatch, root):
+    monkeypatch.setattr(rag_module, "retrieval_cache", RetrievalCache())
+    monkeypatch.setattr(rag_module, "semantic_cache", SemanticAnswerCache())
+    monkeypatch.setattr(IndexSnapshot, "open", classmethod(lambda cls, path: FakeSnapshot(path)))
+    service = RAGService()
+    service.index_root = str(root)
+    service.embedding_model_id = "test-model"
+    service.poll_seconds = 0
+    return service
+
+
+def test_swap_closes_old_index_after_readers_drain(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    old = FakeSnapshot(_make_index(tmp_path, "chroma-a", "a"))
+    new = FakeSnapshot(_make_index(tmp_path, "chroma-b", "b"))
+    service.swap_index(old)
+
+    pinned = service._acquire()  # a retrieval in flight on the old index
+    service.swap_index(new)
+    assert service._acquire() is new
+    assert not old.closed and service.index_stats()["draining"] == [old.path]
+
+    service._release(pinned)
+    assert old.closed and service.index_stats()["draining"] == []
+    assert rag_module.retrieval_cache.index_version == "b"
+
+
+def test_reload_follows_current_pointer(monkeypatch, tmp_path):
+    service = _service(monkeypatch, tmp_path)
+    _make_index(tmp_path, "chroma-a", "a")
+    publish_index(str(tmp_path), "chroma-a")
+    service.index_path = current_index_dir(str(tmp_path))
+    service.swap_index(FakeSnapshot(service.index_path))
+    service.initialized = True
+    assert service.reload()["status"] == "unchanged"
+
+    _make_index(tmp_path, "chroma-b", "b")
+    publish_index(str(tmp_path), "chroma-b")
+    result = service.reload()
+    assert result["status"] == "swapped" and result["index_version"] == "b"
+    assert service.index_path == str(tmp_path / "chroma-b")
+
+    # An index built with another embedding model is never swapped in
+    (tmp_path / "chroma-c").mkdir()
+    (tmp_path / "chroma-c" / "index_version.json").write_text(json.dumps({"version": "c", "embedding_model": "other"}))
+    publish_index(str(tmp_path), "chroma-c")
+    assert service.reload()["status"] == "embedding_model_mismatch"
+    assert service.index_path == str(tmp_path / "chroma-b")
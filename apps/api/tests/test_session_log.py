@@ -0,0 +1,55 @@
+"""
+Unit tests for the append-only session history log.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+import datetime
+
+from services.session_history import UserTurn
+from services.session_log import SessionLog
+
+
+def _log(tmp_path) -> SessionLog:
+    log = SessionLog()
+    log.enabled = True
+    log.log_dir = tmp_path
+    return log
+
+
+def test_session_log_round_trip_and_restart(tmp_path):
+    log = _log(tmp_path)
+    log.start()
+    for i in range(3):
+        log.append("a", "a-1", UserTurn(f"a{i}", datetime.datetime.now()))
+        log.append("b", "b-1", UserTurn(f"b{i}", datetime.datetime.now()))
+    assert log.flush()
+    assert [t.content for t in log.iter_history("a", "a-1")] == ["a0", "a1", "a2"]
+    log.stop()
+
+    # A torn last line (crash mid-write) is skipped, later records still land on their own line
+    segment = next(tmp_path.glob("sessions-*.jsonl"))
+    with open(segment, "ab") as f:
+        f.write(b'["a","a-1",["u","tor')
+
+    # The memory store starts empty, so lines from before the restart are not indexed
+    restarted = _log(tmp_path)
+    restarted.start()
+    restarted.append("a", "a-2", UserTurn("a3", datetime.datetime.now()))
+    assert restarted.flush()
+    assert [t.content for t in restarted.iter_history("a", "a-2")] == ["a3"]
+    assert list(restarted.iter_history("b", "b-1")) == []
+    assert restarted.stats()["indexed_turns"] == 1
+    restarted.stop()
+
+
+def test_session_log_never_mixes_reused_session_ids(tmp_path):
+    log = _log(tmp_path)
+    log.start()
+    log.append("default", "first", UserTurn("first user", datetime.datetime.now()))
+    assert log.flush()
+    log.forget("default", "first")  # the store evicted the session
+    assert not log.has("default", "first")
+
+    log.append("default", "second", UserTurn("second user", datetime.datetime.now()))
+    assert log.flush()
+    assert [t.content for t in log.iter_history("default", "second")] == ["second user"]
+    log.stop()
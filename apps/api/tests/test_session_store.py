@@ -0,0 +1,138 @@
+"""
+Unit tests for the bounded chat session store.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+import asyncio
+import datetime
+import time
+
+import pytest
+
+import models
+from services.logistics_service import logistics_service
+from services.session_history import AssistantTurn, UserTurn
+from store import MemorySessionStore, SessionConflictError
+
+
+def _new_session():
+    return {"lock_state": "none", "last_triage": "self_care", "urgent_pending": False, "history": []}
+
+
+def test_session_store_lru_eviction_and_ttl(monkeypatch):
+    store = MemorySessionStore(ttl_seconds=3600, max_sessions=2, max_turns=10, max_history_bytes=10_000)
+    store["a"] = _new_session()
+    store["b"] = _new_session()
+    store["a"]["lock_state"] = "awaiting_confirmation"  # "a" is now most recently used
+    store["c"] = _new_session()                         # evicts "b"
+    assert "b" not in store
+    assert store["a"]["lock_state"] == "awaiting_confirmation"
+    assert len(store) == 2
+    assert store.stats()["evicted"] == 1
+
+    expired = MemorySessionStore(ttl_seconds=60, max_sessions=2, max_turns=10, max_history_bytes=10_000)
+    expired["a"] = _new_session()
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert "a" not in expired
+    assert expired.get("a") is None
+
+
+def test_session_store_reused_id_is_a_new_incarnation():
+    store = MemorySessionStore(ttl_seconds=3600, max_sessions=1, max_turns=10, max_history_bytes=10_000)
+    evicted = []
+    store.on_evict = lambda sid, incarnation: evicted.append((sid, incarnation))
+    store.open_session("default")
+    first = store.incarnation("default")
+    store.open_session("other")  # evicts "default"
+    assert evicted == [("default", first)]
+    store.open_session("default")
+    assert store.incarnation("default") not in (None, first)
+
+
+def test_session_store_caps_history_turns_and_bytes():
+    store = MemorySessionStore(ttl_seconds=3600, max_sessions=10, max_turns=3, max_history_bytes=10_000)
+    store["s"] = _new_session()
+    for i in range(5):
+        store.append_history("s", UserTurn(f"msg {i}", datetime.datetime.now()))
+    assert [h.content for h in store["s"]["history"]] == ["msg 2", "msg 3", "msg 4"]
+
+    small = MemorySessionStore(ttl_seconds=3600, max_sessions=10, max_turns=100, max_history_bytes=200)
+    small["s"] = _new_session()
+    for i in range(10):
+        small.append_history("s", UserTurn("x" * 60, datetime.datetime.now()))
+    stats = small.stats()
+    assert stats["history_bytes"] <= 200
+    assert stats["trimmed_turns"] == 10 - len(small["s"]["history"])
+
+
+def test_compact_history_expands_to_the_original_entry():
+    citation = {
+        "id": "nhs_fever_adults.txt#chunk_0", "title": "Fever in adults", "org": "NHS",
+        "source_type": "guideline", "date_accessed": "N/A", "source_url": "https://www.nhs.uk/",
+        "snippet": "Most fevers...", "full_text": "Most fevers get better on their own.",
+    }
+    response = models.ChatResponse(
+        assistant_message="Rest and drink fluids.", urgency="self_care", safety_flags=[],
+        citations=[citation], recommendations=["How high is the fever?"],
+        local_resources=logistics_service.resources[:1], local_context={"city": "Bucharest", "mode": "emergency"},
+        triage_result={"urgency": "self_care", "symptom_tags": ["fever"], "recommended_action": "Rest.",
+                       "follow_up_questions": ["How high is the fever?"], "reason": "Mild fever likely viral."},
+        response_kind="medical_advice",
+    )
+    now = datetime.datetime.now()
+    original = {"role": "assistant", "content": response.assistant_message, "meta": response.dict(), "timestamp": now.isoformat()}
+
+    turn = AssistantTurn.from_response(response, now, logistics_service.resource_id)
+    assert turn.citation_ids == ("nhs_fever_adults.txt#chunk_0",)
+    citations = {citation["id"]: citation}
+    assert turn.expand(citations, logistics_service.get_resource) == original
+    restored = AssistantTurn.from_compact(turn.to_compact())
+    assert restored.expand(citations, logistics_service.get_resource) == original
+
+
+def test_export_never_substitutes_changed_citation_text():
+    citation = {
+        "id": "nhs_fever_adults.txt#chunk_0", "title": "Fever in adults", "org": "NHS",
+        "source_type": "guideline", "snippet": "Most fevers...", "full_text": "Most fevers get better on their own.",
+    }
+    response = models.ChatResponse(
+        assistant_message="Rest and drink fluids.", urgency="self_care", safety_flags=[],
+        citations=[citation], recommendations=[],
+    )
+    turn = AssistantTurn.from_response(response, datetime.datetime.now(), logistics_service.resource_id, "v1")
+    turn = AssistantTurn.from_compact(turn.to_compact())
+    assert turn.index_version == "v1"
+
+    # Same chunk ID after a re-ingest, different text
+    reingested = {**citation, "full_text": "Updated guidance.", "snippet": "Updated..."}
+    exported = turn.expand({citation["id"]: reingested}, logistics_service.get_resource)["meta"]["citations"]
+    assert exported[0]["source_type"] == "unresolved" and "Updated" not in exported[0]["snippet"]
+    assert turn.expand({}, logistics_service.get_resource)["meta"]["citations"][0]["source_type"] == "unresolved"
+
+
+class _RacingStore:
+    """Another worker locks the session between this request's read and its write."""
+
+    def __init__(self, conflicts: int):
+        self.conflicts = conflicts
+
+    async def asave_state(self, session_id, session, expected_lock_state):
+        self.conflicts -= 1
+        return self.conflicts < 0
+
+    async def aopen_session(self, session_id):
+        return {**_new_session(), "lock_state": "awaiting_confirmation"}
+
+
+def test_safety_is_reevaluated_on_the_stored_state_after_a_lock_conflict(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "sessions", _RacingStore(conflicts=1))
+    session, safety_eval = asyncio.run(main._evaluate_safety("s", _new_session(), "I have a mild headache", None))
+    # The stale "allow" is discarded: the answer reflects the lock the other worker set
+    assert session["lock_state"] == "awaiting_confirmation"
+    assert safety_eval.action == "escalate" and "emergency_lock_active" in safety_eval.flags
+
+    monkeypatch.setattr(main, "sessions", _RacingStore(conflicts=main.SAFETY_CAS_ATTEMPTS))
+    with pytest.raises(SessionConflictError):
+        asyncio.run(main._evaluate_safety("s", _new_session(), "I have a mild headache", None))
@@ -0,0 +1,44 @@
+"""
+Tests for per-stage chat pipeline timing (Server-Timing header + histograms).
+"""
+from fastapi.testclient import TestClient
+from main import app
+from services.timing import StageHistogram, StageTimer, timing
+
+
+client = TestClient(app)
+
+
+def test_chat_emits_server_timing_header():
+    resp = client.post("/chat", json={"message": "hi", "session_id": "timing_chitchat"})
+    assert resp.status_code == 200
+    header = resp.headers["Server-Timing"]
+    stages = [part.split(";")[0] for part in header.split(", ")]
+    assert stages[0] == "intent"
+    assert stages[-1] == "total"
+    assert timing.snapshot()["intent"]["count"] >= 1
+
+
+def test_untimed_routes_have_no_header():
+    assert "Server-Timing" not in client.get("/docs").headers
+
+
+def test_disabled_timer_is_a_noop():
+    timer = StageTimer()
+    timer.enabled = False
+    assert timer.start_trace() is None
+    with timer.stage("intent"):
+        pass
+    assert timer.snapshot() == {}
+
+
+def test_histogram_percentiles():
+    histogram = StageHistogram(window=1000)
+    for ms in range(1, 101):
+        histogram.observe(float(ms))
+    snap = histogram.snapshot()
+    assert snap["count"] == 100
+    assert snap["p50_ms"] == 51.0
+    assert snap["p95_ms"] == 95.0
+    assert snap["p99_ms"] == 99.0
+    assert snap["max_ms"] == 100.0
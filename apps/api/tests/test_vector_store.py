@@ -0,0 +1,68 @@
+"""
+NumPy exact-search backend: same filtering and ranking rules as the Chroma backend.
+Run: pytest tests/ -v  (from apps/api/)
+"""
+import numpy as np
+
+from services.rag_service import ChromaVectorStore, NumpyVectorStore
+
+IDS = ["a#chunk_0", "b#chunk_0", "c#chunk_0", "d#chunk_0"]
+DOCS = ["alpha", "beta", "gamma", "delta"]
+METAS = [
+    {"org": "Unknown", "tags": "fever,adult"},
+    {"org": "NHS", "tags": "cough"},
+    {"org": "WHO", "tags": "fever"},
+    {"org": "CDC", "tags": "fever"},
+]
+EMBEDDINGS = np.array([[1.0, 0.0], [0.8, 0.6], [0.6, 0.8], [-1.0, 0.0]], dtype=np.float32)
+
+
+class FakeCollection:
+    """Exact squared-L2 query in Chroma's result format."""
+
+    def query(self, query_embeddings, n_results, include):
+        q = np.asarray(query_embeddings[0], dtype=np.float32)
+        dist = ((EMBEDDINGS - q) ** 2).sum(axis=1)
+        order = np.argsort(dist)[:n_results]
+        return {"ids": [[IDS[i] for i in order]], "documents": [[DOCS[i] for i in order]],
+                "metadatas": [[dict(METAS[i]) for i in order]], "distances": [[float(dist[i]) for i in order]]}
+
+
+def test_numpy_store_matches_chroma_ranking():
+    numpy_store = NumpyVectorStore(IDS, DOCS, METAS, EMBEDDINGS)
+    chroma_store = ChromaVectorStore(FakeCollection())
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    for tags in (None, ["fever"], ["cough", "fever"], ["unknown_tag"]):
+        expected = chroma_store.search(query, 8, tags)
+        found = numpy_store.search(query, 8, tags)
+        assert [r["id"] for r in found] == [r["id"] for r in expected]
+        assert np.allclose([r["score"] for r in found], [r["score"] for r in expected])
+    # "d" is 4.0 away: filtered by the relevance threshold
+    assert "d#chunk_0" not in [r["id"] for r in numpy_store.search(query, 8)]
+
+
+def test_numpy_store_get_and_small_k():
+    store = NumpyVectorStore(IDS, DOCS, METAS, EMBEDDINGS)
+    assert store.get(["c#chunk_0", "missing"]) == [("c#chunk_0", "gamma", METAS[2])]
+    assert [r["id"] for r in store.search(np.array([0.0, 1.0]), 1)] == ["c#chunk_0"]
+    assert NumpyVectorStore([], [], [], np.zeros((0, 2))).search(np.array([1.0, 0.0]), 8) == []
+
+
+def test_mapped_index_round_trip_matches_in_memory_store(tmp_path):
+    from services.mapped_index import MappedIndex, MappedIndexWriter
+
+    metas = METAS[:3] + [{"title": "no org or tags", "year": 2024, "reviewed": True}]
+    writer = MappedIndexWriter(tmp_path / "mapped_index.bin", index_version="v1")
+    writer.add(IDS[:2], DOCS[:2], metas[:2], EMBEDDINGS[:2])
+    writer.add(IDS[2:], ["gämma ✓", DOCS[3]], metas[2:], EMBEDDINGS[2:])
+    writer.close()
+
+    mapped = MappedIndex(tmp_path / "mapped_index.bin")
+    assert mapped.version == "v1" and mapped.count == 4
+    assert list(mapped.ids) == IDS and list(mapped.metadatas) == metas
+    memory_store = NumpyVectorStore(IDS, DOCS[:2] + ["gämma ✓", DOCS[3]], metas, EMBEDDINGS)
+    mapped_store = NumpyVectorStore.from_mapped(mapped)
+    for query in (np.array([1.0, 0.0]), np.array([-0.6, 0.8])):
+        for tags in (None, ["fever"], ["cough", "fever"]):
+            assert mapped_store.search(query, 8, tags) == memory_store.search(query, 8, tags)
+    assert mapped_store.get(["c#chunk_0"]) == [("c#chunk_0", "gämma ✓", metas[2])]
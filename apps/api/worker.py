@@ -15,6 +15,11 @@ from cv.quality import analyze_quality
 from cv.scan import scan_document
 from cv.ocr import run_ocr, run_ocr_variants
 from cv.visualize import generate_debug_overlays
+from services import metrics
+from prometheus_client import start_http_server
+
+# Prometheus exposition for the worker process (the API serves its own on /metrics)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9101"))
 
 def save_to_supabase(job_id: str, job_data: dict, result: dict, error: str = None):
     """
@@ -121,10 +126,11 @@ def process_job(job_id, job_data):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
             
-        with open(file_path, "rb") as f:
-            contents = f.read()
+        with metrics.time_histogram(metrics.WORKER_STAGE_LATENCY, stage="decode"):
+            with open(file_path, "rb") as f:
+                contents = f.read()
             
-        original_img = decode_image_to_cv2(contents)
+            original_img = decode_image_to_cv2(contents)
         if original_img is None:
             raise ValueError("Could not decode image")
             
@@ -147,26 +153,31 @@ def process_job(job_id, job_data):
                 pass
 
         # 3. Scan
-        scanned_img, boundary_result, scan_meta = scan_document(
-            original_img, 
-            corners_override=parsed_corners
-        )
+        with metrics.time_histogram(metrics.WORKER_STAGE_LATENCY, stage="scan"):
+            scanned_img, boundary_result, scan_meta = scan_document(
+                original_img, 
+                corners_override=parsed_corners
+            )
         update_job_status(job_id, "running", progress=40)
 
         # 4. Quality
         doc_conf = boundary_result.get("confidence", 0.5)
-        quality_res = analyze_quality(original_img, doc_confidence=doc_conf)
+        with metrics.time_histogram(metrics.WORKER_STAGE_LATENCY, stage="quality"):
+            quality_res = analyze_quality(original_img, doc_confidence=doc_conf)
         update_job_status(job_id, "running", progress=50)
 
         # 5. OCR
-        ocr_res = run_ocr(scanned_img, engine=ocr_engine, mode=ocr_mode)
+        with metrics.time_histogram(metrics.WORKER_STAGE_LATENCY, stage="ocr"):
+            ocr_res = run_ocr(scanned_img, engine=ocr_engine, mode=ocr_mode)
+        metrics.observe_ocr(ocr_res, source="worker")
         update_job_status(job_id, "running", progress=70)
 
         # 6. Ablation
         ocr_variants_list = None
         best_variant = None
         if run_ablation:
-            variants_data, best_var = run_ocr_variants(original_img, scanned_img)
+            with metrics.time_histogram(metrics.WORKER_STAGE_LATENCY, stage="ocr_ablation"):
+                variants_data, best_var = run_ocr_variants(original_img, scanned_img)
             if variants_data:
                 ocr_variants_list = [
                     {
@@ -185,9 +196,10 @@ def process_job(job_id, job_data):
         # 7. Debug Overlays
         debug_overlays = None
         if include_debug_overlays or os.environ.get("CV_DEBUG_VIS", "0") == "1":
-            overlays_data = generate_debug_overlays(
-                original_img, include_glare=True, include_edges=True
-            )
+            with metrics.time_histogram(metrics.WORKER_STAGE_LATENCY, stage="debug_overlays"):
+                overlays_data = generate_debug_overlays(
+                    original_img, include_glare=True, include_edges=True
+                )
             debug_overlays = {
                 "glare_overlay": overlays_data.get("glare_overlay"),
                 "edge_overlay": overlays_data.get("edge_overlay")
@@ -229,6 +241,7 @@ def process_job(job_id, job_data):
         }
         
         update_job_status(job_id, "done", progress=100, result=result)
+        metrics.WORKER_JOBS.labels(status="done").inc()
         print(f"Job {job_id} completed.")
         
     except Exception as e:
@@ -236,13 +249,18 @@ def process_job(job_id, job_data):
         traceback.print_exc()
         error_msg = str(e)
         update_job_status(job_id, "failed", error=error_msg)
+        metrics.WORKER_JOBS.labels(status="failed").inc()
+        metrics.WORKER_FAILURES.labels(error=type(e).__name__).inc()
         
     # Phase 5A: Persistence
     # Always try to save even on failure (to record the error)
-    save_to_supabase(job_id, job_data, result, error_msg)
+    with metrics.time_histogram(metrics.WORKER_STAGE_LATENCY, stage="persist"):
+        save_to_supabase(job_id, job_data, result, error_msg)
 
 
 def main():
+    start_http_server(WORKER_METRICS_PORT)
+    print(f"Worker metrics on :{WORKER_METRICS_PORT}/metrics")
     print("Worker started. Waiting for jobs...")
     r = get_redis_client()
     
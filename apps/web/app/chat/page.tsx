@@ -403,33 +403,66 @@ export default function ChatPage() {
 
     const ctrl = new AbortController();
     const tid = setTimeout(() => ctrl.abort(), 30_000);
+    let placeholder = false;
+    let streamed = "";
 
     try {
       let finalMessage = userMsg;
       if (attachmentText) finalMessage += `\n\n[ATTACHED DOCUMENT TEXT]:\n${attachmentText}`;
 
-      const res = await fetch(`${apiBase}/chat`, {
+      const res = await fetch(`${apiBase}/chat/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ message: finalMessage, mode, session_id: sessionId }),
         signal: ctrl.signal,
       });
       if (res.ok && attachmentText) setAttachmentText("");
+      // Headers arrived — tokens stream in from here, so drop the connect timeout
       clearTimeout(tid);
 
-      if (!res.ok) {
+      if (!res.ok || !res.body) {
         let msg = `API Error: ${res.status}`;
         try { const d = await res.json(); if (d.error?.message) msg = d.error.message; } catch {}
         throw new Error(msg);
       }
 
-      const data: ChatResponse = await res.json();
-      setMessages((p) => [...p, { role: "assistant", content: data.assistant_message, meta: data }]);
+      // SSE frames: "event: token|done|error\ndata: {...}\n\n"
+      setMessages((p) => [...p, { role: "assistant", content: "" }]);
+      placeholder = true;
+      const setLast = (m: Message) => setMessages((p) => [...p.slice(0, -1), m]);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep: number;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+          const frame = buffer.slice(0, sep);
+          buffer = buffer.slice(sep + 2);
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? "{}");
+          if (event === "token") {
+            streamed += data.delta;
+            setLast({ role: "assistant", content: streamed });
+          } else if (event === "done") {
+            const final: ChatResponse = data;
+            setLast({ role: "assistant", content: final.assistant_message, meta: final });
+          } else if (event === "error") {
+            throw new Error(data.message || "Stream error");
+          }
+        }
+      }
     } catch (e: any) {
       const msg = e.name === "AbortError"
          ? `⚠️ Timed out — is the API running at ${apiBase}?`
          : `⚠️ ${e.message || "Unknown error"}`;
-      setMessages((p) => [...p, { role: "assistant", content: msg }]);
+      // Replace the empty streaming placeholder rather than leaving a blank bubble
+      setMessages((p) => placeholder && !streamed
+        ? [...p.slice(0, -1), { role: "assistant", content: msg }]
+        : [...p, { role: "assistant", content: msg }]);
     } finally {
       setLoading(false);
       inputRef.current?.focus();
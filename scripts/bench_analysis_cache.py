@@ -0,0 +1,88 @@
+"""
+Micro-benchmark: per-message analysis (keyword scan + intent + triage), uncached vs
+services/analysis_cache.py.
+
+The workload replays eval/prompts.jsonl plus the short messages that dominate real
+traffic ("hi", "I am safe", the confirm_safe button token, ...) with a Zipf-like
+popularity skew, and random case / surrounding whitespace variants.
+
+Usage (from repo root):
+    python scripts/bench_analysis_cache.py --messages 200000
+"""
+import argparse
+import json
+import pathlib
+import random
+import sys
+import time
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+from services.analysis_cache import analysis_cache  # noqa: E402
+from services.intent_service import intent_service  # noqa: E402
+from services.keyword_matcher import keyword_matcher  # noqa: E402
+from services.triage_service import triage_service  # noqa: E402
+
+PROMPTS_PATH = REPO_ROOT / "eval" / "prompts.jsonl"
+COMMON = ["hi", "hello", "thanks", "I am safe", "confirm_safe", "I have a fever", "yes", "no", "ok"]
+
+
+def load_prompts():
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line)["message"] for line in f if line.strip()]
+
+
+def workload(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    pool = COMMON + load_prompts()
+    weights = [1 / (rank + 1) for rank in range(len(pool))]  # Zipf s=1
+    messages = []
+    for message in rng.choices(pool, weights, k=n):
+        if rng.random() < 0.2:
+            message = message.capitalize() if rng.random() < 0.5 else f" {message} "
+        messages.append(message)
+    return messages
+
+
+def uncached(message):
+    hits = keyword_matcher.scan(message)
+    intent_service.classify_intent(message, hits)
+    return triage_service.triage(message, hits)
+
+
+def cached(message):
+    return analysis_cache.triage(message)
+
+
+def run(fn, messages):
+    started = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - started) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the message analysis cache.")
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    messages = workload(args.messages)
+    mismatches = sum(1 for m in set(messages) if uncached(m) != cached(m))
+    analysis_cache.clear()
+    analysis_cache.hits = analysis_cache.misses = 0
+
+    uncached_us = run(uncached, messages)
+    cached_us = run(cached, messages)
+    stats = analysis_cache.stats()
+    print(f"Messages: {len(messages)}  |  distinct: {len(set(messages))}  |  mismatches: {mismatches}")
+    print(f"uncached analysis  {uncached_us:7.2f} us/msg")
+    print(f"analysis cache     {cached_us:7.2f} us/msg   ({uncached_us / cached_us:.1f}x)")
+    print(f"hit rate {stats['hit_rate']:.1%}  |  entries {stats['entries']}  |  "
+          f"~{stats['approx_bytes'] / 1024:.0f} KiB ({stats['approx_bytes'] / max(stats['entries'], 1):.0f} B/entry)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Benchmark: sequential vs concurrent (speculative retrieval) chat pipeline.
+
+Runs main._prepare_chat (everything before the LLM call) over eval/prompts.jsonl
+with CHAT_SPECULATIVE_RETRIEVAL off and on. Retrieval is stubbed with a blocking
+sleep on the RAG thread pool (emulating MiniLM encode + Chroma query on CPU), so
+no model or index is needed.
+
+Each variant runs against two session stores:
+  memory   the in-process store: no I/O, so there is nothing for retrieval to overlap
+  remote   the same store behind a blocking round trip of --session-rtt-ms per call,
+           run in a worker thread like RedisSessionStore (open, user turn, lock CAS)
+
+Usage (from repo root):
+    python scripts/bench_chat_pipeline.py --retrieval-ms 15 --session-rtt-ms 1 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import statistics
+import sys
+import time
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+import numpy as np  # noqa: E402
+
+import main  # noqa: E402
+from config import settings  # noqa: E402
+from models import ChatRequest  # noqa: E402
+from services.rag_service import rag_service  # noqa: E402
+from services.semantic_cache import semantic_cache  # noqa: E402
+from store import MemorySessionStore  # noqa: E402
+
+PROMPTS_PATH = REPO_ROOT / "eval" / "prompts.jsonl"
+
+
+def load_prompts():
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line)["message"] for line in f if line.strip()]
+
+
+def install_stub_retrieval(retrieval_ms: float):
+    def fake_retrieve(query, symptom_tags=None, k=8):
+        time.sleep(retrieval_ms / 1000.0)
+        citation = {
+            "id": "nhs_fever_adults.txt#chunk_0", "title": "Fever in adults", "org": "NHS",
+            "source_type": "guideline", "date_accessed": "N/A", "source_url": "",
+            "snippet": "Stub...", "full_text": "Stub guideline text.",
+        }
+        return [citation], np.zeros(384, dtype=np.float32), "bench"
+
+    rag_service.initialized = True
+    rag_service.retrieve_with_embedding = fake_retrieve
+
+
+class RemoteSessionStore(MemorySessionStore):
+    """MemorySessionStore with a network round trip per async call, off the event loop like Redis."""
+
+    def __init__(self, rtt_ms: float):
+        super().__init__(ttl_seconds=3600, max_sessions=10_000, max_turns=40, max_history_bytes=64_000)
+        self.rtt = rtt_ms / 1000.0
+
+    async def aopen_session(self, session_id):
+        await asyncio.to_thread(time.sleep, self.rtt)
+        return self.open_session(session_id)
+
+    async def asave_state(self, session_id, session, expected_lock_state):
+        await asyncio.to_thread(time.sleep, self.rtt)
+        return self.save_state(session_id, session, expected_lock_state)
+
+    async def aappend_history(self, session_id, item):
+        await asyncio.to_thread(time.sleep, self.rtt)
+        self.append_history(session_id, item)
+
+
+async def run_variant(prompts, speculative: bool, repeat: int, tag: str):
+    settings.CHAT_SPECULATIVE_RETRIEVAL = speculative
+    latencies, retrieving = [], []
+    for r in range(repeat):
+        for i, message in enumerate(prompts):
+            request = ChatRequest(message=message, mode="rag", session_id=f"bench-{tag}-{r}-{i}")
+            started = time.perf_counter()
+            _, _, generation = await main._prepare_chat(request)
+            elapsed = (time.perf_counter() - started) * 1000
+            latencies.append(elapsed)
+            if generation is not None and generation["citations_used"]:
+                retrieving.append(elapsed)
+    return latencies, retrieving
+
+
+def summarize(name, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(f"{name:<28} mean={statistics.mean(ordered):7.2f} ms  p50={statistics.median(ordered):7.2f} ms  "
+          f"p95={p95:7.2f} ms  total={sum(ordered) / 1000:6.2f} s")
+    return statistics.mean(ordered)
+
+
+async def bench(args):
+    prompts = load_prompts()
+    install_stub_retrieval(args.retrieval_ms)
+    semantic_cache.enabled = False
+
+    print(f"Prompts: {len(prompts)} x {args.repeat}  |  stub retrieval: {args.retrieval_ms} ms  |  "
+          f"session round trip: {args.session_rtt_ms} ms")
+    for name, store in (("memory", MemorySessionStore(3600, 10_000, 40, 64_000)),
+                        ("remote", RemoteSessionStore(args.session_rtt_ms))):
+        main.sessions = store
+        # Warm the thread pools and code paths once
+        await run_variant(prompts[:5], True, 1, f"warm-{name}")
+        results = {}
+        for variant, speculative in (("sequential", False), ("concurrent", True)):
+            latencies, retrieving = await run_variant(prompts, speculative, args.repeat, f"{variant}-{name}")
+            summarize(f"{name}: {variant}", latencies)
+            results[variant] = summarize("  requests with retrieval", retrieving)
+        change = (results["concurrent"] - results["sequential"]) / results["sequential"] * 100
+        print(f"{name}: mean latency change (requests with retrieval) {change:+.2f}%")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the chat pipeline stage graph.")
+    parser.add_argument("--retrieval-ms", type=float, default=15.0, help="Stub retrieval latency (ms)")
+    parser.add_argument("--session-rtt-ms", type=float, default=1.0, help="Emulated session store round trip (ms)")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over eval/prompts.jsonl")
+    args = parser.parse_args()
+    os.environ.setdefault("TIMING_ENABLED", "0")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,110 @@
+"""
+Benchmark: embedding backends for RAG query encoding (EMBEDDING_BACKEND).
+
+  torch: SentenceTransformer (PyTorch)
+  onnx:  int8 ONNX Runtime export (scripts/export_onnx_embedder.py)
+
+Each backend runs in a fresh subprocess so import time and memory are not shared:
+  import   seconds to import the backend's modules (torch / onnxruntime + tokenizers)
+  load     seconds to load the model
+  RSS      resident memory after loading and encoding
+  query    p50 / p95 ms for single-query encode over eval/prompts.jsonl (retrieval path)
+  batch    chunks/s for batched encode of 1000-char chunks (ingestion path)
+and the cosine between the two backends' query embeddings.
+
+Usage (from repo root):
+    python scripts/bench_embedding_backends.py
+    python scripts/bench_embedding_backends.py --model all-MiniLM-L6-v2 --onnx-dir rag/models/all-MiniLM-L6-v2-onnx-int8
+"""
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+WORKER = r"""
+import json, pathlib, statistics, sys, time
+sys.path.insert(0, {api_dir!r})
+backend, model, onnx_dir, prompts_path, out_path = sys.argv[1:6]
+
+def rss_mib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+started = time.perf_counter()
+if backend == "torch":
+    from sentence_transformers import SentenceTransformer
+else:
+    from services.onnx_embedder import OnnxEmbedder
+import_s = time.perf_counter() - started
+
+started = time.perf_counter()
+embedder = SentenceTransformer(model, device="cpu") if backend == "torch" else OnnxEmbedder(onnx_dir)
+load_s = time.perf_counter() - started
+
+prompts = [json.loads(line)["message"] for line in open(prompts_path, encoding="utf-8") if line.strip()]
+for p in prompts[:5]:
+    embedder.encode(p)
+latencies, vectors = [], []
+for p in prompts:
+    t = time.perf_counter()
+    vectors.append(embedder.encode(p).tolist())
+    latencies.append((time.perf_counter() - t) * 1000)
+chunks = [(" ".join(prompts) * 10)[i:i + 1000] for i in range(0, 64000, 1000)]
+t = time.perf_counter()
+embedder.encode(chunks, batch_size=32)
+batch_rate = len(chunks) / (time.perf_counter() - t)
+
+latencies.sort()
+json.dump({{
+    "import_s": import_s, "load_s": load_s, "rss_mib": rss_mib(),
+    "p50_ms": statistics.median(latencies), "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    "batch_rate": batch_rate, "vectors": vectors,
+}}, open(out_path, "w"))
+"""
+
+
+def run_backend(backend: str, model: str, onnx_dir: str, tmp: str) -> dict:
+    out_path = pathlib.Path(tmp) / f"{backend}.json"
+    script = WORKER.format(api_dir=str(REPO_ROOT / "apps" / "api"))
+    subprocess.run(
+        [sys.executable, "-c", script, backend, model, onnx_dir, str(REPO_ROOT / "eval" / "prompts.jsonl"), str(out_path)],
+        check=True,
+    )
+    with open(out_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark torch vs int8 ONNX embedding backends.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="SentenceTransformer name or local path")
+    parser.add_argument("--onnx-dir", default=None, help="Export directory (default: rag/models/<model>-onnx-int8)")
+    args = parser.parse_args()
+    onnx_dir = args.onnx_dir or str(REPO_ROOT / "rag" / "models" / f"{pathlib.Path(args.model).name}-onnx-int8")
+
+    import numpy as np
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {b: run_backend(b, args.model, onnx_dir, tmp) for b in ("torch", "onnx")}
+
+    print(f"{'backend':<8} {'import s':>9} {'load s':>8} {'RSS MiB':>8} {'p50 ms':>8} {'p95 ms':>8} {'chunks/s':>9}")
+    for backend, r in results.items():
+        print(f"{backend:<8} {r['import_s']:9.2f} {r['load_s']:8.2f} {r['rss_mib']:8.0f} "
+              f"{r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['batch_rate']:9.1f}")
+    a, b = (np.asarray(results[k]["vectors"], dtype=np.float32) for k in ("torch", "onnx"))
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    cosine = (a * b).sum(axis=1)
+    print(f"Query embedding cosine torch vs onnx: min {cosine.min():.5f}  mean {cosine.mean():.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark: rule keyword matching for intent + safety + triage.
+
+  legacy: per-pattern loops as the services used to do them (text.lower() per
+          check, one re.search per pattern, `in` per keyword)
+  shared: one keyword_matcher.scan() per message (services/keyword_matcher.py)
+
+Both are run over eval/prompts.jsonl and must agree on every category.
+
+Usage (from repo root):
+    python scripts/bench_keyword_matching.py --repeat 200
+"""
+import argparse
+import json
+import pathlib
+import re
+import sys
+import time
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+from services.intent_service import intent_service  # noqa: E402
+from services.keyword_matcher import keyword_matcher  # noqa: E402
+from services.safety_service import safety_service  # noqa: E402
+from services.triage_service import RULE_CUES, triage_service  # noqa: E402
+
+PROMPTS_PATH = REPO_ROOT / "eval" / "prompts.jsonl"
+
+
+def load_prompts():
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line)["message"] for line in f if line.strip()]
+
+
+def _matches_any(text, patterns, strip=False):
+    text_lower = text.lower().strip() if strip else text.lower()
+    for pattern in patterns:
+        if re.search(pattern, text_lower):
+            return True
+    return False
+
+
+def legacy_scan(text: str) -> set:
+    """Category hits computed the way the three services did before the shared matcher."""
+    hits = set()
+    if any(k in text.lower() for k in intent_service.symptom_keywords):
+        hits.add("intent.symptom")
+    for name in ("logistics", "meta", "chitchat"):
+        if _matches_any(text, getattr(intent_service, f"{name}_patterns"), strip=True):
+            hits.add(f"intent.{name}")
+    for name in ("emergency", "urgent", "refusal", "unlock", "non_compliance"):
+        if _matches_any(text, getattr(safety_service, f"{name}_patterns")):
+            hits.add(f"safety.{name}")
+    text_lower = text.lower()
+    for key, patterns in triage_service.symptoms_map.items():
+        if any(p in text_lower for p in patterns):
+            hits.add(f"triage.symptom.{key}")
+    for level, words in triage_service.severity_map.items():
+        if any(w in text_lower for w in words):
+            hits.add(f"triage.severity.{level}")
+    for cue in RULE_CUES:
+        if cue in text.lower():
+            hits.add(f"triage.cue.{cue}")
+    if re.search(r"(\d{2}[.,]?\d?)", text):
+        hits.add("triage.temperature")
+    if re.search(r"(\d+)\s*(day|week|month)", text_lower):
+        hits.add("triage.duration")
+    return hits
+
+
+def run(fn, prompts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message in prompts:
+            fn(message)
+    elapsed = time.perf_counter() - started
+    return elapsed, repeat * len(prompts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark shared keyword matching vs per-pattern loops.")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over eval/prompts.jsonl")
+    args = parser.parse_args()
+
+    prompts = load_prompts()
+    mismatches = [m for m in prompts if legacy_scan(m) != set(keyword_matcher.scan(m))]
+    print(f"Prompts: {len(prompts)}  |  category mismatches: {len(mismatches)}")
+    for m in mismatches[:5]:
+        print(f"  MISMATCH: {m!r}")
+
+    run(keyword_matcher.scan, prompts, 1)  # compile + warm re cache
+    legacy_s, legacy_rate = run(legacy_scan, prompts, args.repeat)
+    shared_s, shared_rate = run(keyword_matcher.scan, prompts, args.repeat)
+    per_msg = lambda s: s / (args.repeat * len(prompts)) * 1e6  # noqa: E731
+    print(f"legacy loops   {legacy_rate:10,.0f} msg/s  {per_msg(legacy_s):7.1f} us/msg")
+    print(f"shared scan    {shared_rate:10,.0f} msg/s  {per_msg(shared_s):7.1f} us/msg")
+    print(f"Speedup: {shared_rate / legacy_rate:.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark: RAG index cold start, Chroma vs the memory-mapped export
+(services/mapped_index.py, written by scripts/ingest_rag.py).
+
+  chroma:  PersistentClient + NumpyVectorStore.from_chroma (the NumPy backend without the export)
+  mapped:  MappedIndex + NumpyVectorStore.from_mapped (no sqlite, vectors in the page cache)
+
+Builds synthetic corpora of N chunks (scripts/bench_vector_store.py), exports
+mapped_index.bin, then loads each in a fresh subprocess and reports:
+  open      seconds until the store is ready
+  first q   ms for the first search (pages in the mapped vectors)
+  anon MiB  private memory the load added (RssAnon): per process, per uvicorn worker
+  file MiB  file-backed memory (RssFile): shared between processes via the page cache
+
+Usage (from repo root):
+    python scripts/bench_mapped_index.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+import chromadb  # noqa: E402
+import numpy as np  # noqa: E402
+
+from bench_vector_store import ADD_BATCH, DIM, TOPICS, make_corpus, unit  # noqa: E402
+from services.mapped_index import MAPPED_INDEX_FILE, MappedIndexWriter  # noqa: E402
+
+WORKER = r"""
+import json, sys, time
+sys.path.insert(0, {api_dir!r})
+import numpy as np
+mode, index_dir, query_path = sys.argv[1:4]
+
+def rss():
+    fields = {{}}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+if mode == "chroma":
+    import chromadb
+from services.mapped_index import MappedIndex
+from services.rag_service import NumpyVectorStore
+before = rss()
+started = time.perf_counter()
+if mode == "chroma":
+    store = NumpyVectorStore.from_chroma(chromadb.PersistentClient(path=index_dir).get_collection(name="medical_docs"))
+else:
+    store = NumpyVectorStore.from_mapped(MappedIndex(index_dir + "/mapped_index.bin"))
+open_s = time.perf_counter() - started
+query = np.load(query_path)
+started = time.perf_counter()
+ids = [r["id"] for r in store.search(query, 8, ["fever"])]
+first_ms = (time.perf_counter() - started) * 1000
+after = rss()
+print(json.dumps({{"open_s": open_s, "first_ms": first_ms, "ids": ids,
+                  "anon": after["RssAnon"] - before["RssAnon"], "file": after["RssFile"] - before["RssFile"]}}))
+"""
+
+
+def load(mode: str, index_dir: str, query_path: str) -> dict:
+    script = WORKER.format(api_dir=str(REPO_ROOT / "apps" / "api"))
+    out = subprocess.run([sys.executable, "-c", script, mode, index_dir, query_path],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench(n: int, tmp: str):
+    rng = np.random.default_rng(n)
+    centers, ids, documents, metadatas, embeddings = make_corpus(n, rng)
+    index_dir = str(pathlib.Path(tmp) / f"chroma_{n}")
+    client = chromadb.PersistentClient(path=index_dir)
+    collection = client.create_collection(name="medical_docs")
+    for i in range(0, n, ADD_BATCH):
+        collection.add(ids=ids[i:i + ADD_BATCH], documents=documents[i:i + ADD_BATCH],
+                       metadatas=metadatas[i:i + ADD_BATCH], embeddings=embeddings[i:i + ADD_BATCH])
+    writer = MappedIndexWriter(pathlib.Path(index_dir) / MAPPED_INDEX_FILE)
+    for offset in range(0, n, ADD_BATCH):
+        page = collection.get(include=["documents", "metadatas", "embeddings"], limit=ADD_BATCH, offset=offset)
+        writer.add(page["ids"], page["documents"], page["metadatas"], page["embeddings"])
+    size = writer.close().stat().st_size
+    client.close()
+
+    query_path = str(pathlib.Path(tmp) / "query.npy")
+    np.save(query_path, unit(centers[rng.integers(0, TOPICS)] + 0.05 * rng.standard_normal(DIM)))
+    chroma, mapped = load("chroma", index_dir, query_path), load("mapped", index_dir, query_path)
+    for mode, r in (("chroma", chroma), ("mapped", mapped)):
+        print(f"{n:>8,}  {mode:<7} {r['open_s']:8.3f}  {r['first_ms']:8.2f}  {r['anon']:8.1f}  {r['file']:8.1f}")
+    print(f"{'':>8}  file {size / 2**20:.1f} MiB  |  open {chroma['open_s'] / mapped['open_s']:.0f}x faster  |  "
+          f"same results: {chroma['ids'] == mapped['ids']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark index cold start: Chroma vs mapped export.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8}  {'store':<7} {'open s':>8}  {'first ms':>8}  {'anon MiB':>8}  {'file MiB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            bench(n, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: RAG query embedding, always encoding vs services/query_embedding_cache.py.
+
+Replays the expanded queries RAGService would embed for eval/prompts.jsonl
+(triage symptom tags + RAGService.expand_query) with a Zipf-like popularity skew,
+through RAGService.embed_query with the cache off and on.
+
+By default the real MiniLM model is loaded (needs it downloaded). Without it, pass
+--stub-encode-ms to emulate the encode with a blocking sleep.
+
+Usage (from repo root):
+    python scripts/bench_query_embedding_cache.py --queries 2000
+    python scripts/bench_query_embedding_cache.py --queries 2000 --stub-encode-ms 8
+"""
+import argparse
+import json
+import pathlib
+import random
+import sys
+import time
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+import numpy as np  # noqa: E402
+
+from services.query_embedding_cache import query_embedding_cache  # noqa: E402
+from services.rag_service import EMBEDDING_MODEL, RAGService  # noqa: E402
+from services.triage_service import triage_service  # noqa: E402
+
+PROMPTS_PATH = REPO_ROOT / "eval" / "prompts.jsonl"
+
+
+class StubEmbedder:
+    def __init__(self, encode_ms: float):
+        self.encode_ms = encode_ms
+
+    def encode(self, text):
+        time.sleep(self.encode_ms / 1000.0)
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        return rng.standard_normal(384).astype(np.float32)
+
+
+def expanded_queries(n: int, seed: int = 0):
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        prompts = [json.loads(line)["message"] for line in f if line.strip()]
+    pool = [RAGService.expand_query(p, triage_service.triage(p)["symptom_tags"]) for p in prompts]
+    weights = [1 / (rank + 1) for rank in range(len(pool))]  # Zipf s=1
+    return random.Random(seed).choices(pool, weights, k=n)
+
+
+def run(rag, queries):
+    started = time.perf_counter()
+    for query in queries:
+        rag.embed_query(query)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG query embedding cache.")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--stub-encode-ms", type=float, default=None, help="Emulate encode instead of loading MiniLM")
+    args = parser.parse_args()
+
+    rag = RAGService()
+    if args.stub_encode_ms is not None:
+        rag.embedder = StubEmbedder(args.stub_encode_ms)
+        print(f"Embedder: stub ({args.stub_encode_ms} ms/encode)")
+    else:
+        from sentence_transformers import SentenceTransformer
+        rag.embedder = SentenceTransformer(EMBEDDING_MODEL)
+        rag.embedder.encode("warm up")
+        print(f"Embedder: {EMBEDDING_MODEL}")
+
+    queries = expanded_queries(args.queries)
+    query_embedding_cache.enabled = False
+    uncached_ms = run(rag, queries)
+    query_embedding_cache.enabled = True
+    query_embedding_cache.clear()
+    cached_ms = run(rag, queries)
+
+    stats = query_embedding_cache.stats()
+    print(f"Queries: {len(queries)}  |  distinct: {len(set(queries))}")
+    print(f"encode every query  {uncached_ms:7.3f} ms/query")
+    print(f"embedding cache     {cached_ms:7.3f} ms/query   ({uncached_ms / cached_ms:.1f}x)")
+    print(f"hit rate {stats['hit_rate']:.1%}  |  entries {stats['entries']}  |  "
+          f"{stats['vector_bytes'] / 1024:.0f} KiB of vectors")
+
+
+if __name__ == "__main__":
+    main()
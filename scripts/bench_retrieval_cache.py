@@ -0,0 +1,105 @@
+"""
+Benchmark: RAGService.retrieve with and without the retrieval result cache
+(services/retrieval_cache.py).
+
+Replays Zipf-weighted eval/prompts.jsonl messages with their triage symptom tags
+against a copy of the published index (the original is not touched). The query
+embedding cache is disabled so a miss pays the full embed + Chroma query +
+rescoring. By default the real MiniLM model is loaded; without it, pass
+--stub-encode-ms to emulate the encode with a blocking sleep.
+
+Usage (from repo root):
+    python scripts/bench_retrieval_cache.py --queries 1000
+    python scripts/bench_retrieval_cache.py --queries 1000 --stub-encode-ms 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import pathlib
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+import chromadb  # noqa: E402
+import numpy as np  # noqa: E402
+
+from services.query_embedding_cache import query_embedding_cache  # noqa: E402
+from services.rag_service import EMBEDDING_MODEL, INDEX_PATH, ChromaVectorStore, IndexSnapshot, RAGService  # noqa: E402
+from services.retrieval_cache import retrieval_cache  # noqa: E402
+from services.triage_service import triage_service  # noqa: E402
+
+PROMPTS_PATH = REPO_ROOT / "eval" / "prompts.jsonl"
+
+
+class StubEmbedder:
+    def __init__(self, encode_ms: float):
+        self.encode_ms = encode_ms
+
+    def encode(self, text):
+        time.sleep(self.encode_ms / 1000.0)
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        v = rng.standard_normal(384).astype(np.float32)
+        return v / np.linalg.norm(v)
+
+
+def workload(n: int, seed: int = 0):
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        prompts = [json.loads(line)["message"] for line in f if line.strip()]
+    pool = [(p, triage_service.triage(p)["symptom_tags"]) for p in prompts]
+    weights = [1 / (rank + 1) for rank in range(len(pool))]  # Zipf s=1
+    return random.Random(seed).choices(pool, weights, k=n)
+
+
+def run(rag, queries):
+    started = time.perf_counter()
+    for message, tags in queries:
+        rag.retrieve(message, symptom_tags=tags)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG retrieval result cache.")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--stub-encode-ms", type=float, default=None, help="Emulate encode instead of loading MiniLM")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = str(pathlib.Path(tmp) / "chroma")
+        shutil.copytree(INDEX_PATH, index_path)
+        rag = RAGService()
+        client = chromadb.PersistentClient(path=index_path)
+        collection = client.get_collection(name="medical_docs")
+        rag.swap_index(IndexSnapshot(index_path, client, collection, ChromaVectorStore(collection)))
+        if args.stub_encode_ms is not None:
+            rag.embedder = StubEmbedder(args.stub_encode_ms)
+            print(f"Embedder: stub ({args.stub_encode_ms} ms/encode)")
+        else:
+            from sentence_transformers import SentenceTransformer
+            rag.embedder = SentenceTransformer(EMBEDDING_MODEL)
+            print(f"Embedder: {EMBEDDING_MODEL}")
+        rag.initialized = True
+        query_embedding_cache.enabled = False
+
+        queries = workload(args.queries)
+        with contextlib.redirect_stdout(io.StringIO()):  # per-query "[RAG] Expanded Query" logging
+            retrieval_cache.enabled = False
+            uncached_ms = run(rag, queries)
+            retrieval_cache.enabled = True
+            cached_ms = run(rag, queries)
+
+    stats = retrieval_cache.stats()
+    print(f"Queries: {len(queries)}  |  index version: {stats['index_version']}")
+    print(f"no result cache   {uncached_ms:7.3f} ms/retrieval")
+    print(f"result cache      {cached_ms:7.3f} ms/retrieval   ({uncached_ms / cached_ms:.1f}x)")
+    print(f"hit rate {stats['hit_rate']:.1%}  |  entries {stats['entries']}  |  ~{stats['approx_bytes'] / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
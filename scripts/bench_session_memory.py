@@ -0,0 +1,122 @@
+"""
+Benchmark: memory held by chat session history, dict entries vs compact records.
+
+Builds N sessions of RAG conversations the way the chat pipeline does and
+measures the traced allocations (tracemalloc) of:
+  - before: {"role", "content", "meta": response_model.dict(), "timestamp"} per turn
+  - after:  UserTurn / AssistantTurn records (services/session_history.py)
+
+Citations are synthetic 1000-char chunks (scripts/ingest_rag.py CHUNK_SIZE). Each
+retrieval returns fresh strings, as Chroma does, so "before" pays for the copies.
+
+Usage (from repo root):
+    python scripts/bench_session_memory.py --sessions 10000 --turns 3
+"""
+import argparse
+import datetime
+import json
+import pathlib
+import random
+import sys
+import tracemalloc
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+import models  # noqa: E402
+from services.logistics_service import logistics_service  # noqa: E402
+from services.session_history import AssistantTurn, UserTurn  # noqa: E402
+from services.triage_service import triage_service  # noqa: E402
+
+PROMPTS_PATH = REPO_ROOT / "eval" / "prompts.jsonl"
+CHUNK_SIZE = 1000
+
+
+def load_prompts():
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line)["message"] for line in f if line.strip()]
+
+
+def make_chunks(n=200):
+    rng = random.Random(0)
+    words = "fever cough rest fluids paracetamol symptoms doctor hydration temperature adults children days".split()
+    chunks = []
+    for i in range(n):
+        text = " ".join(rng.choice(words) for _ in range(CHUNK_SIZE // 6))[:CHUNK_SIZE]
+        chunks.append((f"doc_{i // 10}.txt#chunk_{i % 10}", text))
+    return chunks
+
+
+def fresh(text: str) -> str:
+    """A new string object with the same value (what a new Chroma query returns)."""
+    return text.encode().decode()
+
+
+def make_response(message: str, chunks, rng) -> models.ChatResponse:
+    triage = triage_service.triage(message)
+    citations = []
+    for chunk_id, text in rng.sample(chunks, 5):
+        text = fresh(text)
+        citations.append({
+            "id": chunk_id, "title": "Fever in adults", "org": "NHS", "source_type": "guideline",
+            "date_accessed": "N/A", "source_url": "https://www.nhs.uk/", "snippet": text[:240] + "...",
+            "full_text": text,
+        })
+    answer = " ".join(rng.choice(["Rest", "and", "drink", "fluids.", "See", "a", "GP", "if", "worse."]) for _ in range(100))
+    return models.ChatResponse(
+        assistant_message=answer + "\n\nI’m not a doctor.", urgency=triage["urgency"], safety_flags=[],
+        citations=citations, recommendations=triage["follow_up_questions"], intent="medical_symptoms",
+        lock_state="none", red_flag_detected=False, triage_result=triage, response_kind="medical_advice",
+    )
+
+
+def build(sessions: int, turns: int, compact: bool, prompts, chunks):
+    rng = random.Random(1)
+    store = {}
+    for s in range(sessions):
+        history = []
+        for _ in range(turns):
+            message = fresh(rng.choice(prompts))
+            response = make_response(message, chunks, rng)
+            now = datetime.datetime.now()
+            if compact:
+                history.append(UserTurn(message, now))
+                history.append(AssistantTurn.from_response(response, now, logistics_service.resource_id))
+            else:
+                history.append({"role": "user", "content": message, "timestamp": now.isoformat()})
+                history.append({"role": "assistant", "content": response.assistant_message,
+                                "meta": response.dict(), "timestamp": now.isoformat()})
+            del response
+        store[f"session-{s}"] = {"lock_state": "none", "last_triage": "self_care", "urgent_pending": False,
+                                 "history": history}
+    return store
+
+
+def measure(label, sessions, turns, compact, prompts, chunks):
+    tracemalloc.start()
+    store = build(sessions, turns, compact, prompts, chunks)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_session = current / sessions
+    print(f"{label:<24} {current / 1024 / 1024:9.1f} MiB   {per_session / 1024:7.1f} KiB/session")
+    del store
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session history memory usage.")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=3, help="User/assistant exchanges per session")
+    args = parser.parse_args()
+
+    prompts = load_prompts()
+    chunks = make_chunks()
+    print(f"Sessions: {args.sessions}  |  exchanges/session: {args.turns}  |  5 citations per answer")
+    before = measure("dict entries (before)", args.sessions, args.turns, False, prompts, chunks)
+    after = measure("compact records (after)", args.sessions, args.turns, True, prompts, chunks)
+    print(f"Reduction: {before / after:.1f}x ({(1 - after / before) * 100:.1f}% less)")
+
+
+if __name__ == "__main__":
+    main()
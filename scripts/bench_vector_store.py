@@ -0,0 +1,103 @@
+"""
+Benchmark: RAG vector store backends (services/rag_service.py).
+
+  chroma: ChromaVectorStore - Chroma query (sqlite + HNSW) + per-candidate Python rescoring
+  numpy:  NumpyVectorStore  - exact squared-L2 over one float32 matrix + vectorized rescoring
+
+Builds synthetic corpora of N chunks (clustered unit vectors, 384 dims, manifest-like
+org / tags metadata) in a temporary Chroma index, loads the NumPy store from it
+and times store.search() for the same queries. "agree" is the share of queries
+where both backends return the same ranked chunk IDs (HNSW is approximate).
+
+Usage (from repo root):
+    python scripts/bench_vector_store.py --sizes 1000 10000 100000 --queries 200
+"""
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+import chromadb  # noqa: E402
+import numpy as np  # noqa: E402
+
+from services.rag_service import ChromaVectorStore, NumpyVectorStore  # noqa: E402
+
+DIM = 384
+TOPICS = 64
+ORGS = ["NHS", "WHO", "CDC", "NICE", "Mayo Clinic", "Unknown"]
+TAGS = ["fever", "cough", "headache", "pain", "breathing", "rash", "flu", "adult", "child", "respiratory"]
+ADD_BATCH = 5000
+
+
+def unit(rows: np.ndarray) -> np.ndarray:
+    return (rows / np.linalg.norm(rows, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def make_corpus(n: int, rng):
+    centers = unit(rng.standard_normal((TOPICS, DIM)))
+    topic = rng.integers(0, TOPICS, n)
+    embeddings = unit(centers[topic] + 0.06 * rng.standard_normal((n, DIM)))
+    ids = [f"doc_{i // 10}.txt#chunk_{i % 10}" for i in range(n)]
+    documents = [f"Synthetic guideline text {i} " * 20 for i in range(n)]
+    metadatas = [
+        {"title": f"Doc {i // 10}", "org": ORGS[i % len(ORGS)], "doc_type": "guideline",
+         "tags": ",".join(rng.choice(TAGS, 3, replace=False))}
+        for i in range(n)
+    ]
+    return centers, ids, documents, metadatas, embeddings
+
+
+def time_search(store, queries, tags):
+    results = []
+    started = time.perf_counter()
+    for q, t in zip(queries, tags):
+        results.append([r["id"] for r in store.search(q, 8, t)])
+    return (time.perf_counter() - started) / len(queries) * 1000, results
+
+
+def bench(n: int, n_queries: int, tmp: str):
+    rng = np.random.default_rng(n)
+    centers, ids, documents, metadatas, embeddings = make_corpus(n, rng)
+    client = chromadb.PersistentClient(path=str(pathlib.Path(tmp) / f"chroma_{n}"))
+    collection = client.create_collection(name="medical_docs")
+    started = time.perf_counter()
+    for i in range(0, n, ADD_BATCH):
+        collection.add(ids=ids[i:i + ADD_BATCH], documents=documents[i:i + ADD_BATCH],
+                       metadatas=metadatas[i:i + ADD_BATCH], embeddings=embeddings[i:i + ADD_BATCH])
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    numpy_store = NumpyVectorStore.from_chroma(collection)
+    load_s = time.perf_counter() - started
+    chroma_store = ChromaVectorStore(collection)
+
+    queries = unit(centers[rng.integers(0, TOPICS, n_queries)] + 0.05 * rng.standard_normal((n_queries, DIM)))
+    tags = [list(rng.choice(TAGS, 2, replace=False)) for _ in range(n_queries)]
+    time_search(chroma_store, queries[:5], tags[:5])  # warm HNSW / sqlite pages
+    chroma_ms, chroma_ids = time_search(chroma_store, queries, tags)
+    numpy_ms, numpy_ids = time_search(numpy_store, queries, tags)
+    agree = sum(a == b for a, b in zip(chroma_ids, numpy_ids)) / n_queries
+    print(f"{n:>8,}  {chroma_ms:9.3f}  {numpy_ms:9.3f}  {chroma_ms / numpy_ms:7.1f}x  {agree:6.1%}  "
+          f"{build_s:8.1f}s  {load_s:7.2f}s  {numpy_store.embeddings.nbytes / 2**20:7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs NumPy exact search.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8}  {'chroma ms':>9}  {'numpy ms':>9}  {'speedup':>8}  {'agree':>6}  "
+          f"{'build':>9}  {'load':>8}  {'MiB':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            bench(n, args.queries, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+On-disk, content-addressed embedding cache for scripts/ingest_rag.py.
+
+Chunk texts mostly survive a rebuild or a CHUNK_SIZE / CHUNK_OVERLAP change, so
+ingestion looks every chunk up here before sending it to the model. Each
+embedding model gets its own directory under data/cache/ingest_embeddings/:
+
+  vectors.f32   append-only float32 rows (dim from meta.json)
+  keys.bin      append-only 16-byte keys, row i of keys.bin <-> row i of vectors.f32
+  meta.json     model ID, dimension, dtype
+
+A key is the first 16 bytes of sha256(model ID + NUL + chunk text). Rows are
+appended vectors-first, so a crash can only leave an unkeyed tail, which is
+truncated on the next open. Lookups read rows through a memmap.
+
+Usage (from repo root):
+    python scripts/embedding_cache.py stats
+    python scripts/embedding_cache.py prune                 # keep rows used by the published index
+    python scripts/embedding_cache.py prune --index path/to/chroma
+"""
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import re
+import shutil
+import sys
+
+import numpy as np
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+DEFAULT_CACHE_DIR = REPO_ROOT / "data" / "cache" / "ingest_embeddings"
+INDEX_ROOT = REPO_ROOT / "rag" / "index"
+KEY_BYTES = 16
+DTYPE = np.float32
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.bin"
+META_FILE = "meta.json"
+READ_PAGE = 5000  # chunks per Chroma get() when collecting referenced texts
+
+
+def model_dir_name(model_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_id).strip("_") or "model"
+
+
+class EmbeddingCache:
+    """Append-only store of chunk embeddings for one model."""
+
+    def __init__(self, model_id: str, root=None):
+        self.model_id = model_id
+        self.path = pathlib.Path(root or os.getenv("EMBEDDING_CACHE_DIR") or DEFAULT_CACHE_DIR) / model_dir_name(model_id)
+        self.dim = None
+        self._rows = {}  # key -> row
+        self._vectors = None  # memmap over the first _mapped rows
+        self._mapped = 0
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+        self._open()
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+    def _open(self):
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model_id or meta.get("dtype") != np.dtype(DTYPE).name:
+            print(f"[EmbeddingCache] Ignoring {self.path}: written for {meta.get('model')}")
+            return
+        self.dim = int(meta["dim"])
+        row_bytes = self.dim * np.dtype(DTYPE).itemsize
+        keys_path, vectors_path = self.path / KEYS_FILE, self.path / VECTORS_FILE
+        keys_size = keys_path.stat().st_size if keys_path.exists() else 0
+        vectors_size = vectors_path.stat().st_size if vectors_path.exists() else 0
+        rows = min(keys_size // KEY_BYTES, vectors_size // row_bytes)
+        if keys_size != rows * KEY_BYTES or vectors_size != rows * row_bytes:
+            # Interrupted append: drop the partial tail
+            print(f"[EmbeddingCache] Truncating {self.path} to {rows} complete rows")
+            for path, size in ((keys_path, rows * KEY_BYTES), (vectors_path, rows * row_bytes)):
+                if path.exists():
+                    with open(path, "r+b") as f:
+                        f.truncate(size)
+        if rows:
+            keys = keys_path.read_bytes()
+            self._rows = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(rows)}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _map(self):
+        # Re-mapped when a lookup reaches rows appended since the last mapping
+        self._mapped = len(self._rows)
+        self._vectors = np.memmap(self.path / VECTORS_FILE, dtype=DTYPE, mode="r", shape=(self._mapped, self.dim))
+
+    def _vector(self, row: int) -> np.ndarray:
+        if row >= self._mapped:
+            self._map()
+        return np.array(self._vectors[row])
+
+    def get(self, text: str):
+        """The cached vector for `text`, or None."""
+        row = self._rows.get(self.key(text))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._vector(row)
+
+    def add(self, texts, vectors):
+        """Appends vectors for texts not cached yet."""
+        vectors = np.asarray(vectors, dtype=DTYPE)
+        if not len(texts):
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / META_FILE, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_id, "dim": self.dim, "dtype": np.dtype(DTYPE).name}, f, indent=2)
+        new_keys, new_rows, seen = [], [], set()
+        for text, vector in zip(texts, vectors):
+            key = self.key(text)
+            if key not in self._rows and key not in seen:
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(vector)
+        if not new_keys:
+            return
+        with open(self.path / VECTORS_FILE, "ab") as f:
+            f.write(np.ascontiguousarray(new_rows, dtype=DTYPE).tobytes())
+        with open(self.path / KEYS_FILE, "ab") as f:
+            f.write(b"".join(new_keys))
+        for key in new_keys:
+            self._rows[key] = len(self._rows)
+        self.added += len(new_keys)
+
+    def prune(self, keep_texts) -> int:
+        """Rewrites the store with only the rows for `keep_texts`. Returns rows removed."""
+        keep = sorted({self._rows[k] for k in map(self.key, keep_texts) if k in self._rows})
+        removed = len(self._rows) - len(keep)
+        if not removed:
+            return 0
+        by_row = {row: key for key, row in self._rows.items()}
+        self._map()
+        tmp_dir = self.path.with_name(self.path.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        shutil.copy(self.path / META_FILE, tmp_dir / META_FILE)
+        np.ascontiguousarray(self._vectors[keep], dtype=DTYPE).tofile(tmp_dir / VECTORS_FILE)
+        (tmp_dir / KEYS_FILE).write_bytes(b"".join(by_row[row] for row in keep))
+        self._vectors, self._mapped = None, 0
+        old_dir = self.path.with_name(self.path.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(self.path, old_dir)
+        os.replace(tmp_dir, self.path)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self._rows = {by_row[row]: i for i, row in enumerate(keep)}
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_id,
+            "entries": len(self._rows),
+            "bytes": dir_bytes(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "added": self.added,
+        }
+
+
+def dir_bytes(path: pathlib.Path) -> int:
+    return sum(p.stat().st_size for p in path.glob("*") if p.is_file()) if path.exists() else 0
+
+
+def referenced_texts(index_dir):
+    """(model ID, chunk texts) of the Chroma index built by scripts/ingest_rag.py."""
+    import chromadb
+
+    with open(pathlib.Path(index_dir) / "index_version.json", "r", encoding="utf-8") as f:
+        model_id = json.load(f)["embedding_model"]
+    collection = chromadb.PersistentClient(path=str(index_dir)).get_collection(name="medical_docs")
+    texts = []
+    for offset in range(0, collection.count(), READ_PAGE):
+        texts += collection.get(include=["documents"], limit=READ_PAGE, offset=offset)["documents"]
+    return model_id, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the ingestion embedding cache.")
+    parser.add_argument("command", choices=["stats", "prune"])
+    parser.add_argument("--cache-dir", default=None, help="Cache root (default: data/cache/ingest_embeddings)")
+    parser.add_argument("--index", default=None, help="Index whose chunks are kept by prune (default: published)")
+    args = parser.parse_args()
+    root = pathlib.Path(args.cache_dir or os.getenv("EMBEDDING_CACHE_DIR") or DEFAULT_CACHE_DIR)
+
+    if args.command == "stats":
+        total = 0
+        for meta_path in sorted(root.glob(f"*/{META_FILE}")):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            size = dir_bytes(meta_path.parent)
+            total += size
+            rows = (meta_path.parent / KEYS_FILE).stat().st_size // KEY_BYTES if (meta_path.parent / KEYS_FILE).exists() else 0
+            print(f"{meta['model']:<40} dim {meta['dim']:>5}  {rows:>9,} entries  {size / 2**20:9.1f} MiB")
+        print(f"Total: {total / 2**20:.1f} MiB in {root}")
+        return
+
+    if args.index is None:
+        sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+        from services.index_pointer import current_index_dir
+        args.index = current_index_dir(str(INDEX_ROOT))
+    model_id, texts = referenced_texts(args.index)
+    cache = EmbeddingCache(model_id, root)
+    before = dir_bytes(cache.path)
+    removed = cache.prune(texts)
+    print(f"{model_id}: kept {len(cache):,} entries referenced by {args.index}, removed {removed:,} "
+          f"({before / 2**20:.1f} -> {dir_bytes(cache.path) / 2**20:.1f} MiB)")
+    others = [p.parent.name for p in root.glob(f"*/{META_FILE}") if p.parent != cache.path]
+    if others:
+        print(f"Other models' caches (delete the directory to drop them): {', '.join(sorted(others))}")
+
+
+if __name__ == "__main__":
+    main()
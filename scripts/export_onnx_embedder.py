@@ -0,0 +1,165 @@
+"""
+Export the RAG embedding model to int8 ONNX for EMBEDDING_BACKEND=onnx
+(apps/api/services/onnx_embedder.py).
+
+  1. loads the SentenceTransformer (transformer + mean pooling + normalize)
+  2. exports the transformer to ONNX (dynamic batch / sequence axes)
+  3. quantizes the weights to int8 (onnxruntime dynamic quantization)
+  4. saves the fast tokenizer and embedder.json next to it
+  5. verifies: every eval prompt and corpus chunk embedded by both models must
+     have cosine >= --tolerance, otherwise the export is rejected (exit 1)
+
+Export needs torch, sentence-transformers and onnx; the API only needs
+onnxruntime + tokenizers at runtime.
+
+Usage (from repo root):
+    python scripts/export_onnx_embedder.py
+    python scripts/export_onnx_embedder.py --model all-MiniLM-L6-v2 --tolerance 0.99
+"""
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import sys
+
+FILE_DIR = pathlib.Path(__file__).parent.resolve()
+REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+import numpy as np  # noqa: E402
+
+from services.onnx_embedder import CONFIG_FILE, OnnxEmbedder, default_model_dir  # noqa: E402
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+PROMPTS_PATH = REPO_ROOT / "eval" / "prompts.jsonl"
+CORPUS_DIR = REPO_ROOT / "rag" / "corpus_raw" / "trusted_guidelines"
+CHUNK_SIZE = 1000  # scripts/ingest_rag.py
+
+
+def verification_texts():
+    texts = []
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        texts += [json.loads(line)["message"] for line in f if line.strip()]
+    for path in sorted(list(CORPUS_DIR.glob("*.txt")) + list(CORPUS_DIR.glob("*.md"))):
+        content = path.read_text(encoding="utf-8")
+        texts += [content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)]
+    return texts
+
+
+def check_pipeline(model):
+    """The ONNX runtime side re-implements mean pooling (+ normalize); refuse anything else."""
+    from sentence_transformers.models import Normalize, Pooling
+
+    modules = list(model)
+    pooling = [m for m in modules if isinstance(m, Pooling)]
+    config = pooling[0].get_config_dict() if len(pooling) == 1 else {}
+    # "pooling_mode" in current sentence-transformers, pooling_mode_*_tokens flags in older ones
+    mode = config.get("pooling_mode") or ("mean" if config.get("pooling_mode_mean_tokens") else None)
+    if mode != "mean":
+        raise SystemExit(f"Unsupported pooling in {[type(m).__name__ for m in modules]}: only mean pooling is exported")
+    return any(isinstance(m, Normalize) for m in modules)
+
+
+def export(model, onnx_path: pathlib.Path, opset: int):
+    import torch
+
+    transformer = model[0].auto_model.eval()
+    tokenizer = model[0].tokenizer
+    sample = tokenizer(["export sample", "a longer export sample sentence"], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+    axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer), tuple(sample[n] for n in input_names), str(onnx_path),
+            input_names=input_names, output_names=["token_embeddings"], dynamic_axes=axes,
+            opset_version=opset, dynamo=False,
+        )
+    return tokenizer
+
+
+def quantize(fp32_path: pathlib.Path, int8_path: pathlib.Path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+
+def verify(model, out_dir: pathlib.Path, tolerance: float) -> bool:
+    texts = verification_texts()
+    reference = model.encode(texts, batch_size=32, normalize_embeddings=True)
+    onnx = OnnxEmbedder(str(out_dir)).encode(texts, batch_size=32)
+    onnx = onnx / np.linalg.norm(onnx, axis=1, keepdims=True)
+    cosine = (reference * onnx).sum(axis=1)
+    worst = int(np.argmin(cosine))
+    print(f"Verification: {len(texts)} texts  |  cosine min {cosine.min():.5f}  mean {cosine.mean():.5f}")
+    if cosine[worst] < tolerance:
+        print(f"FAILED: cosine {cosine[worst]:.5f} < {tolerance} for {texts[worst][:80]!r}")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to int8 ONNX.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="SentenceTransformer name or local path")
+    parser.add_argument("--out", default=None, help="Output directory (default: rag/models/<model>-onnx-int8)")
+    parser.add_argument("--tolerance", type=float, default=0.99, help="Minimum cosine vs the torch embeddings")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--keep-fp32", action="store_true", help="Keep the unquantized model.fp32.onnx")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    name = pathlib.Path(args.model).name
+    out_dir = pathlib.Path(args.out or default_model_dir(name))
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    print(f"Loading {args.model}")
+    model = SentenceTransformer(args.model, device="cpu")
+    normalize = check_pipeline(model)
+
+    fp32_path = tmp_dir / "model.fp32.onnx"
+    print(f"Exporting to {fp32_path}")
+    tokenizer = export(model, fp32_path, args.opset)
+    print("Quantizing weights to int8")
+    quantize(fp32_path, tmp_dir / "model.onnx")
+    if not args.keep_fp32:
+        fp32_path.unlink()
+
+    tokenizer.backend_tokenizer.save(str(tmp_dir / "tokenizer.json"))
+    config = {
+        "model": name,
+        "onnx_file": "model.onnx",
+        "quantization": "int8-dynamic",
+        "pooling": "mean",
+        "normalize": normalize,
+        "max_seq_length": model.max_seq_length,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "pad_token_id": tokenizer.pad_token_id or 0,
+    }
+    with open(tmp_dir / CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    if not verify(model, tmp_dir, args.tolerance):
+        shutil.rmtree(tmp_dir)
+        return 1
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    size = (out_dir / "model.onnx").stat().st_size
+    print(f"Saved {out_dir} (model.onnx {size / 2**20:.1f} MiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,67 @@
 
 import os
-import glob
+import argparse
+import collections
+import hashlib
+import queue
 import shutil
 import pathlib
+import threading
 import time
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import chromadb
-from sentence_transformers import SentenceTransformer
 
 import json
 
+from embedding_cache import EmbeddingCache
+
 # Config - Robust Absolute Paths
 # scripts/ingest_rag.py -> scripts -> root
 FILE_DIR = pathlib.Path(__file__).parent.resolve()
 REPO_ROOT = FILE_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "apps" / "api"))
+
+from services.index_pointer import VERSIONED_PREFIX, current_index_dir, publish_index
+from services.mapped_index import MAPPED_INDEX_FILE, MappedIndexWriter
+
 # Phase 4: Use trusted guidelines
 CORPUS_DIR = REPO_ROOT / "rag" / "corpus_raw" / "trusted_guidelines"
-INDEX_DIR = REPO_ROOT / "rag" / "index" / "chroma"
+# Each build goes to INDEX_ROOT/chroma-<version>/ and is published via INDEX_ROOT/CURRENT
+INDEX_ROOT = REPO_ROOT / "rag" / "index"
+KEEP_INDEXES = 2  # published versions kept on disk (the API may still be draining the previous one)
 MANIFEST_PATH = CORPUS_DIR / "manifest.json"
 
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# "torch" (SentenceTransformer) or "onnx" (int8 export, see scripts/export_onnx_embedder.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "")
 # Phase 4: Larger chunks for better context
 CHUNK_SIZE = 1000 
 CHUNK_OVERLAP = 200
+# Written next to the Chroma files; RAGService keys its retrieval cache on it
+INDEX_VERSION_FILE = "index_version.json"
+# Per-file content / metadata / chunk hashes of the indexed corpus (--incremental)
+INGEST_STATE_FILE = "ingest_state.json"
+# Streaming pipeline: producer thread -> encode batches -> bounded upserts
+ENCODE_BATCH = 64     # chunks per embedder.encode() call
+UPSERT_BATCH = 1024   # chunks per collection.add()
+PREFETCH_BATCHES = 4  # chunked-but-not-encoded batches the producer may run ahead
+EXPORT_PAGE = 5000    # chunks per Chroma get() when writing mapped_index.bin
+
+def embedding_model_id():
+    return f"{EMBEDDING_MODEL}:onnx-int8" if EMBEDDING_BACKEND == "onnx" else EMBEDDING_MODEL
+
+def load_embedder(threads=0):
+    if EMBEDDING_BACKEND == "onnx":
+        from services.onnx_embedder import OnnxEmbedder, default_model_dir
+        return OnnxEmbedder(EMBEDDING_ONNX_DIR or default_model_dir(EMBEDDING_MODEL), threads=threads)
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
 
 def load_manifest():
     """Loads validation manifest if it exists."""
@@ -35,16 +75,157 @@ def load_manifest():
         print(f"Error loading manifest: {e}")
         return {}
 
-def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    chunks = []
+def iter_text_chunks(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     start = 0
     # Simple character-based chunking for now
     while start < len(text):
         end = min(start + size, len(text))
-        chunk = text[start:end]
-        chunks.append(chunk)
+        yield text[start:end]
         start += (size - overlap)
-    return chunks
+
+def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    return list(iter_text_chunks(text, size, overlap))
+
+def doc_metadata(filename, manifest):
+    # Get metadata from manifest or default
+    if filename in manifest:
+        meta = dict(manifest[filename])
+        # Flatten tags list to string for Chroma storage compatibility if needed
+        # But recent Chroma versions handle lists. Let's keep it safe and join tags.
+        if "tags" in meta and isinstance(meta["tags"], list):
+            meta["tags"] = ",".join(meta["tags"])
+    else:
+        print(f"Warning: {filename} not in manifest. Using defaults.")
+        meta = {
+            "title": filename,
+            "org": "Unknown",
+            "doc_type": "unknown",
+            "tags": ""
+        }
+
+    # Ensure ID and critical fields are present
+    meta["filename"] = filename
+    return meta
+
+def make_chunk_id(filename, index):
+    # STABLE ID: filename#chunk_index
+    return f"{filename}#chunk_{index}"
+
+def read_doc(file_path):
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        print(f"Skipping {file_path.name} due to read error: {e}")
+        return None
+
+def iter_corpus_chunks(docs, manifest):
+    """Yields (chunk_id, chunk, meta) file by file; only one file's text is held at a time."""
+    for file_path in docs:
+        filename = file_path.name
+        # Skip manifest itself if glob picked it up (though glob pattern shouldn't)
+        if filename == "manifest.json": continue
+
+        print(f"Processing {filename}...")
+        content = read_doc(file_path)
+        if content is None:
+            continue
+
+        meta = doc_metadata(filename, manifest)
+        for i, chunk in enumerate(iter_text_chunks(content)):
+            yield make_chunk_id(filename, i), chunk, meta
+
+def iter_batches(records, batch_size, prefetch=PREFETCH_BATCHES):
+    """
+    Runs the producer (file reading + chunking) on a thread, handing over lists of
+    batch_size records through a bounded queue so it overlaps with encoding
+    without ever running more than `prefetch` batches ahead.
+    """
+    handoff = queue.Queue(maxsize=prefetch)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        batch = []
+        try:
+            for record in records:
+                batch.append(record)
+                if len(batch) == batch_size:
+                    handoff.put(batch)
+                    batch = []
+                if stop.is_set():
+                    return
+            if batch:
+                handoff.put(batch)
+            handoff.put(done)
+        except BaseException as e:
+            handoff.put(e)
+
+    thread = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = handoff.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+# ── Encode pool (one embedder per process) ──────
+_worker_embedder = None
+
+def _init_encode_worker(threads, model, backend, onnx_dir):
+    # Spawned workers re-import this module: carry over the parent's model settings
+    global _worker_embedder, EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR = model, backend, onnx_dir
+    _worker_embedder = load_embedder(threads=threads)
+
+def _encode_in_worker(texts, batch_size):
+    return _worker_embedder.encode(texts, batch_size=batch_size)
+
+def lookup_cached(batches, cache):
+    """(batch, cached) pairs: cached[i] is the stored vector for batch[i]'s text, or None."""
+    for batch in batches:
+        yield batch, [cache.get(r[1]) if cache is not None else None for r in batch]
+
+def _merge_encoded(cached, encoded):
+    encoded = iter(encoded)
+    return [vector if vector is not None else next(encoded) for vector in cached]
+
+def encode_batches(batches, batch_size, workers=0):
+    """
+    Takes (batch, cached) pairs and yields (batch, vectors) in input order, sending
+    only the uncached chunks to the model (which is not even loaded if everything
+    is cached). workers > 1 spreads batches over that many processes (each with
+    its own model and a share of the cores), keeping at most 2 * workers batches
+    in flight.
+    """
+    if workers <= 1:
+        embedder = None
+        for batch, cached in batches:
+            texts = [r[1] for r, vector in zip(batch, cached) if vector is None]
+            if texts and embedder is None:
+                embedder = load_embedder()
+            yield batch, _merge_encoded(cached, embedder.encode(texts, batch_size=batch_size) if texts else [])
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    context = multiprocessing.get_context("spawn")  # torch is not fork-safe
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_encode_worker,
+                             initargs=(threads, EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR)) as pool:
+        in_flight = collections.deque()
+        for batch, cached in batches:
+            texts = [r[1] for r, vector in zip(batch, cached) if vector is None]
+            in_flight.append((batch, cached, pool.submit(_encode_in_worker, texts, batch_size) if texts else None))
+            if len(in_flight) >= 2 * workers:
+                done_batch, done_cached, future = in_flight.popleft()
+                yield done_batch, _merge_encoded(done_cached, future.result() if future else [])
+        while in_flight:
+            done_batch, done_cached, future = in_flight.popleft()
+            yield done_batch, _merge_encoded(done_cached, future.result() if future else [])
 
 def remove_readonly(func, path, excinfo):
     """Helper to remove read-only files on Windows."""
@@ -54,122 +235,369 @@ def remove_readonly(func, path, excinfo):
     except Exception as e:
         print(f"Error removing read-only file {path}: {e}")
 
-def safe_recreate_index(index_path):
-    """Safely removes and recreates the index directory."""
+class IndexFingerprint:
+    """
+    Fingerprints the index content (model + chunk IDs, texts, metadata) as it is
+    written, so the API can tell a rebuilt index from the one its cached
+    retrievals came from.
+    """
+
+    def __init__(self):
+        self.digest = hashlib.sha256(embedding_model_id().encode("utf-8"))
+        self.chunks = 0
+
+    def update(self, chunk_id, doc, meta):
+        record = json.dumps([chunk_id, doc, meta], sort_keys=True, ensure_ascii=False)
+        self.digest.update(record.encode("utf-8") + b"\n")
+        self.chunks += 1
+
+    def version(self):
+        return self.digest.hexdigest()[:16]
+
+def read_index_version(index_dir):
+    try:
+        with open(pathlib.Path(index_dir) / INDEX_VERSION_FILE, "r", encoding="utf-8") as f:
+            return json.load(f).get("version")
+    except Exception:
+        return None
+
+def write_index_version(index_dir, fingerprint):
+    version = {
+        "version": fingerprint.version(),
+        "embedding_model": embedding_model_id(),
+        "chunks": fingerprint.chunks,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    path = pathlib.Path(index_dir) / INDEX_VERSION_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(version, f, indent=2)
+    os.replace(tmp_path, path)
+    print(f"Index version: {version['version']}")
+
+# ── Incremental ingestion state ──────
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def metadata_hash(meta):
+    return content_hash(json.dumps(meta, sort_keys=True, ensure_ascii=False))
+
+def scan_corpus(docs, manifest):
+    """
+    Hashes every document (content, manifest metadata, each chunk) and fingerprints
+    the index a full build would produce - reading files only, no embedding.
+    """
+    files, fingerprint = {}, IndexFingerprint()
+    for file_path in docs:
+        filename = file_path.name
+        if filename == "manifest.json": continue
+        content = read_doc(file_path)
+        if content is None:
+            continue
+        meta = doc_metadata(filename, manifest)
+        chunks = chunk_text(content)
+        for i, chunk in enumerate(chunks):
+            fingerprint.update(make_chunk_id(filename, i), chunk, meta)
+        files[filename] = {
+            "sha256": content_hash(content),
+            "metadata": metadata_hash(meta),
+            "chunks": [content_hash(chunk) for chunk in chunks],
+        }
+    return files, fingerprint
+
+def state_settings():
+    # Anything that changes chunk IDs or vectors for unchanged text forces a full rebuild
+    return {"embedding_model": embedding_model_id(), "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+def load_ingest_state(index_dir):
+    path = pathlib.Path(index_dir) / INGEST_STATE_FILE
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception as e:
+        print(f"Error loading ingest state: {e}")
+        return None
+    return state if state.get("settings") == state_settings() else None
+
+def write_ingest_state(index_dir, files):
+    path = pathlib.Path(index_dir) / INGEST_STATE_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"settings": state_settings(), "files": files}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def plan_incremental(old_files, new_files, docs_by_name, manifest):
+    """
+    Diffs two scans. Returns (records to embed, (ids, metadatas) to update in
+    place, ids to delete, counts). A changed file only re-embeds the chunk
+    positions whose hash changed; a manifest-only change rewrites metadata.
+    """
+    records, update_ids, update_metas, delete_ids = [], [], [], []
+    counts = collections.Counter()
+    for filename, old in old_files.items():
+        if filename not in new_files:
+            delete_ids += [make_chunk_id(filename, i) for i in range(len(old["chunks"]))]
+            counts["removed"] += 1
+
+    for filename, new in new_files.items():
+        old = old_files.get(filename)
+        if old == new:
+            continue
+        old_chunks = old["chunks"] if old else []
+        meta = doc_metadata(filename, manifest)
+        changed = [i for i, h in enumerate(new["chunks"]) if i >= len(old_chunks) or old_chunks[i] != h]
+        if old and old["metadata"] != new["metadata"]:
+            kept = sorted(set(range(len(new["chunks"]))) - set(changed))
+            update_ids += [make_chunk_id(filename, i) for i in kept]
+            update_metas += [meta] * len(kept)
+        delete_ids += [make_chunk_id(filename, i) for i in range(len(new["chunks"]), len(old_chunks))]
+        if changed:
+            content = read_doc(docs_by_name[filename])
+            chunks = chunk_text(content or "")
+            records += [(make_chunk_id(filename, i), chunks[i], meta) for i in changed if i < len(chunks)]
+        counts["added" if old is None else "changed" if old["sha256"] != new["sha256"] else "metadata"] += 1
+    return records, (update_ids, update_metas), delete_ids, counts
+
+def remove_index_dir(index_path):
+    """Deletes an unpublished or superseded index directory (never the published one)."""
     path = pathlib.Path(index_path)
     if not path.exists():
         return
-
-    print(f"Removing old index at {path}...")
     try:
         shutil.rmtree(path, onerror=remove_readonly)
-    except PermissionError:
-        print("\n" + "!" * 50)
-        print("ERROR: File Permission Denied.")
-        print("Could not delete the existing RAG index.")
-        print("Detailed Error: The folder 'rag/index/chroma' is being used by another process.")
-        print("ACTION REQUIRED: Stop the running API server (Ctrl+C in your other terminal) and try again.")
-        print("!" * 50 + "\n")
-        exit(1)
     except Exception as e:
-        print(f"Error removing old index: {e}")
-        exit(1)
+        # e.g. Windows, while a process still has the old index open: retried next run
+        print(f"Could not remove {path}: {e}")
+
+def close_client(client):
+    close = getattr(client, "close", None)  # chromadb >= 1.x
+    if close is not None:
+        close()
+
+def write_chunks(collection, records, batch_size, workers, upsert_batch, cache=None):
+    """
+    Stream: records (producer thread) -> embedding cache lookup -> encode misses
+    (batched / pool) -> bounded upserts. Returns {"encoded", "upserted"} chunk counts
+    (encoded = sent to the model, i.e. not served by the cache).
+    """
+    pending = ([], [], [], [])  # ids, embeddings, metadatas, documents awaiting upsert
+    counts = {"encoded": 0, "upserted": 0}
+
+    def flush():
+        ids, embeddings, metadatas, documents = pending
+        if ids:
+            collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+            for column in pending:
+                column.clear()
+
+    def count_misses(pairs):
+        for batch, cached in pairs:
+            counts["encoded"] += sum(vector is None for vector in cached)
+            yield batch, cached
+
+    batches = count_misses(lookup_cached(iter_batches(records, batch_size), cache))
+    for batch, vectors in encode_batches(batches, batch_size, workers):
+        if cache is not None:
+            cache.add([r[1] for r in batch], vectors)  # already-cached texts are skipped
+        for (chunk_id, chunk, meta), vector in zip(batch, vectors):
+            pending[0].append(chunk_id)
+            pending[1].append(vector)
+            pending[2].append(meta)
+            pending[3].append(chunk)
+        counts["upserted"] += len(batch)
+        if len(pending[0]) >= upsert_batch:
+            flush()
+    flush()
+    return counts
+
+def open_embedding_cache(args):
+    if args.no_cache:
+        return None
+    cache = EmbeddingCache(embedding_model_id())
+    print(f"Embedding cache: {cache.path} ({len(cache)} entries)")
+    return cache
+
+def report_embedding_cache(cache):
+    if cache is not None:
+        s = cache.stats()
+        print(f"Embedding cache: {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.1%}), "
+              f"{s['added']} added, {s['entries']} entries")
+
+def incremental_build(args, docs, manifest, files, current, staging):
+    """
+    Copies the published index to `staging` and applies the corpus changes there.
+    Returns write_chunks() counts, or None when there is nothing to diff
+    against (no index, no state, or a different model / chunking) and a full
+    build is needed.
+    """
+    state = load_ingest_state(current) if current else None
+    if state is None:
+        print("No usable ingest state for this model / chunking; doing a full build.")
+        return None
+    print(f"Copying {current} to {staging}")
+    shutil.copytree(current, staging, ignore=shutil.ignore_patterns(MAPPED_INDEX_FILE))  # re-exported below
+    client = chromadb.PersistentClient(path=str(staging))
+    try:
+        try:
+            collection = client.get_collection(name="medical_docs")
+        except Exception as e:
+            print(f"Existing collection unusable ({e}); doing a full build.")
+            return None
+        upsert_batch = min(args.upsert_batch, client.get_max_batch_size())
+
+        records, (update_ids, update_metas), delete_ids, counts = plan_incremental(
+            state["files"], files, {p.name: p for p in docs}, manifest
+        )
+        print(f"Files: {counts['added']} added, {counts['changed']} changed, {counts['metadata']} metadata-only, "
+              f"{counts['removed']} removed, {len(files) - sum(counts.values()) + counts['removed']} unchanged")
+
+        for i in range(0, len(delete_ids), upsert_batch):
+            collection.delete(ids=delete_ids[i:i + upsert_batch])
+        for i in range(0, len(update_ids), upsert_batch):
+            collection.update(ids=update_ids[i:i + upsert_batch], metadatas=update_metas[i:i + upsert_batch])
+        written = {"encoded": 0, "upserted": 0}
+        if records:
+            cache = open_embedding_cache(args)
+            written = write_chunks(collection, records, args.batch_size, args.workers, upsert_batch, cache)
+            report_embedding_cache(cache)
+        print(f"Chunks: {written['encoded']} encoded, {written['upserted']} upserted, "
+              f"{len(update_ids)} metadata updated, {len(delete_ids)} deleted")
+        return written
+    finally:
+        close_client(client)
+
+def full_build(args, docs, manifest, staging):
+    print(f"Creating Chroma client at {staging}")
+    client = chromadb.PersistentClient(path=str(staging))
+    try:
+        collection = client.create_collection(name="medical_docs")
+        upsert_batch = min(args.upsert_batch, client.get_max_batch_size())
+        # Stream: chunk (producer thread) -> encode (batched / pool) -> upsert (bounded batches)
+        cache = open_embedding_cache(args)
+        written = write_chunks(collection, iter_corpus_chunks(docs, manifest), args.batch_size, args.workers,
+                               upsert_batch, cache)
+        report_embedding_cache(cache)
+        return written
+    finally:
+        close_client(client)
 
-    # Small sleep to let OS release locks
-    time.sleep(1)
+def export_mapped_index(index_dir, fingerprint):
+    """
+    Writes mapped_index.bin (services/mapped_index.py) from the built collection,
+    page by page: the API maps it instead of opening Chroma.
+    """
+    client = chromadb.PersistentClient(path=str(index_dir))
+    try:
+        collection = client.get_collection(name="medical_docs")
+        writer = MappedIndexWriter(index_dir / MAPPED_INDEX_FILE, fingerprint.version(), embedding_model_id())
+        for offset in range(0, collection.count(), EXPORT_PAGE):
+            page = collection.get(include=["documents", "metadatas", "embeddings"], limit=EXPORT_PAGE, offset=offset)
+            writer.add(page["ids"], page["documents"], page["metadatas"], page["embeddings"])
+        path = writer.close()
+    finally:
+        close_client(client)
+    print(f"Mapped index: {path} ({path.stat().st_size / 2**20:.1f} MiB)")
+
+def publish(index_dir):
+    """Points rag/index/CURRENT at index_dir; a running API swaps it in (RAG_INDEX_POLL_SECONDS)."""
+    publish_index(str(INDEX_ROOT), index_dir.name)
+    print(f"Published {index_dir}")
+
+def prune_indexes(keep):
+    """Deletes published versions beyond the newest `keep` (and leftover staging dirs)."""
+    current = pathlib.Path(current_index_dir(str(INDEX_ROOT))).name
+    versions = sorted(
+        (p for p in INDEX_ROOT.glob(f"{VERSIONED_PREFIX}*") if p.is_dir()),
+        key=lambda p: (p / INDEX_VERSION_FILE).stat().st_mtime if (p / INDEX_VERSION_FILE).exists() else 0,
+        reverse=True,
+    )
+    for path in versions[keep:] + list(INDEX_ROOT.glob(".staging-*")):
+        if path.name != current:
+            print(f"Removing old index {path}")
+            remove_index_dir(path)
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the RAG index from the trusted corpus.")
+    parser.add_argument("--batch-size", type=int, default=ENCODE_BATCH, help="Chunks per encode call")
+    parser.add_argument("--workers", type=int, default=0, help="Encode processes (0/1 = encode in this process)")
+    parser.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH, help="Chunks per Chroma add")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Start from a copy of the published index: re-embed only added / changed files")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Encode every chunk, bypassing the embedding cache (scripts/embedding_cache.py)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the published index is up to date")
+    parser.add_argument("--keep", type=int, default=KEEP_INDEXES, help="Index versions to keep on disk")
+    parser.add_argument("--no-mapped-index", action="store_true",
+                        help=f"Skip the memory-mapped export ({MAPPED_INDEX_FILE}); the API then opens Chroma")
+    args = parser.parse_args()
+
+    current = pathlib.Path(current_index_dir(str(INDEX_ROOT)))
+    if not current.exists() or not any(current.iterdir()):
+        current = None
+
     print("--- Starting RAG Ingestion (Phase 4: Trusted Corpus) ---")
     print(f"Repo Root: {REPO_ROOT}")
     print(f"Corpus Dir: {CORPUS_DIR}")
-    print(f"Index Dir: {INDEX_DIR}")
-    
-    # 1. Initialize Clients
-    print(f"Loading embedding model: {EMBEDDING_MODEL}")
-    embedder = SentenceTransformer(EMBEDDING_MODEL)
-    
-    # Clean recreate index
-    safe_recreate_index(INDEX_DIR)
-    
-    print(f"Creating Chroma client at {INDEX_DIR}")
-    client = chromadb.PersistentClient(path=str(INDEX_DIR))
-    collection = client.create_collection(name="medical_docs")
-
-    # 2. Load Manifest
+    print(f"Published Index: {current}")
+    print(f"Embedding model: {embedding_model_id()}  |  batch {args.batch_size}  |  workers {args.workers or 1}")
+
+    # 1. Load Manifest
     manifest = load_manifest()
     print(f"Loaded {len(manifest)} entries from manifest.")
 
-    # 3. Process Files
     # Get all .txt and .md files
-    docs = list(CORPUS_DIR.glob("*.txt")) + list(CORPUS_DIR.glob("*.md"))
+    docs = sorted(CORPUS_DIR.glob("*.txt")) + sorted(CORPUS_DIR.glob("*.md"))
     print(f"Found {len(docs)} documents in {CORPUS_DIR}")
 
-    total_chunks = 0
-    ids_batch = []
-    embeddings_batch = []
-    metadatas_batch = []
-    documents_batch = []
+    # 2. Fingerprint the index this corpus produces (reads files, no embedding)
+    started = time.perf_counter()
+    files, fingerprint = scan_corpus(docs, manifest)
+    version = fingerprint.version()
+    target = INDEX_ROOT / f"{VERSIONED_PREFIX}{version}"
+    if not args.force:
+        if current is not None and read_index_version(current) == version:
+            print(f"--- Index is up to date (version {version}) ---")
+            return
+        if target.exists() and read_index_version(target) == version:
+            # Kept from an earlier run (e.g. the corpus was reverted): publish without rebuilding
+            os.utime(target / INDEX_VERSION_FILE)
+            publish(target)
+            prune_indexes(args.keep)
+            return
+    if current is not None and target.resolve() == current.resolve():
+        # --force on the published version: never write into the directory being served
+        target = target.with_name(f"{target.name}-{time.strftime('%Y%m%d%H%M%S')}")
 
-    for file_path in docs:
-        filename = file_path.name
-        # Skip manifest itself if glob picked it up (though glob pattern shouldn't)
-        if filename == "manifest.json": continue
+    # 3. Build into a staging directory; the published index keeps serving meanwhile
+    staging = INDEX_ROOT / f".staging-{version}-{os.getpid()}"
+    remove_index_dir(staging)
+    try:
+        written = incremental_build(args, docs, manifest, files, current, staging) if args.incremental else None
+        if written is None:
+            remove_index_dir(staging)
+            written = full_build(args, docs, manifest, staging)
+        if not args.no_mapped_index:
+            export_mapped_index(staging, fingerprint)
+        write_ingest_state(staging, files)
+        write_index_version(staging, fingerprint)
+        remove_index_dir(target)  # unpublished leftover of the same version (--force)
+        os.replace(staging, target)
+    except BaseException:
+        remove_index_dir(staging)
+        raise
 
-        print(f"Processing {filename}...")
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-        except Exception as e:
-            print(f"Skipping {filename} due to read error: {e}")
-            continue
-            
-        # Get metadata from manifest or default
-        if filename in manifest:
-            meta = manifest[filename]
-            # Flatten tags list to string for Chroma storage compatibility if needed
-            # But recent Chroma versions handle lists. Let's keep it safe and join tags.
-            if "tags" in meta and isinstance(meta["tags"], list):
-                meta["tags"] = ",".join(meta["tags"])
-        else:
-            print(f"Warning: {filename} not in manifest. Using defaults.")
-            meta = {
-                "title": filename,
-                "org": "Unknown",
-                "doc_type": "unknown",
-                "tags": ""
-            }
-        
-        # Ensure ID and critical fields are present
-        meta["filename"] = filename
-        
-        chunks = chunk_text(content)
-        
-        for i, chunk in enumerate(chunks):
-            # STABLE ID: filename#chunk_index
-            chunk_id = f"{filename}#chunk_{i}"
-            
-            # Prepare batch
-            ids_batch.append(chunk_id)
-            documents_batch.append(chunk)
-            metadatas_batch.append(meta)
-            
-            vector = embedder.encode(chunk).tolist()
-            embeddings_batch.append(vector)
-            
-            total_chunks += 1
-
-    # 4. Upsert to Chroma
-    if ids_batch:
-        print(f"Upserting {len(ids_batch)} chunks to Chroma...")
-        collection.add(
-            ids=ids_batch,
-            embeddings=embeddings_batch,
-            metadatas=metadatas_batch,
-            documents=documents_batch
-        )
+    # 4. Publish atomically, then drop versions no process should still be reading
+    publish(target)
+    prune_indexes(args.keep)
 
-    print(f"--- Ingestion Complete. Total Chunks: {total_chunks} ---")
+    # Rates count the work this run did: chunks skipped (incremental) or served by the cache are left out
+    elapsed = time.perf_counter() - started
+    encode_rate, upsert_rate = (written[k] / elapsed if elapsed > 0 else 0.0 for k in ("encoded", "upserted"))
+    print(f"--- Ingestion Complete. Index Chunks: {fingerprint.chunks} | "
+          f"encoded {written['encoded']} ({encode_rate:.1f} chunks/s) | "
+          f"upserted {written['upserted']} ({upsert_rate:.1f} chunks/s) | {elapsed:.1f}s ---")
 
 if __name__ == "__main__":
     main()